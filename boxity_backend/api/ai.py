@@ -1,28 +1,49 @@
 import os
+import sys
 import json
+import hashlib
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
 from typing import Any, Dict, List, Optional, Tuple
 
-from .schema import RESPONSE_SCHEMA
+from .deadline import degrade, expired, remaining
+from .metrics import inc, propagate, stage
+from .model_client import get_model_client
+from .model_manager import classify_error, get_model_manager
+from .repair import can_validate, is_valid, repair_payload
+from .result_cache import get_result_cache
 
-try:
-    import google.generativeai as genai
-except Exception:
-    genai = None
+# Ensemble members, in merge-priority order
+ENSEMBLE_MODELS: Tuple[str, ...] = ("gemini-3-flash-preview", "gemini-3-flash-preview")
+# "parallel" runs members concurrently; "sequential" preserves the one-after-another behaviour
+ENSEMBLE_MODE = os.getenv("GEMINI_ENSEMBLE_MODE", "parallel").strip().lower()
+# Stop waiting once this many members returned schema-valid output (0 = wait for all)
+ENSEMBLE_MIN_VALID = max(0, int(os.getenv("GEMINI_ENSEMBLE_MIN_VALID", "0")))
+# Wall-clock budget per member, covering the analysis call and any repair call
+MEMBER_TIMEOUT_S = float(os.getenv("GEMINI_MEMBER_TIMEOUT", "45"))
+GEMINI_MAX_CONCURRENCY = max(1, int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")))
+# Last resort for output local repair cannot salvage: ask the model to fix its JSON (a full extra round-trip)
+MODEL_REPAIR = os.getenv("GEMINI_MODEL_REPAIR", "0") == "1"
 
-try:
-    from jsonschema import validate, ValidationError
-except Exception:
-    validate = None
-    ValidationError = Exception
+_member_pool: Optional[ThreadPoolExecutor] = None
+_member_pool_lock = threading.Lock()
+
+
+def _get_member_pool() -> ThreadPoolExecutor:
+    global _member_pool
+    if _member_pool is None:
+        with _member_pool_lock:
+            if _member_pool is None:
+                _member_pool = ThreadPoolExecutor(max_workers=GEMINI_MAX_CONCURRENCY, thread_name_prefix="gemini")
+    return _member_pool
 
 
 def _configure_genai():
-    api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
-    if not api_key or genai is None:
-        return False
-    genai.configure(api_key=api_key)
-    return True
+    # GEMINI_CLIENT picks the real SDK or an offline record/replay stand-in (see model_client.py);
+    # the manager configures it once per process
+    return get_model_manager().ready()
 
 
 FEW_SHOT = (
@@ -46,14 +67,31 @@ FEW_SHOT = (
 )
 
 
+GENERATION_CONFIG: Dict[str, Any] = {
+    "temperature": 0.15,
+    "top_k": 20,
+    "top_p": 0.8,
+    "response_mime_type": "application/json",
+}
+
+
 def _build_model(name: str):
-    generation_config = {
-        "temperature": 0.15,
-        "top_k": 20,
-        "top_p": 0.8,
-        "response_mime_type": "application/json",
-    }
-    return genai.GenerativeModel(name, generation_config=generation_config)
+    return get_model_manager().model(name, GENERATION_CONFIG)
+
+
+def _result_cache_key(baseline_bytes: bytes, current_bytes: bytes, view_label: Optional[str], parts: List[Any],
+                      cache_tag: Optional[str]) -> str:
+    """Cache key over image hashes, view, models and a fingerprint of the prompt and generation settings."""
+    prompt = [p for p in parts if isinstance(p, str)]
+    fingerprint = hashlib.sha256(json.dumps([prompt, GENERATION_CONFIG], sort_keys=True).encode("utf-8")).hexdigest()
+    return hashlib.sha256(json.dumps([
+        hashlib.sha256(baseline_bytes).hexdigest(),
+        hashlib.sha256(current_bytes).hexdigest(),
+        view_label,
+        list(ENSEMBLE_MODELS),
+        fingerprint,
+        cache_tag,
+    ]).encode("utf-8")).hexdigest()
 
 
 def _extract_json(text: str) -> Dict[str, Any]:
@@ -71,31 +109,145 @@ def _extract_json(text: str) -> Dict[str, Any]:
         return {"differences": []}
 
 
-def _validate_or_repair(payload: Dict[str, Any], model) -> Dict[str, Any]:
-    if validate is None:
+def _validate_or_repair(payload: Dict[str, Any], model, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Returns the payload if it matches the schema, else a locally repaired payload.
+
+    Output that local repair cannot salvage (including output whose every
+    finding had to be dropped, which must not read as "no damage") yields
+    None, unless GEMINI_MODEL_REPAIR=1 and the model manages to repair it.
+    """
+    if is_valid(payload):
         return payload
+    with stage("schema_repair_local"):
+        repaired, dropped = repair_payload(payload)
+    if dropped:
+        print(f"Schema repair dropped {dropped} unusable difference item(s)", file=sys.stderr)
+    lost_everything = dropped > 0 and not repaired["differences"]
+    if (is_valid(repaired) or not can_validate()) and not lost_everything:
+        inc("boxity_schema_repairs_total", {"method": "local", "result": "ok"})
+        return repaired
+    if not MODEL_REPAIR or (timeout is not None and timeout <= 0):
+        if MODEL_REPAIR:
+            degrade("schema_repair")
+        inc("boxity_schema_repairs_total", {"method": "local", "result": "failed"})
+        return None
     try:
-        validate(instance=payload, schema=RESPONSE_SCHEMA)
-        return payload
-    except ValidationError:
-        # Ask model to repair to match the schema
-        try:
+        with stage("schema_repair"):
             result = model.generate_content([
                 "Repair this JSON to match the schema {differences:[...] with required fields}:",
                 json.dumps(payload)
-            ])
-            repaired = _extract_json(result.text or "")
-            validate(instance=repaired, schema=RESPONSE_SCHEMA)
-            return repaired
-        except Exception:
-            return {"differences": []}
+            ], **_request_options(timeout))
+            fixed = _extract_json(result.text or "")
+        if not is_valid(fixed):
+            fixed, _ = repair_payload(fixed)
+        inc("boxity_schema_repairs_total", {"method": "model", "result": "ok"})
+        return fixed
+    except Exception:
+        inc("boxity_schema_repairs_total", {"method": "model", "result": "failed"})
+        return None
+
+
+def _request_options(timeout: Optional[float]) -> Dict[str, Any]:
+    return {"request_options": {"timeout": max(1.0, timeout)}} if timeout is not None else {}
+
+
+def _run_member(model, parts: List[Any], timeout: float, index: int = 0) -> Optional[Dict[str, Any]]:
+    """One ensemble member: analysis call, JSON extraction and schema validation/repair."""
+    started = time.monotonic()
+    with stage("gemini_member", detail=str(index)):
+        result = model.generate_content(parts, **_request_options(timeout))
+        payload = _extract_json(result.text or "")
+        validated = _validate_or_repair(payload, model, timeout=timeout - (time.monotonic() - started))
+    if validated is None:
+        inc("boxity_gemini_errors_total", {"reason": "invalid"})
+    return validated
+
+
+def _quorum(members: int) -> int:
+    """Valid payloads that make an ensemble answer complete: ENSEMBLE_MIN_VALID, or every member when 0."""
+    return min(ENSEMBLE_MIN_VALID, members) if ENSEMBLE_MIN_VALID else members
+
+
+def _run_ensemble(models: List[Any], parts: List[Any]) -> List[Optional[Dict[str, Any]]]:
+    """Runs ensemble members and returns their payloads in member order.
+
+    Members that fail, time out, outlive the request's deadline or are still
+    running once ENSEMBLE_MIN_VALID valid payloads are in yield None.
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(models)
+    needed = _quorum(len(models))
+
+    if ENSEMBLE_MODE == "sequential" or len(models) == 1:
+        valid = 0
+        for i, model in enumerate(models):
+            timeout = remaining(MEMBER_TIMEOUT_S)
+            if timeout <= 0:
+                degrade("gemini")
+                break
+            try:
+                results[i] = _run_member(model, parts, timeout, index=i)
+            except Exception as e:
+                inc("boxity_gemini_errors_total", {"reason": classify_error(e)})
+                print(f"Gemini member {i} failed: {e}", file=sys.stderr)
+                if expired():
+                    degrade("gemini")
+            valid += results[i] is not None
+            if valid >= needed:
+                break
+        return results
+
+    timeout = remaining(MEMBER_TIMEOUT_S)
+    if timeout <= 0:
+        degrade("gemini")
+        return results
+    pool = _get_member_pool()
+    futures = {
+        pool.submit(propagate(_run_member), model, parts, timeout, index=i): i
+        for i, model in enumerate(models)
+    }
+    valid = 0
+    try:
+        for fut in as_completed(futures, timeout=timeout):
+            i = futures[fut]
+            try:
+                results[i] = fut.result()
+            except Exception as e:
+                inc("boxity_gemini_errors_total", {"reason": classify_error(e)})
+                print(f"Gemini member {i} failed: {e}", file=sys.stderr)
+            valid += results[i] is not None
+            if valid >= needed:
+                break
+    except FuturesTimeoutError:
+        timed_out = sum(1 for fut in futures if not fut.done())
+        inc("boxity_gemini_errors_total", {"reason": "timeout"}, timed_out)
+        if timeout < MEMBER_TIMEOUT_S:
+            degrade("gemini")
+        print(f"Gemini ensemble timed out after {timeout:.1f}s with {valid} valid member(s)", file=sys.stderr)
+    for fut in futures:
+        fut.cancel()
+    return results
 
 
 def call_gemini_ensemble(
     baseline: Tuple[Optional[bytes], Optional[str]],
     current: Tuple[Optional[bytes], Optional[str]],
     view_label: Optional[str] = None,
+    cache_tag: Optional[str] = None,
+    info: Optional[Dict[str, Any]] = None,
 ) -> List[Dict[str, Any]]:
+    """Runs the Gemini ensemble on a baseline/current pair and returns merged difference items.
+
+    Results are cached across workers, keyed by both image hashes, the view,
+    the models and the prompt; ``cache_tag`` (e.g. the scoring version) is
+    folded into the key. If ``info`` is given it is filled with run details
+    such as the cache status ("hit", "miss" or "disabled"), whether a model
+    answer was obtained ("answered": at least one member returned valid JSON,
+    or a cached answer) and, when the ensemble was not run, why ("skipped":
+    "circuit_open"). An empty list without "answered" means no verdict, not
+    "no differences".
+    """
+    info = info if info is not None else {}
+    info["answered"] = False
     if not _configure_genai():
         return []
 
@@ -150,19 +302,38 @@ def call_gemini_ensemble(
         "\nCurrent Image (Under Analysis):", {"mime_type": current_mime or "image/jpeg", "data": current_bytes},
     ]
 
-    model_pro = _build_model("gemini-3-flash-preview")
-    model_flash = _build_model("gemini-3-flash-preview")
+    cache = get_result_cache()
+    cache_key = None
+    info["cache"] = "disabled"
+    client = get_model_client()
+    if not client.real:
+        # Keep replayed/synthetic answers apart from real ones
+        cache_tag = f"{cache_tag}|{client.name}"
+    if cache is not None:
+        cache_key = _result_cache_key(baseline_bytes, current_bytes, view_label, parts, cache_tag)
+        cached = cache.get(cache_key)
+        inc("boxity_cache_requests_total", {"cache": "gemini", "result": "hit" if cached is not None else "miss"})
+        if cached is not None:
+            info["cache"] = "hit"
+            info["answered"] = True
+            return cached
+        info["cache"] = "miss"
+
+    if get_model_manager().breaker.is_open():
+        # Backend unhealthy: don't queue calls that would fail, the caller falls back to CV
+        info["skipped"] = "circuit_open"
+        return []
 
     try:
-        r1 = model_pro.generate_content(parts)
-        r2 = model_flash.generate_content(parts)
-        p1 = _extract_json(r1.text or "")
-        p2 = _extract_json(r2.text or "")
-        v1 = _validate_or_repair(p1, model_pro)
-        v2 = _validate_or_repair(p2, model_pro)
+        models = [_build_model(name) for name in ENSEMBLE_MODELS]
+        with stage("gemini_ensemble"):
+            payloads = _run_ensemble(models, parts)
 
-        list1 = v1.get("differences", [])
-        list2 = v2.get("differences", [])
+        info["answered"] = any(p is not None for p in payloads)
+        items: List[Dict[str, Any]] = []
+        for payload in payloads:
+            if payload:
+                items.extend(payload.get("differences", []))
 
         # Merge: keep items with matching region/type (rough consensus) first
         merged: List[Dict[str, Any]] = []
@@ -170,13 +341,17 @@ def call_gemini_ensemble(
             return (str(d.get("region") or ""), str(d.get("type") or ""))
 
         seen = set()
-        for item in list1 + list2:
+        for item in items:
             k = key(item)
             if k in seen:
                 continue
             seen.add(k)
             merged.append(item)
 
+        # Only cache complete answers: an ensemble short of its quorum (members failed, timed out or
+        # were cut off by a deadline) would be served for the cache TTL in place of a full run
+        if cache is not None and cache_key is not None and sum(p is not None for p in payloads) >= _quorum(len(payloads)):
+            cache.put(cache_key, merged[:8])
         return merged[:8]
     except Exception:
         return []
@@ -5,52 +5,47 @@ import os
 import sys
 import json
 import base64
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from functools import wraps
-from typing import Optional, Dict, Any
+from typing import Callable, Optional, Dict, Any, Tuple
 from flask import request, jsonify
 
 try:
     import jwt
-    from jwt import PyJWKClient
     JWT_AVAILABLE = True
 except ImportError:
     JWT_AVAILABLE = False
     jwt = None
-    PyJWKClient = None
 
-try:
-    import requests
-    REQUESTS_AVAILABLE = True
-except ImportError:
-    REQUESTS_AVAILABLE = False
-    requests = None
+from .lazy import LazyModule
+from .metrics import inc
+
+# Only needed to fetch the JWKS; imported on first use
+requests = LazyModule("requests")
 
 AUTH0_DOMAIN = os.getenv('AUTH0_DOMAIN', 'dev-s3i27lzn7dyxx1wn.us.auth0.com')
 AUTH0_AUDIENCE = os.getenv('AUTH0_AUDIENCE', 'https://api.boxity.app')
 AUTH0_NAMESPACE = os.getenv('AUTH0_NAMESPACE', 'https://boxity.app')
+AUTH0_JWKS_URL = f'https://{AUTH0_DOMAIN}/.well-known/jwks.json'
 
-# Cache for JWKS
-_jwks_client = None
-
-
-def get_jwks_client():
-    """Get or create JWKS client for Auth0."""
-    global _jwks_client
-    if not JWT_AVAILABLE:
-        return None
-    if _jwks_client is None:
-        jwks_url = f'https://{AUTH0_DOMAIN}/.well-known/jwks.json'
-        _jwks_client = PyJWKClient(jwks_url)
-    return _jwks_client
+# Local JWKS (e.g. baked into the image) used before the first network refresh
+AUTH0_JWKS_FILE = os.getenv('AUTH0_JWKS_FILE')
+JWKS_REFRESH_S = float(os.getenv('AUTH0_JWKS_REFRESH_S', '3600'))
+JWKS_MIN_REFRESH_S = float(os.getenv('AUTH0_JWKS_MIN_REFRESH_S', '30'))
+TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', '10000'))
+NEGATIVE_TTL_S = float(os.getenv('AUTH_NEGATIVE_TTL', '60'))
 
 
 def get_jwks_manual() -> Optional[Dict[str, Any]]:
-    """Fallback: manually fetch JWKS if PyJWKClient is not available."""
-    if not REQUESTS_AVAILABLE:
+    """Fetch the Auth0 JWKS document; None on any failure."""
+    if not requests.available:
         return None
     try:
-        jwks_url = f'https://{AUTH0_DOMAIN}/.well-known/jwks.json'
-        response = requests.get(jwks_url, timeout=5)
+        response = requests.get(AUTH0_JWKS_URL, timeout=5)
         if response.status_code == 200:
             return response.json()
     except Exception:
@@ -58,6 +53,194 @@ def get_jwks_manual() -> Optional[Dict[str, Any]]:
     return None
 
 
+class TokenCache:
+    """LRU of token hash -> verified payload (until ``exp``) or None (invalid, for a short TTL)."""
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_SIZE, negative_ttl_s: float = NEGATIVE_TTL_S):
+        self.max_entries = max(1, int(max_entries))
+        self.negative_ttl_s = negative_ttl_s
+        self._entries: "OrderedDict[str, Tuple[Optional[Dict[str, Any]], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """(found, payload); a found None payload is a cached rejection."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                if entry[0] is None:
+                    self.negative_hits += 1
+                    result = "negative_hit"
+                else:
+                    self.hits += 1
+                    result = "hit"
+            else:
+                if entry is not None:
+                    del self._entries[key]
+                entry = None
+                self.misses += 1
+                result = "miss"
+        inc("boxity_auth_token_cache_total", {"result": result})
+        if entry is None:
+            return False, None
+        # Each request gets its own copy, so a route mutating its payload cannot leak into others
+        return True, copy.deepcopy(entry[0])
+
+    def _put(self, key: str, payload: Optional[Dict[str, Any]], expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (payload, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, key: str, payload: Dict[str, Any], expires_at: float) -> None:
+        if expires_at > time.time():
+            self._put(key, copy.deepcopy(payload), expires_at)
+
+    def put_invalid(self, key: str) -> None:
+        if self.negative_ttl_s > 0:
+            self._put(key, None, time.time() + self.negative_ttl_s)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+class JwksKeySet:
+    """Signing keys by key id, refreshed in the background instead of per request."""
+
+    def __init__(
+        self,
+        fetch: Callable[[], Optional[Dict[str, Any]]] = get_jwks_manual,
+        local_file: Optional[str] = None,
+        refresh_s: float = JWKS_REFRESH_S,
+        min_refresh_s: float = JWKS_MIN_REFRESH_S,
+        on_keys_removed: Optional[Callable[[], None]] = None,
+    ):
+        self._fetch = fetch
+        self.refresh_s = refresh_s
+        self.min_refresh_s = min_refresh_s
+        self._on_keys_removed = on_keys_removed
+        self._keys: Dict[str, Any] = {}
+        self._refresh_lock = threading.Lock()
+        self._last_refresh = 0.0
+        self._thread_pid: Optional[int] = None
+        self._thread_lock = threading.Lock()
+        self.refreshes = 0
+        self.refresh_failures = 0
+        if local_file:
+            try:
+                with open(local_file, 'r', encoding='utf-8') as f:
+                    self._install(json.load(f))
+            except Exception as e:
+                print(f"Could not load JWKS file {local_file}: {e}", file=sys.stderr)
+
+    def _install(self, jwks: Dict[str, Any]) -> None:
+        keys = {k.key_id: k.key for k in jwt.PyJWKSet.from_dict(jwks).keys if k.key_id}
+        removed = set(self._keys) - set(keys)
+        self._keys = keys
+        # A key withdrawn from the JWKS must not keep vouching for cached tokens
+        if removed and self._on_keys_removed is not None:
+            self._on_keys_removed()
+
+    @property
+    def has_keys(self) -> bool:
+        return bool(self._keys)
+
+    def refresh(self, force: bool = True) -> bool:
+        """Fetches the JWKS; without ``force`` only if the last attempt is older than min_refresh_s."""
+        with self._refresh_lock:
+            now = time.monotonic()
+            if not force and self._last_refresh and now - self._last_refresh < self.min_refresh_s:
+                return False
+            self._last_refresh = now
+            try:
+                jwks = self._fetch()
+                if not jwks:
+                    raise ValueError("empty JWKS response")
+                self._install(jwks)
+            except Exception as e:
+                self.refresh_failures += 1
+                inc("boxity_auth_jwks_refresh_total", {"result": "failed"})
+                print(f"JWKS refresh failed: {e}", file=sys.stderr)
+                return False
+            self.refreshes += 1
+            inc("boxity_auth_jwks_refresh_total", {"result": "ok"})
+            return True
+
+    def start_refresher(self) -> None:
+        """Starts the background refresh thread for this process (started lazily, so pre-fork servers don't inherit it)."""
+        if self._thread_pid == os.getpid() or self.refresh_s <= 0:
+            return
+        with self._thread_lock:
+            if self._thread_pid == os.getpid():
+                return
+            threading.Thread(target=self._refresh_loop, name="jwks-refresh", daemon=True).start()
+            self._thread_pid = os.getpid()
+
+    def _refresh_loop(self) -> None:
+        if not self.has_keys:
+            # Not forced: skipped if a request or preload_jwks fetched the JWKS just before
+            self.refresh(force=False)
+        while True:
+            time.sleep(self.refresh_s)
+            self.refresh()
+
+    def get(self, kid: str) -> Optional[Any]:
+        self.start_refresher()
+        key = self._keys.get(kid)
+        if key is None:
+            # Unknown key id: keys may have rotated since the last refresh
+            self.refresh(force=False)
+            key = self._keys.get(kid)
+        return key
+
+
+_token_cache = TokenCache()
+_key_set: Optional[JwksKeySet] = None
+_key_set_lock = threading.Lock()
+
+
+def get_jwks_key_set() -> JwksKeySet:
+    """Process-wide key set (AUTH0_JWKS_FILE, then background refreshes from Auth0)."""
+    global _key_set
+    if _key_set is None:
+        with _key_set_lock:
+            if _key_set is None:
+                _key_set = JwksKeySet(local_file=AUTH0_JWKS_FILE, on_keys_removed=_token_cache.clear)
+    return _key_set
+
+
+def preload_jwks() -> bool:
+    """Loads signing keys now and starts background refreshes; True if any key is available."""
+    if not JWT_AVAILABLE:
+        return False
+    key_set = get_jwks_key_set()
+    if not key_set.has_keys:
+        key_set.refresh()
+    key_set.start_refresher()
+    return key_set.has_keys
+
+
+def token_cache_stats() -> Dict[str, Any]:
+    return _token_cache.stats()
+
+
 def decode_token_manual(token: str) -> Optional[Dict[str, Any]]:
     """Manual JWT decoding without verification (for debugging only)."""
     try:
@@ -92,33 +275,39 @@ def verify_token(token: str) -> Optional[Dict[str, Any]]:
         print("WARNING: PyJWT not available, token validation disabled", file=sys.stderr)
         return decode_token_manual(token)
 
+    cache_key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+    found, payload = _token_cache.get(cache_key)
+    if found:
+        return payload
+
     try:
         # Get signing key from JWKS
-        jwks_client = get_jwks_client()
-        if jwks_client:
-            signing_key = jwks_client.get_signing_key_from_jwt(token)
-            
-            # Verify token
-            decoded = jwt.decode(
-                token,
-                signing_key.key,
-                algorithms=['RS256'],
-                audience=AUTH0_AUDIENCE,
-                issuer=f'https://{AUTH0_DOMAIN}/',
-            )
-            return decoded
-        else:
-            # Fallback: decode without verification if JWKS client unavailable
-            print("WARNING: JWKS client unavailable, decoding token without verification", file=sys.stderr)
-            return decode_token_manual(token)
-    except jwt.ExpiredSignatureError:
-        return None
+        kid = jwt.get_unverified_header(token).get('kid')
+        signing_key = get_jwks_key_set().get(kid) if kid else None
+        if signing_key is None:
+            # Not cached: the key may show up with the next JWKS refresh
+            return None
+
+        # Verify token
+        decoded = jwt.decode(
+            token,
+            signing_key,
+            algorithms=['RS256'],
+            audience=AUTH0_AUDIENCE,
+            issuer=f'https://{AUTH0_DOMAIN}/',
+        )
     except jwt.InvalidTokenError:
+        # Includes expired tokens and malformed headers
+        _token_cache.put_invalid(cache_key)
         return None
     except Exception as e:
         print(f"Token verification error: {e}", file=sys.stderr)
         return None
 
+    if decoded.get('exp') is not None:
+        _token_cache.put(cache_key, decoded, float(decoded['exp']))
+    return decoded
+
 
 def get_token_from_request() -> Optional[str]:
     """Extract JWT token from request headers."""
@@ -0,0 +1,202 @@
+"""
+Content-addressed image cache shared by the loaders in index.py and utils.py.
+"""
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Seconds a URL's cached image is used before the URL is revalidated
+URL_TTL_S = max(0.0, float(os.getenv("IMAGE_URL_CACHE_TTL", "60")))
+
+
+def source_key(source: str) -> str:
+    """Hash of a URL or base64 payload, used as the lookup key."""
+    return hashlib.sha256(source.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class ImageRecord:
+    """Loaded image bytes plus lazily attached derived data."""
+
+    __slots__ = ("data", "mime", "digest", "info", "array", "prepared", "keys")
+
+    def __init__(self, data: bytes, mime: Optional[str], digest: Optional[str] = None):
+        self.data = data
+        self.mime = mime
+        self.digest = digest or hashlib.sha256(data).hexdigest()
+        self.info: Optional[Dict[str, Any]] = None
+        self.array: Any = None
+        self.prepared: Any = None
+        self.keys: Set[str] = set()
+
+    def nbytes(self) -> int:
+        size = len(self.data)
+        if self.array is not None:
+            size += int(getattr(self.array, "nbytes", 0))
+        if self.prepared is not None and self.prepared.data is not self.data:
+            size += len(self.prepared.data)
+        return size
+
+
+class ImageCache:
+    """Thread-safe LRU of ImageRecords bounded by total bytes held."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max(0, int(max_bytes))
+        self._records: "OrderedDict[str, ImageRecord]" = OrderedDict()
+        self._keys: Dict[str, str] = {}
+        self._key_times: Dict[str, float] = {}
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[ImageRecord]:
+        """The record for ``key``, unless missing or its key was stored more than ``max_age`` seconds ago."""
+        with self._lock:
+            digest = self._keys.get(key)
+            if digest and max_age is not None and time.monotonic() - self._key_times.get(key, 0.0) > max_age:
+                digest = None
+            record = self._records.get(digest) if digest else None
+            if record is None:
+                self.misses += 1
+                return None
+            self._records.move_to_end(digest)
+            self.hits += 1
+            return record
+
+    def put(self, key: str, data: bytes, mime: Optional[str], digest: Optional[str] = None) -> ImageRecord:
+        record = ImageRecord(data, mime, digest)
+        if not self.enabled:
+            return record
+        with self._lock:
+            existing = self._records.get(record.digest)
+            if existing is not None:
+                record = existing
+                self._records.move_to_end(record.digest)
+            else:
+                self._records[record.digest] = record
+                self._sizes[record.digest] = record.nbytes()
+                self._bytes += self._sizes[record.digest]
+            record.keys.add(key)
+            self._keys[key] = record.digest
+            self._key_times[key] = time.monotonic()
+            self._evict_locked()
+        return record
+
+    def attach(self, record: ImageRecord, info: Optional[Dict[str, Any]] = None, array: Any = None,
+               prepared: Any = None) -> None:
+        """Store derived data on a record and re-account its size."""
+        with self._lock:
+            if info is not None:
+                record.info = info
+            if array is not None:
+                record.array = array
+            if prepared is not None:
+                record.prepared = prepared
+            if record.digest in self._sizes:
+                new_size = record.nbytes()
+                self._bytes += new_size - self._sizes[record.digest]
+                self._sizes[record.digest] = new_size
+                self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        while self._bytes > self.max_bytes and self._records:
+            digest, record = self._records.popitem(last=False)
+            self._bytes -= self._sizes.pop(digest, 0)
+            for k in record.keys:
+                if self._keys.get(k) == digest:
+                    del self._keys[k]
+                    self._key_times.pop(k, None)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._records),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+            self._keys.clear()
+            self._key_times.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+
+_cache: Optional[ImageCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_image_cache() -> ImageCache:
+    """Process-wide cache, sized by IMAGE_CACHE_MAX_BYTES (0 disables it)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    max_bytes = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES)))
+                except ValueError:
+                    print("Invalid IMAGE_CACHE_MAX_BYTES, using default", file=sys.stderr)
+                    max_bytes = DEFAULT_MAX_BYTES
+                _cache = ImageCache(max_bytes)
+    return _cache
+
+
+def load_cached(
+    source: str,
+    loader: Callable[[str], Tuple[Optional[bytes], Optional[str]]],
+) -> Tuple[Optional[ImageRecord], bool]:
+    """Resolve a source through the cache, falling back to ``loader`` on a miss.
+
+    Base64 payloads are their own content and never expire; an http(s) URL is
+    loaded again once its entry is older than IMAGE_URL_CACHE_TTL.
+
+    Returns: (record|None, cache_hit)
+    """
+    if not source:
+        return None, False
+    cache = get_image_cache()
+    key = source_key(source)
+    record = cache.get(key, max_age=URL_TTL_S if source.startswith(("http://", "https://")) else None)
+    if record is not None:
+        return record, True
+    data, mime = loader(source)
+    if not data:
+        return None, False
+    return cache.put(key, data, mime), False
+
+
+def load_bytes(data: bytes, mime: Optional[str], digest: Optional[str] = None) -> Tuple[Optional[ImageRecord], bool]:
+    """Resolve bytes that are already in memory (uploads) through the cache by content hash.
+
+    A hit returns the cached record, with its decoded array and EXIF info, in
+    place of the new copy.
+
+    Returns: (record|None, cache_hit)
+    """
+    if not data:
+        return None, False
+    digest = digest or hashlib.sha256(data).hexdigest()
+    cache = get_image_cache()
+    key = f"sha256:{digest}"
+    record = cache.get(key)
+    if record is not None:
+        return record, True
+    return cache.put(key, data, mime, digest), False
@@ -0,0 +1,222 @@
+"""
+Optional process pool for the CPU-bound classical CV fallback (CV_POOL_PROCESSES).
+"""
+import math
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+from .deadline import DeadlineExceeded, check, remaining
+from .lazy import LazyModule
+from .metrics import capture_stages, inc, observe, record_stages, set_gauge, stage
+
+np = LazyModule("numpy")
+_vision = LazyModule(".vision", __package__)
+
+# Processes for the whole host; 0 runs CV on the request thread
+CV_POOL_PROCESSES = max(0, int(os.getenv("CV_POOL_PROCESSES", "0")))
+CV_POOL_TIMEOUT_S = float(os.getenv("CV_POOL_TIMEOUT", "60"))
+# OpenCV threads per pool process; 1 lets CV_POOL_PROCESSES size CPU use exactly
+CV_POOL_THREADS = max(1, int(os.getenv("CV_POOL_THREADS", "1")))
+
+# (shared memory name, shape, dtype)
+ArrayHandle = Tuple[str, Tuple[int, ...], str]
+
+
+def pool_size() -> int:
+    """This process's share of CV_POOL_PROCESSES."""
+    if CV_POOL_PROCESSES <= 0:
+        return 0
+    server_workers = max(1, int(os.getenv("BOXITY_SERVER_WORKERS", "1")))
+    return max(1, math.ceil(CV_POOL_PROCESSES / server_workers))
+
+
+def enabled() -> bool:
+    return pool_size() > 0
+
+
+def _init_process() -> None:
+    # OpenCV's import cost is paid here, once per pool process
+    if _vision.cv2 is not None:
+        _vision.cv2.setNumThreads(CV_POOL_THREADS)
+    _vision.warmup(count=1)
+
+
+def _attach(handle: ArrayHandle) -> Tuple[shared_memory.SharedMemory, Any]:
+    name, shape, dtype = handle
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _run_task(baseline: ArrayHandle, current: ArrayHandle, baseline_key: Optional[str],
+              submitted_at: float) -> Tuple[List[Dict[str, Any]], Dict[str, Any], Dict[str, float], float]:
+    """Pool-process side: attaches both arrays and runs the fallback on them.
+
+    Returns: (regions, alignment report, stage timings in ms, seconds waited before starting)
+    """
+    waited = max(0.0, time.time() - submitted_at)
+    segments: List[shared_memory.SharedMemory] = []
+    arrays: List[Any] = []
+    try:
+        for handle in (baseline, current):
+            shm, arr = _attach(handle)
+            segments.append(shm)
+            arrays.append(arr)
+        info: Dict[str, Any] = {}
+        with capture_stages() as timings:
+            regions = _vision.cv_fallback_regions(arrays[0], arrays[1], baseline_key, info)
+        return regions, info, timings.as_dict(), waited
+    finally:
+        # Views into a segment must be gone before its mapping can be closed
+        arrays.clear()
+        for shm in segments:
+            try:
+                shm.close()
+            except BufferError:
+                # Still referenced from an exception traceback; unmapped when collected
+                pass
+
+
+def _share(arr) -> Tuple[shared_memory.SharedMemory, ArrayHandle]:
+    arr = np.ascontiguousarray(arr)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+    np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+    return shm, (shm.name, tuple(arr.shape), arr.dtype.str)
+
+
+class CvPool:
+    """Process pool plus the queued/running bookkeeping behind its gauges."""
+
+    def __init__(self, processes: int):
+        self.processes = processes
+        method = os.getenv("CV_POOL_START_METHOD") or (
+            "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+        context = multiprocessing.get_context(method)
+        if method == "forkserver":
+            context.set_forkserver_preload([__name__])
+        self._executor = ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=_init_process)
+        self._outstanding = 0
+        self._lock = threading.Lock()
+
+    def _track(self, delta: int) -> None:
+        with self._lock:
+            self._outstanding += delta
+            outstanding = self._outstanding
+        set_gauge("boxity_cv_pool_tasks", max(0, outstanding - self.processes), {"state": "queued"})
+        set_gauge("boxity_cv_pool_tasks", min(outstanding, self.processes), {"state": "running"})
+
+    def _release(self, segments: List[shared_memory.SharedMemory]) -> None:
+        self._track(-1)
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+
+    def run(self, baseline, current, baseline_key: Optional[str], info: Dict[str, Any],
+            timeout: float = CV_POOL_TIMEOUT_S) -> List[Dict[str, Any]]:
+        segments: List[shared_memory.SharedMemory] = []
+        self._track(1)
+        try:
+            handles = []
+            for arr in (baseline, current):
+                shm, handle = _share(arr)
+                segments.append(shm)
+                handles.append(handle)
+            future = self._executor.submit(_run_task, handles[0], handles[1], baseline_key, time.time())
+        except BaseException:
+            self._release(segments)
+            raise
+        # A task cannot be interrupted, so it stays outstanding (and keeps its segments) until it
+        # finishes or is cancelled, even after the caller stopped waiting for it
+        future.add_done_callback(lambda f: self._release(segments))
+        try:
+            regions, align_info, stages_ms, waited = future.result(timeout=timeout)
+        except FuturesTimeoutError:
+            # Abandoned; dropped if it has not started yet
+            future.cancel()
+            raise
+        observe("boxity_cv_pool_wait_seconds", waited)
+        record_stages(stages_ms)
+        # The alignment counter was incremented in the pool process, whose registry is never flushed
+        inc("boxity_alignment_total", {"path": align_info.get("path", "none")})
+        info.update(align_info)
+        return regions
+
+    def warmup(self) -> None:
+        """Starts every pool process (each imports OpenCV) ahead of the first request."""
+        futures = [self._executor.submit(os.getpid) for _ in range(self.processes)]
+        for f in futures:
+            f.result()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool: Optional[CvPool] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+
+
+def get_cv_pool() -> Optional[CvPool]:
+    """This process's CV pool, or None when CV runs in-thread."""
+    global _pool, _pool_pid
+    if not enabled():
+        return None
+    # Per process: a pool inherited across fork has no live processes
+    if _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool_pid != os.getpid():
+                _pool = CvPool(pool_size())
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def _reset_pool(broken: CvPool) -> None:
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is broken:
+            _pool, _pool_pid = None, None
+    broken.shutdown()
+
+
+def cv_fallback_regions(baseline, current, info: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Classical fallback regions for a pair of ImageRecords, in the CV pool when enabled.
+
+    ``info`` receives the alignment report (see vision.align_and_normalize).
+
+    A pool that crashed (e.g. a process was OOM-killed) is replaced and the
+    pair runs on the calling thread if the request's deadline leaves time for
+    it; a task that exceeds CV_POOL_TIMEOUT raises TimeoutError (and is not
+    retried in-thread), or DeadlineExceeded when the request's deadline came
+    first.
+    """
+    info = info if info is not None else {}
+    pool = get_cv_pool()
+    if pool is None:
+        return _vision.cv_fallback_regions(baseline, current, info=info)
+
+    with stage("cv_decode"):
+        b = _vision.decode_image(baseline)
+        c = _vision.decode_image(current)
+    if b is None or c is None:
+        return []
+    timeout = remaining(CV_POOL_TIMEOUT_S)
+    try:
+        return pool.run(b, c, getattr(baseline, "digest", None), info, timeout=timeout)
+    except BrokenProcessPool as e:
+        inc("boxity_cv_pool_failures_total", {"reason": "broken"})
+        print(f"CV pool broken, restarting it: {e}", file=sys.stderr)
+        _reset_pool(pool)
+        check("cv")
+        return _vision.cv_fallback_regions(baseline, current, info=info)
+    except FuturesTimeoutError:
+        if timeout < CV_POOL_TIMEOUT_S:
+            inc("boxity_cv_pool_failures_total", {"reason": "deadline"})
+            raise DeadlineExceeded(f"CV pool task cut off by the request deadline after {timeout:.1f}s")
+        inc("boxity_cv_pool_failures_total", {"reason": "timeout"})
+        raise TimeoutError(f"CV pool task exceeded {CV_POOL_TIMEOUT_S:.0f}s")
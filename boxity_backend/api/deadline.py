@@ -0,0 +1,147 @@
+"""
+Per-request time budgets for the analysis pipeline.
+"""
+import contextvars
+import copy
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from .metrics import inc
+
+# Default budget per analysis request; 0 leaves requests unbounded unless the client asks for one
+DEFAULT_BUDGET_MS = max(0, int(os.getenv("ANALYZE_DEADLINE_MS", "0")))
+# Time held back from Gemini so the CV fallback can still run (at most half the budget)
+CV_RESERVE_MS = max(0, int(os.getenv("ANALYZE_DEADLINE_CV_RESERVE_MS", "3000")))
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's budget ran out before a step that cannot be skipped."""
+
+
+class Deadline:
+    """Absolute expiry of one request plus the steps degraded to meet it."""
+
+    __slots__ = ("budget_s", "started", "expires_at", "_degraded", "_lock")
+
+    def __init__(self, budget_s: float):
+        self.budget_s = budget_s
+        self.started = time.monotonic()
+        self.expires_at = self.started + budget_s
+        self._degraded: List[str] = []
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def ending_early(self, seconds: float) -> "Deadline":
+        """A deadline ``seconds`` earlier that reports its degraded steps on this one."""
+        inner = copy.copy(self)
+        inner.expires_at = self.expires_at - seconds
+        return inner
+
+    def degrade(self, step: str) -> None:
+        with self._lock:
+            if step in self._degraded:
+                return
+            self._degraded.append(step)
+        inc("boxity_deadline_degraded_total", {"step": step})
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            degraded = list(self._degraded)
+        return {
+            "budget_ms": round(self.budget_s * 1000.0, 1),
+            "elapsed_ms": round((time.monotonic() - self.started) * 1000.0, 1),
+            "exceeded": self.expired(),
+            "degraded": degraded,
+        }
+
+
+_current: "contextvars.ContextVar[Optional[Deadline]]" = contextvars.ContextVar("boxity_deadline", default=None)
+
+
+def parse_budget_ms(value: Any) -> Optional[float]:
+    """A client-requested budget in ms (e.g. the X-Deadline-Ms header), or None if not given.
+
+    Raises:
+        ValueError: If the value is not a positive number
+    """
+    if value is None or value == "":
+        return None
+    try:
+        budget_ms = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid deadline: {value!r} (expected milliseconds)")
+    if not budget_ms > 0:
+        raise ValueError(f"Invalid deadline: {value!r} (expected milliseconds)")
+    return budget_ms
+
+
+@contextmanager
+def deadline_scope(requested_ms: Optional[float] = None) -> Iterator[Optional[Deadline]]:
+    """Bounds the enclosed request by ``requested_ms``, capped at ANALYZE_DEADLINE_MS when that is set."""
+    budgets = [b for b in (requested_ms, DEFAULT_BUDGET_MS) if b]
+    deadline = Deadline(min(budgets) / 1000.0) if budgets else None
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def current() -> Optional[Deadline]:
+    return _current.get()
+
+
+def remaining(timeout: Optional[float] = None) -> Optional[float]:
+    """``timeout`` capped at the time left in the current request (``timeout`` itself without a deadline)."""
+    deadline = _current.get()
+    if deadline is None:
+        return timeout
+    left = deadline.remaining()
+    return left if timeout is None else min(timeout, left)
+
+
+def expired() -> bool:
+    deadline = _current.get()
+    return deadline is not None and deadline.expired()
+
+
+def degrade(step: str) -> None:
+    """Records that ``step`` was skipped or cut short to meet the current deadline."""
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.degrade(step)
+
+
+def check(step: str) -> None:
+    """Raises DeadlineExceeded when the current deadline has passed before ``step``."""
+    if expired():
+        degrade(step)
+        raise DeadlineExceeded(f"Request deadline exceeded before {step}")
+
+
+@contextmanager
+def reserve_for_fallback() -> Iterator[None]:
+    """Ends the enclosed steps CV_RESERVE_MS early (at most half the budget) so the CV fallback still fits."""
+    deadline = _current.get()
+    if deadline is None or CV_RESERVE_MS <= 0:
+        yield
+        return
+    token = _current.set(deadline.ending_early(min(CV_RESERVE_MS / 1000.0, deadline.budget_s / 2.0)))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def report() -> Optional[Dict[str, Any]]:
+    """The current deadline's budget, elapsed time and degraded steps, or None without a deadline."""
+    deadline = _current.get()
+    return deadline.report() if deadline is not None else None
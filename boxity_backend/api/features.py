@@ -0,0 +1,142 @@
+"""
+On-disk store of precomputed baseline features for align_and_normalize.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import uuid
+from typing import Any, Dict, Optional
+
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None
+
+# Bump when detector parameters or the normalization recipe change.
+FEATURE_VERSION = "v2"
+DEFAULT_MAX_ENTRIES = 2000
+# Full-resolution LAB planes are ~36 MB at 12 MP, so the entry cap alone does not bound the disk
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+
+class FeatureStore:
+    """Directory-backed map of image digest -> named NumPy arrays."""
+
+    def __init__(self, root: str, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}-{FEATURE_VERSION}")
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        if np is None or not key:
+            return None
+        path = self._path(key)
+        if not os.path.isdir(path):
+            return None
+        try:
+            arrays: Dict[str, Any] = {}
+            for name in os.listdir(path):
+                if name.endswith(".npy"):
+                    arrays[name[:-4]] = np.load(os.path.join(path, name), mmap_mode="r", allow_pickle=False)
+            if arrays:
+                # Recency for LRU eviction
+                os.utime(path)
+            return arrays or None
+        except Exception as e:
+            print(f"Feature store read failed for {key}: {e}", file=sys.stderr)
+            return None
+
+    def save(self, key: str, arrays: Dict[str, Any]) -> None:
+        if np is None or not key:
+            return
+        path = self._path(key)
+        if os.path.isdir(path):
+            return
+        if sum(arr.nbytes for arr in arrays.values() if arr is not None) > self.max_bytes:
+            return
+        tmp = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        try:
+            os.makedirs(tmp, exist_ok=True)
+            for name, arr in arrays.items():
+                if arr is None:
+                    continue
+                np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(arr), allow_pickle=False)
+            try:
+                os.rename(tmp, path)
+            except OSError:
+                # Another worker stored the same baseline first.
+                pass
+            self._prune()
+        except Exception as e:
+            print(f"Feature store write failed for {key}: {e}", file=sys.stderr)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    @staticmethod
+    def _entry_size(path: str) -> int:
+        total = 0
+        for name in os.listdir(path):
+            try:
+                total += os.path.getsize(os.path.join(path, name))
+            except OSError:
+                pass
+        return total
+
+    def _prune(self) -> None:
+        """Evicts least recently used entries until both the entry and the byte cap hold."""
+        with self._lock:
+            try:
+                entries = []
+                for name in os.listdir(self.root):
+                    if name.startswith("."):
+                        continue
+                    path = os.path.join(self.root, name)
+                    try:
+                        entries.append((os.path.getmtime(path), self._entry_size(path), path))
+                    except OSError:
+                        continue
+                entries.sort()
+                count, total = len(entries), sum(size for _, size, _ in entries)
+                for _, size, path in entries:
+                    if count <= self.max_entries and total <= self.max_bytes:
+                        break
+                    shutil.rmtree(path, ignore_errors=True)
+                    count -= 1
+                    total -= size
+            except OSError:
+                pass
+
+
+_store: Optional[FeatureStore] = None
+_store_lock = threading.Lock()
+_store_disabled = False
+
+
+def get_feature_store() -> Optional[FeatureStore]:
+    """Process-wide store rooted at FEATURE_STORE_DIR (empty string disables it)."""
+    global _store, _store_disabled
+    if _store is not None or _store_disabled or np is None:
+        return _store
+    with _store_lock:
+        if _store is None and not _store_disabled:
+            root = os.getenv("FEATURE_STORE_DIR")
+            if root is None:
+                root = os.path.join(tempfile.gettempdir(), "boxity-features")
+            if not root:
+                _store_disabled = True
+                return None
+            try:
+                os.makedirs(root, exist_ok=True)
+                max_entries = int(os.getenv("FEATURE_STORE_MAX_ENTRIES", str(DEFAULT_MAX_ENTRIES)))
+                max_bytes = int(os.getenv("FEATURE_STORE_MAX_BYTES", str(DEFAULT_MAX_BYTES)))
+                _store = FeatureStore(root, max_entries, max_bytes)
+            except Exception as e:
+                print(f"Feature store unavailable: {e}", file=sys.stderr)
+                _store_disabled = True
+    return _store
@@ -0,0 +1,268 @@
+"""
+Pooled, streaming HTTP image fetcher with a conditional-GET disk cache.
+"""
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+
+from .lazy import LazyModule
+
+requests = LazyModule("requests")
+requests_adapters = LazyModule("requests.adapters")
+
+DEFAULT_MAX_BYTES = 25 * 1024 * 1024
+DEFAULT_TIMEOUT_S = 20.0
+DEFAULT_CACHE_ENTRIES = 1000
+# At DEFAULT_MAX_BYTES per image the entry cap alone would allow ~25 GB on disk
+DEFAULT_CACHE_BYTES = 512 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+SNIFF_BYTES = 16
+
+
+def sniff_image_mime(head: bytes) -> Optional[str]:
+    """MIME type from an image's magic bytes, or None if not a recognised image."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head.startswith(b"BM"):
+        return "image/bmp"
+    if head.startswith((b"II*\x00", b"MM\x00*")):
+        return "image/tiff"
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand in (b"avif", b"avis"):
+            return "image/avif"
+        if brand in (b"heic", b"heix", b"hevc", b"hevx", b"mif1", b"msf1"):
+            return "image/heic"
+    return None
+
+
+class HttpDiskCache:
+    """Image bodies plus their HTTP validators, one file pair per URL hash."""
+
+    def __init__(self, root: str, max_entries: int = DEFAULT_CACHE_ENTRIES, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.root = root
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self._lock = threading.Lock()
+
+    def _paths(self, url: str) -> Tuple[str, str]:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, f"{key}.json"), os.path.join(self.root, f"{key}.bin")
+
+    def validators(self, url: str) -> Dict[str, str]:
+        meta = self._meta(url)
+        headers: Dict[str, str] = {}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def _meta(self, url: str) -> Optional[Dict[str, str]]:
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            return meta if meta.get("url") == url and os.path.exists(body_path) else None
+        except (OSError, ValueError):
+            return None
+
+    def read(self, url: str) -> Tuple[Optional[bytes], Optional[str]]:
+        meta = self._meta(url)
+        if not meta:
+            return None, None
+        _, body_path = self._paths(url)
+        try:
+            with open(body_path, "rb") as f:
+                data = f.read()
+            os.utime(body_path)
+            return data, meta.get("mime")
+        except OSError:
+            return None, None
+
+    def store(self, url: str, data: bytes, mime: Optional[str], etag: Optional[str], last_modified: Optional[str]) -> None:
+        if len(data) > self.max_bytes:
+            return
+        meta_path, body_path = self._paths(url)
+        tag = uuid.uuid4().hex
+        try:
+            tmp_body = f"{body_path}.{tag}.tmp"
+            with open(tmp_body, "wb") as f:
+                f.write(data)
+            os.replace(tmp_body, body_path)
+            tmp_meta = f"{meta_path}.{tag}.tmp"
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                json.dump({"url": url, "etag": etag, "last_modified": last_modified, "mime": mime}, f)
+            os.replace(tmp_meta, meta_path)
+            self._prune()
+        except OSError as e:
+            print(f"HTTP image cache write failed: {e}", file=sys.stderr)
+
+    def _prune(self) -> None:
+        """Evicts least recently read bodies until both the entry and the byte cap hold."""
+        with self._lock:
+            try:
+                bodies = []
+                for name in os.listdir(self.root):
+                    if name.endswith(".bin"):
+                        p = os.path.join(self.root, name)
+                        try:
+                            st = os.stat(p)
+                        except OSError:
+                            continue
+                        bodies.append((st.st_mtime, st.st_size, p))
+                bodies.sort()
+                count, total = len(bodies), sum(size for _, size, _ in bodies)
+                for _, size, p in bodies:
+                    if count <= self.max_entries and total <= self.max_bytes:
+                        break
+                    for path in (p, p[:-4] + ".json"):
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+                    count -= 1
+                    total -= size
+            except OSError:
+                pass
+
+
+class ImageFetcher:
+    """Fetches remote images over a shared, pooled session."""
+
+    def __init__(
+        self,
+        session=None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        timeout: float = DEFAULT_TIMEOUT_S,
+        disk_cache: Optional[HttpDiskCache] = None,
+        pool_size: int = 16,
+    ):
+        if session is None and requests.available:
+            session = requests.Session()
+            adapter = requests_adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.disk_cache = disk_cache
+
+    def fetch(self, url: str, timeout: Optional[float] = None) -> Tuple[Optional[bytes], Optional[str]]:
+        """Returns (bytes|None, mime_type|None); None when the body is missing, too large, not an image or late.
+
+        ``timeout`` (default: the fetcher's) bounds the whole fetch, body included.
+        """
+        if self.session is None:
+            return None, None
+        timeout = self.timeout if timeout is None else max(0.1, min(self.timeout, timeout))
+        expires_at = time.monotonic() + timeout
+        headers = self.disk_cache.validators(url) if self.disk_cache is not None else {}
+        try:
+            with self.session.get(url, timeout=timeout, headers=headers, stream=True) as resp:
+                if resp.status_code == 304 and self.disk_cache is not None:
+                    data, mime = self.disk_cache.read(url)
+                    if data:
+                        return data, mime
+                    # Cache entry vanished between validation and read: fetch unconditionally
+                    return self._fetch_plain(url, expires_at)
+                if resp.status_code != 200:
+                    return None, None
+                data, mime = self._read_body(url, resp, expires_at)
+                if data and self.disk_cache is not None:
+                    etag = resp.headers.get("ETag")
+                    last_modified = resp.headers.get("Last-Modified")
+                    if etag or last_modified:
+                        self.disk_cache.store(url, data, mime, etag, last_modified)
+                return data, mime
+        except Exception as e:
+            print(f"Image fetch failed for {url[:200]}: {e}", file=sys.stderr)
+            return None, None
+
+    def _fetch_plain(self, url: str, expires_at: float) -> Tuple[Optional[bytes], Optional[str]]:
+        with self.session.get(url, timeout=max(0.1, expires_at - time.monotonic()), stream=True) as resp:
+            if resp.status_code != 200:
+                return None, None
+            return self._read_body(url, resp, expires_at)
+
+    def _read_body(self, url: str, resp, expires_at: float) -> Tuple[Optional[bytes], Optional[str]]:
+        declared = resp.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > self.max_bytes:
+            print(f"Image too large ({declared} bytes): {url[:200]}", file=sys.stderr)
+            return None, None
+
+        buf = bytearray()
+        sniffed: Optional[str] = None
+        for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+            if not chunk:
+                continue
+            buf.extend(chunk)
+            if sniffed is None and len(buf) >= SNIFF_BYTES:
+                sniffed = sniff_image_mime(bytes(buf[:SNIFF_BYTES]))
+                if sniffed is None:
+                    print(f"Rejected non-image response: {url[:200]}", file=sys.stderr)
+                    return None, None
+            if len(buf) > self.max_bytes:
+                print(f"Image exceeds {self.max_bytes} bytes: {url[:200]}", file=sys.stderr)
+                return None, None
+            # The socket timeout bounds each read, not a slow trickle of chunks
+            if time.monotonic() > expires_at:
+                print(f"Image fetch timed out: {url[:200]}", file=sys.stderr)
+                return None, None
+        if sniffed is None:
+            sniffed = sniff_image_mime(bytes(buf[:SNIFF_BYTES]))
+            if sniffed is None:
+                return None, None
+
+        header_mime = resp.headers.get("Content-Type", "").split(";")[0].strip()
+        mime = header_mime if header_mime.startswith("image/") else sniffed
+        return bytes(buf), mime
+
+
+_fetcher: Optional[ImageFetcher] = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher() -> ImageFetcher:
+    """Process-wide fetcher configured from IMAGE_FETCH_* / IMAGE_HTTP_CACHE_* env vars.
+
+    IMAGE_HTTP_CACHE_DIR defaults to <tmp>/boxity-http-cache; an empty value disables the disk cache.
+    """
+    global _fetcher
+    if _fetcher is None:
+        with _fetcher_lock:
+            if _fetcher is None:
+                disk_cache = None
+                root = os.getenv("IMAGE_HTTP_CACHE_DIR")
+                if root is None:
+                    root = os.path.join(tempfile.gettempdir(), "boxity-http-cache")
+                if root:
+                    try:
+                        os.makedirs(root, exist_ok=True)
+                        disk_cache = HttpDiskCache(
+                            root,
+                            int(os.getenv("IMAGE_HTTP_CACHE_MAX_ENTRIES", str(DEFAULT_CACHE_ENTRIES))),
+                            int(os.getenv("IMAGE_HTTP_CACHE_MAX_BYTES", str(DEFAULT_CACHE_BYTES))),
+                        )
+                    except Exception as e:
+                        print(f"HTTP image cache unavailable: {e}", file=sys.stderr)
+                _fetcher = ImageFetcher(
+                    max_bytes=int(os.getenv("IMAGE_FETCH_MAX_BYTES", str(DEFAULT_MAX_BYTES))),
+                    timeout=float(os.getenv("IMAGE_FETCH_TIMEOUT", str(DEFAULT_TIMEOUT_S))),
+                    disk_cache=disk_cache,
+                    pool_size=int(os.getenv("IMAGE_FETCH_POOL_SIZE", "16")),
+                )
+    return _fetcher
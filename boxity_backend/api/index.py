@@ -5,18 +5,39 @@ import traceback
 import json
 import io
 import base64
+import copy
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed, wait
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
-from flask import Flask, request, jsonify
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+_IMPORT_STARTED = time.perf_counter()
+
+from flask import Flask, Response, request, jsonify, stream_with_context
+
+from .cache import ImageRecord, get_image_cache, load_bytes, load_cached
+from .cv_pool import cv_fallback_regions, get_cv_pool
+from .deadline import DeadlineExceeded, check, deadline_scope, degrade, expired, parse_budget_ms, remaining, reserve_for_fallback
+from .deadline import report as deadline_report
+from .fetcher import get_fetcher
+from .jobs import QueueFull, check_callback_url, get_job_queue, public_job_view
+from .lazy import LazyModule, import_timings, preload_all
+from .metrics import inc, propagate, render_prometheus, request_scope, stage
+from .model_client import client_mode
+from .preprocess import bbox_to_original, prepare_for_model
+from .singleflight import FlightTimeout, SingleFlight
+from .uploads import UploadError, UploadedImage, is_upload_request, parse_upload_request
 
 # Auth0 JWT validation
 try:
-    from .auth import optional_auth, require_auth
+    from .auth import optional_auth, preload_jwks, require_auth
     AUTH_AVAILABLE = True
 except Exception as e:
     AUTH_AVAILABLE = False
     optional_auth = lambda f: f  # No-op decorator
     require_auth = lambda f: f  # No-op decorator
+    preload_jwks = lambda: False
     print("Auth module import failed:", e, file=sys.stderr)
 
 # CORS
@@ -25,56 +46,32 @@ try:
 except Exception:
     CORS = None
 
-# Pillow
-try:
-    from PIL import Image, ExifTags
-except Exception:
-    Image = None
-    ExifTags = None
-
-# requests
-try:
-    import requests
-except Exception:
-    requests = None
+# Heavy backends are imported on first use (see lazy.py) to keep cold starts fast;
+# `.available` replaces the old `is None` checks and triggers the import.
+Image = LazyModule("PIL.Image")
+ExifTags = LazyModule("PIL.ExifTags")
+genai = LazyModule("google.generativeai")
+cv2 = LazyModule("cv2")
+np = LazyModule("numpy")
 
-# google generative ai library
-try:
-    import google.generativeai as genai
-except Exception:
-    genai = None
+# A misspelt GEMINI_CLIENT stops the app here instead of failing every analysis request
+GEMINI_CLIENT = client_mode()
 
 # modular helpers (ai / vision)
-try:
-    from .ai import call_gemini_ensemble
-except Exception as e:
-    call_gemini_ensemble = None
-    print("AI helper import failed:", e, file=sys.stderr)
+_ai = LazyModule(".ai", __package__)
+_vision = LazyModule(".vision", __package__)
 
-try:
-    from .vision import align_and_normalize
-except Exception as e:
-    align_and_normalize = None
-    print("Vision helper import failed:", e, file=sys.stderr)
-
-# opencv / numpy may be heavy -> check
-try:
-    import cv2  # type: ignore
-except Exception as e:
-    cv2 = None
-    print("cv2 import failed:", str(e), file=sys.stderr)
-
-try:
-    import numpy as np  # type: ignore
-except Exception as e:
-    np = None
-    print("numpy import failed:", str(e), file=sys.stderr)
+def _cv_ready() -> bool:
+    return cv2.available and np.available
 
 app = Flask(__name__)
 if CORS is not None:
     CORS(app, resources={r"/analyze": {"origins": "*"}})
 
-SCORING_VERSION = "cv-v3"
+# Bump when CV or scoring output changes for the same inputs (reported per result, folded into the Gemini cache key).
+# cv-v4: the contrast blend after normalization no longer errors, so aligned diffs are used instead of the raw fallback
+# cv-v5: Gemini answers are validated against MODEL_RESPONSE_SCHEMA, so their findings are scored (they were all rejected)
+SCORING_VERSION = "cv-v5"
 
 @app.after_request
 def _add_cors_headers(response):
@@ -91,20 +88,71 @@ def _add_cors_headers(response):
 
 IMAGE_PACK_DELIMITER = "||"
 
+# Concurrency: views of all requests share a process-wide pool of ANALYZE_VIEW_WORKERS threads;
+# image loads share a process-wide pool of IMAGE_FETCH_WORKERS threads.
+ANALYZE_VIEW_WORKERS = max(1, int(os.getenv("ANALYZE_VIEW_WORKERS", "16")))
+# Views (baseline/current pairs) accepted in one request
+ANALYZE_MAX_VIEWS = max(1, int(os.getenv("ANALYZE_MAX_VIEWS", "8")))
+IMAGE_FETCH_WORKERS = max(1, int(os.getenv("IMAGE_FETCH_WORKERS", "8")))
+# /analyze/batch: items per request and items analyzed concurrently per request
+BATCH_MAX_ITEMS = max(1, int(os.getenv("BATCH_MAX_ITEMS", "500")))
+BATCH_MAX_WORKERS = max(1, int(os.getenv("BATCH_MAX_WORKERS", "4")))
+# Concurrent identical views (same image contents and label) share one analysis; "0" disables
+ANALYZE_COALESCE = os.getenv("ANALYZE_COALESCE", "1") != "0"
+# Always return per-stage timings in analysis_metadata.timings_ms (requests can also ask with "include_timings": true)
+RETURN_TIMINGS = os.getenv("ANALYZE_RETURN_TIMINGS", "0") == "1"
+
+T = TypeVar("T")
+# An image input: URL, base64 payload or data URI, or bytes uploaded with the request
+Source = Any
+
+_io_pool: Optional[ThreadPoolExecutor] = None
+_io_pool_lock = threading.Lock()
+
+def _get_io_pool() -> ThreadPoolExecutor:
+    # Created lazily so pre-fork servers don't inherit dead worker threads
+    global _io_pool
+    if _io_pool is None:
+        with _io_pool_lock:
+            if _io_pool is None:
+                _io_pool = ThreadPoolExecutor(max_workers=IMAGE_FETCH_WORKERS, thread_name_prefix="image-fetch")
+    return _io_pool
+
+_view_pool: Optional[ThreadPoolExecutor] = None
+_view_pool_lock = threading.Lock()
+
+def _get_view_pool() -> ThreadPoolExecutor:
+    # Shared by all requests so concurrent multi-view requests cannot multiply the thread count
+    global _view_pool
+    if _view_pool is None:
+        with _view_pool_lock:
+            if _view_pool is None:
+                _view_pool = ThreadPoolExecutor(max_workers=ANALYZE_VIEW_WORKERS, thread_name_prefix="analyze-view")
+    return _view_pool
+
+def _run_concurrently(jobs: List[Callable[[], T]]) -> List[T]:
+    """Runs jobs on the shared view pool and returns results in job order.
+
+    The first exception raised by any job is re-raised once it occurs; jobs that
+    have not started yet are cancelled. Jobs must not submit to the view pool
+    themselves (they may use the image-fetch pool).
+    """
+    if len(jobs) <= 1:
+        return [job() for job in jobs]
+    pool = _get_view_pool()
+    futures = [pool.submit(propagate(job)) for job in jobs]
+    done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+    for f in futures:
+        if f in done and f.exception() is not None:
+            for p in pending:
+                p.cancel()
+            raise f.exception()
+    return [f.result() for f in futures]
+
 def _configure_genai():
-    api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        print("No GOOGLE_API_KEY/GEMINI_API_KEY set in environment", file=sys.stderr)
-        return False
-    if genai is None:
-        print("google.generativeai not installed or failed to import", file=sys.stderr)
-        return False
-    try:
-        genai.configure(api_key=api_key)
-        return True
-    except Exception as e:
-        print("genai.configure error:", str(e), file=sys.stderr)
-        return False
+    # Configured once per process by the model manager (model_manager.py), which also
+    # covers the offline stand-ins (GEMINI_CLIENT=replay/simulate)
+    return _ai.available and _ai._configure_genai()
 
 @app.route('/')
 def home():
@@ -114,11 +162,104 @@ def home():
 def about():
     return 'About'
 
-def _load_image_bytes(source: str) -> Tuple[Optional[bytes], Optional[str]]:
-    """Loads image bytes and MIME type from a URL or base64 data URI.
+_warmup_state: Dict[str, Any] = {"status": "cold", "modules": {}, "warmup_ms": None}
+_warmup_lock = threading.Lock()
+# A failed warmup is retried by a later /ready call after WARMUP_RETRY_S, doubling per failure up to WARMUP_RETRY_MAX_S
+WARMUP_RETRY_S = max(0.0, float(os.getenv("WARMUP_RETRY_S", "5")))
+WARMUP_RETRY_MAX_S = max(WARMUP_RETRY_S, float(os.getenv("WARMUP_RETRY_MAX_S", "300")))
+_warmup_retry_at = 0.0
+
+def warmup(imports_only: bool = False) -> Dict[str, bool]:
+    """Imports every lazy backend, pre-creates OpenCV detectors (and CV pool processes) and loads the Auth0 signing keys.
+
+    Safe to call in a gunicorn master before fork with ``imports_only=True``
+    (no threads, network calls or OpenCV state).
+    """
+    modules = preload_all()
+    if imports_only:
+        return modules
+    if _vision.available and _cv_ready():
+        _vision.warmup()
+        pool = get_cv_pool()
+        if pool is not None:
+            pool.warmup()
+    if AUTH_AVAILABLE:
+        modules["jwks"] = preload_jwks()
+    return modules
+
+def _run_warmup() -> None:
+    global _warmup_retry_at
+    started = time.perf_counter()
+    try:
+        modules = warmup()
+        for key in ("error", "failures", "retry_in_s"):
+            _warmup_state.pop(key, None)
+        _warmup_state.update(status="ready", modules=modules)
+    except Exception as e:
+        failures = int(_warmup_state.get("failures", 0)) + 1
+        delay = min(WARMUP_RETRY_MAX_S, WARMUP_RETRY_S * 2 ** (failures - 1))
+        print(f"Warmup failed (attempt {failures}, retrying in {delay:g}s): {e}", file=sys.stderr)
+        _warmup_retry_at = time.monotonic() + delay
+        _warmup_state.update(status="failed", error=str(e), failures=failures, retry_in_s=delay)
+    _warmup_state["warmup_ms"] = round((time.perf_counter() - started) * 1000.0, 2)
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text metrics over all worker processes (see metrics.py)."""
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/ready')
+def ready():
+    """Readiness probe: 503 until heavy imports and CV objects are warm (started on the first call, retried after a failure)."""
+    with _warmup_lock:
+        status = _warmup_state["status"]
+        if status == "cold" or (status == "failed" and time.monotonic() >= _warmup_retry_at):
+            _warmup_state["status"] = "warming"
+            threading.Thread(target=_run_warmup, name="warmup", daemon=True).start()
+    body = {
+        **_warmup_state,
+        "app_import_ms": round(APP_IMPORT_MS, 2),
+        "imports": import_timings(),
+    }
+    return jsonify(body), 200 if _warmup_state["status"] == "ready" else 503
+
+def _load_image_bytes(source: Source) -> Tuple[Optional[bytes], Optional[str]]:
+    """Loads image bytes and MIME type from a URL, base64 data URI or upload.
 
     Returns: (bytes|None, mime_type|None)
     """
+    record, _ = _load_image_record(source)
+    if record is None:
+        return None, None
+    return record.data, record.mime
+
+def _load_image_record(source: Source) -> Tuple[Optional[ImageRecord], bool]:
+    """Loads an image through the shared content-addressed cache.
+
+    Returns: (record|None, cache_hit)
+    """
+    if isinstance(source, UploadedImage):
+        return load_bytes(source.data, source.mime, source.digest)
+    return load_cached(source, _fetch_image_bytes)
+
+def _load_image_records(sources: List[Source]) -> List[Tuple[Optional[ImageRecord], bool]]:
+    """Loads several images in parallel on the shared fetch pool.
+
+    Raises:
+        DeadlineExceeded: If the request's deadline passes first (nothing can be analyzed without the images)
+    """
+    check("image_load")
+    if len(sources) <= 1:
+        return [_load_image_record(s) for s in sources]
+    pool = _get_io_pool()
+    futures = [pool.submit(propagate(_load_image_record), s) for s in sources]
+    try:
+        return [f.result(timeout=remaining()) for f in futures]
+    except FuturesTimeoutError:
+        degrade("image_load")
+        raise DeadlineExceeded("Request deadline exceeded while loading images")
+
+def _fetch_image_bytes(source: str) -> Tuple[Optional[bytes], Optional[str]]:
     if not source:
         return None, None
     # Base64 data URI
@@ -136,20 +277,11 @@ def _load_image_bytes(source: str) -> Tuple[Optional[bytes], Optional[str]]:
         except Exception:
             return None, None
     # Otherwise, treat as URL
-    if requests is None:
-        return None, None
-    try:
-        resp = requests.get(source, timeout=20)
-        if resp.status_code == 200:
-            mime = resp.headers.get('Content-Type', '').split(';')[0] or None
-            return resp.content, mime
-    except Exception:
-        return None, None
-    return None, None
+    return get_fetcher().fetch(source, timeout=remaining())
 
 def _get_image_info(img_bytes: Optional[bytes]) -> Dict[str, Any]:
     info: Dict[str, Any] = {"resolution": None, "exif_present": False, "camera_make": None, "camera_model": None, "datetime": None}
-    if Image is None or not img_bytes:
+    if not img_bytes or not Image.available:
         return info
     try:
         with Image.open(io.BytesIO(img_bytes)) as im:
@@ -157,7 +289,7 @@ def _get_image_info(img_bytes: Optional[bytes]) -> Dict[str, Any]:
             exif = getattr(im, "_getexif", lambda: None)()
             if exif:
                 info["exif_present"] = True
-                inv = {v: k for k, v in ExifTags.TAGS.items()} if ExifTags else {}
+                inv = {v: k for k, v in ExifTags.TAGS.items()} if ExifTags.available else {}
                 def get_tag(tag_name: str) -> Optional[str]:
                     key = inv.get(tag_name)
                     return str(exif.get(key)) if key in exif else None
@@ -168,6 +300,11 @@ def _get_image_info(img_bytes: Optional[bytes]) -> Dict[str, Any]:
         pass
     return info
 
+def _image_info(record: ImageRecord) -> Dict[str, Any]:
+    if record.info is None:
+        get_image_cache().attach(record, info=_get_image_info(record.data))
+    return dict(record.info or {})
+
 def _normalize_diff_item(item: Dict[str, Any]) -> Dict[str, Any]:
     # Ensure strict schema fields exist with fallbacks
     return {
@@ -183,14 +320,19 @@ def _normalize_diff_item(item: Dict[str, Any]) -> Dict[str, Any]:
         "tis_delta": int(item.get("tis_delta") or 0),
     }
 
-def _split_packed(source: Any) -> List[str]:
+def _split_packed(source: Any) -> List[Source]:
     if source is None:
         return []
+    if isinstance(source, UploadedImage):
+        return [source]
     if isinstance(source, list):
-        out: List[str] = []
+        out: List[Source] = []
         for s in source:
             if s is None:
                 continue
+            if isinstance(s, UploadedImage):
+                out.append(s)
+                continue
             v = str(s).strip()
             if v:
                 out.append(v)
@@ -296,12 +438,27 @@ def _compute_overall(differences: List[Dict[str, Any]]) -> Tuple[int, str, float
     
     return tis, assessment, avg_confidence, notes
 
-def _call_gemini(baseline: Tuple[Optional[bytes], Optional[str]], current: Tuple[Optional[bytes], Optional[str]], view_label: Optional[str] = None) -> List[Dict[str, Any]]:
-    if call_gemini_ensemble is None:
+def _call_gemini(baseline_rec: ImageRecord, current_rec: ImageRecord, view_label: Optional[str] = None, info: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Gemini findings for a pair, sent as bounded-size copies (see preprocess.py).
+
+    Each finding with a bbox also gets ``bbox_px``: the box in pixels of the
+    original current image.
+    """
+    if not _ai.available or not _ai._configure_genai():
         return []
     try:
-        items = call_gemini_ensemble(baseline, current, view_label=view_label)
-        return [_normalize_diff_item(it) for it in items if isinstance(it, dict)]
+        with stage("model_preprocess"):
+            pool = _get_io_pool()
+            futures = [pool.submit(propagate(prepare_for_model), rec) for rec in (baseline_rec, current_rec)]
+            baseline, current = (f.result() for f in futures)
+        items = _ai.call_gemini_ensemble((baseline.data, baseline.mime), (current.data, current.mime),
+                                         view_label=view_label, cache_tag=SCORING_VERSION, info=info)
+        differences = [_normalize_diff_item(it) for it in items if isinstance(it, dict)]
+        for d in differences:
+            bbox_px = bbox_to_original(d.get("bbox"), current)
+            if bbox_px is not None:
+                d["bbox_px"] = bbox_px
+        return differences
     except Exception:
         return []
 
@@ -312,207 +469,119 @@ def _assess_from_tis(tis: int) -> Tuple[str, str]:
         return "MODERATE_RISK", "Moderate risk detected - supervisor review recommended"
     return "HIGH_RISK", "High risk detected - immediate quarantine required"
 
-def _region_from_bbox(x: int, y: int, w: int, h: int, img_w: int, img_h: int) -> str:
-    cx = x + (w / 2.0)
-    cy = y + (h / 2.0)
-    if cy < img_h / 3.0:
-        v = "top"
-    elif cy > (2.0 * img_h) / 3.0:
-        v = "bottom"
-    else:
-        v = "middle"
-    if cx < img_w / 3.0:
-        u = "left"
-    elif cx > (2.0 * img_w) / 3.0:
-        u = "right"
-    else:
-        u = "center"
-    return f"{v}-{u}"
-
-def _decode_cv2(img_bytes: bytes):
-    if cv2 is None or np is None:
-        return None
-    arr = np.frombuffer(img_bytes, dtype=np.uint8)
-    im = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-    return im
-
-def _classical_diff_regions(baseline_bytes: bytes, current_bytes: bytes) -> List[Dict[str, Any]]:
-    if cv2 is None or np is None:
-        return []
-
-    bgr1 = _decode_cv2(baseline_bytes)
-    bgr2 = _decode_cv2(current_bytes)
-    if bgr1 is None or bgr2 is None:
+@stage("classical_diff")
+def _classical_diff_regions(baseline_image: Any, current_image: Any) -> List[Dict[str, Any]]:
+    """Classical CV region proposals; accepts ImageRecords, encoded bytes or decoded BGR arrays."""
+    if not _cv_ready() or not _vision.available:
         return []
-
-    h1, w1 = bgr1.shape[:2]
-    h2, w2 = bgr2.shape[:2]
-    h = min(h1, h2)
-    w = min(w1, w2)
-    if h < 32 or w < 32:
-        return []
-
-    if (h1, w1) != (h, w):
-        bgr1 = cv2.resize(bgr1, (w, h), interpolation=cv2.INTER_AREA)
-    if (h2, w2) != (h, w):
-        bgr2 = cv2.resize(bgr2, (w, h), interpolation=cv2.INTER_AREA)
-
-    g1 = cv2.cvtColor(bgr1, cv2.COLOR_BGR2GRAY)
-    g2 = cv2.cvtColor(bgr2, cv2.COLOR_BGR2GRAY)
-
-    g1 = cv2.GaussianBlur(g1, (5, 5), 0)
-    g2 = cv2.GaussianBlur(g2, (5, 5), 0)
-
-    absdiff = cv2.absdiff(g1, g2)
-    mean_abs = float(np.mean(absdiff)) / 255.0
-
-    _, th = cv2.threshold(absdiff, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
-    th = cv2.morphologyEx(th, cv2.MORPH_OPEN, kernel, iterations=1)
-    th = cv2.morphologyEx(th, cv2.MORPH_CLOSE, kernel, iterations=2)
-
-    contours, _ = cv2.findContours(th, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    img_area = float(w * h)
-
-    diffs: List[Dict[str, Any]] = []
-    idx = 0
-    total_changed_area = 0.0
-    candidates = []
-    for c in contours:
-        area = float(cv2.contourArea(c))
-        if area <= 0:
-            continue
-        area_ratio = area / img_area
-        if area_ratio < 0.0015:
-            continue
-        candidates.append((area, c))
-
-    candidates.sort(key=lambda t: t[0], reverse=True)
-    for area, c in candidates[:3]:
-        area_ratio = area / img_area
-        x, y, bw, bh = cv2.boundingRect(c)
-        region = _region_from_bbox(int(x), int(y), int(bw), int(bh), w, h)
-        total_changed_area += area
-
-        if area_ratio >= 0.04:
-            severity = "HIGH"
-            tis_delta = -int(_clamp(int(round(area_ratio * 120)), 6, 14))
-            confidence = min(0.98, 0.75 + area_ratio)
-            suggested_action = "Quarantine"
-        elif area_ratio >= 0.015:
-            severity = "MEDIUM"
-            tis_delta = -int(_clamp(int(round(area_ratio * 90)), 4, 10))
-            confidence = min(0.95, 0.65 + (area_ratio * 2.0))
-            suggested_action = "Review"
-        else:
-            severity = "LOW"
-            tis_delta = -int(_clamp(int(round(area_ratio * 70)), 2, 6))
-            confidence = min(0.9, 0.55 + (area_ratio * 3.0))
-            suggested_action = "Review"
-
-        diffs.append({
-            "id": f"cv-{idx}",
-            "region": region,
-            "bbox": [int(x), int(y), int(bw), int(bh)],
-            "type": "physical_damage",
-            "description": "Classical CV detected visual change consistent with damage/deformation.",
-            "severity": severity,
-            "confidence": float(confidence),
-            "explainability": [],
-            "suggested_action": suggested_action,
-            "tis_delta": int(tis_delta),
-        })
-        idx += 1
-
-    changed_ratio = float(total_changed_area / img_area) if img_area > 0 else 0.0
-    if not diffs:
-        if mean_abs >= 0.06:
-            impact = max(mean_abs * 120.0, changed_ratio * 200.0)
-            diffs.append({
-                "id": "cv-global",
-                "region": "global",
-                "bbox": None,
-                "type": "global_mismatch",
-                "description": "Classical CV detected a strong global mismatch between images.",
-                "severity": "HIGH" if mean_abs >= 0.12 else "MEDIUM",
-                "confidence": 0.85 if mean_abs >= 0.12 else 0.7,
-                "explainability": [],
-                "suggested_action": "Quarantine" if mean_abs >= 0.12 else "Review",
-                "tis_delta": -int(_clamp(int(round(impact)), 8, 26)) if mean_abs >= 0.12 else -int(_clamp(int(round(impact * 0.8)), 5, 18)),
-            })
-    else:
-        if mean_abs >= 0.10 or changed_ratio >= 0.06:
-            impact = max(mean_abs * 140.0, changed_ratio * 240.0)
-            diffs.append({
-                "id": "cv-global-severity",
-                "region": "global",
-                "bbox": None,
-                "type": "global_damage_indicator",
-                "description": "Classical CV indicates widespread change across the package surface.",
-                "severity": "HIGH",
-                "confidence": 0.9,
-                "explainability": [],
-                "suggested_action": "Quarantine",
-                "tis_delta": -int(_clamp(int(round(impact)), 8, 24)),
-            })
-
-    return diffs
-
-def _analyze_pair(baseline_src: str, current_src: str, view_label: str) -> Dict[str, Any]:
-    baseline_bytes, baseline_mime = _load_image_bytes(baseline_src)
-    current_bytes, current_mime = _load_image_bytes(current_src)
-
-    if not baseline_bytes:
+    return _vision.classical_diff_regions(baseline_image, current_image)
+
+class _ViewInputs:
+    """Loaded images and image info of one view."""
+
+    __slots__ = ("label", "baseline", "current", "baseline_hit", "current_hit", "baseline_info", "current_info")
+
+    def __init__(self, label: str, baseline: ImageRecord, current: ImageRecord, baseline_hit: bool, current_hit: bool):
+        self.label = label
+        self.baseline = baseline
+        self.current = current
+        self.baseline_hit = baseline_hit
+        self.current_hit = current_hit
+        with stage("exif_probe"):
+            self.baseline_info = _image_info(baseline)
+            self.current_info = _image_info(current)
+
+def _load_view(baseline_src: Source, current_src: Source, view_label: str) -> _ViewInputs:
+    with stage("image_load"):
+        (baseline_rec, baseline_hit), (current_rec, current_hit) = _load_image_records([baseline_src, current_src])
+    for hit in (baseline_hit, current_hit):
+        inc("boxity_cache_requests_total", {"cache": "image", "result": "hit" if hit else "miss"})
+
+    if baseline_rec is None:
         raise ValueError(f"Failed to load baseline image for {view_label}")
-    if not current_bytes:
+    if current_rec is None:
         raise ValueError(f"Failed to load current image for {view_label}")
+    return _ViewInputs(view_label, baseline_rec, current_rec, baseline_hit, current_hit)
 
-    baseline_info = _get_image_info(baseline_bytes)
-    current_info = _get_image_info(current_bytes)
-
-    differences = _call_gemini((baseline_bytes, baseline_mime), (current_bytes, current_mime), view_label=view_label)
-    gemini_diff_count = len(differences)
+def _gemini_differences(view: _ViewInputs, gemini_info: Dict[str, Any]) -> List[Dict[str, Any]]:
+    differences = _call_gemini(view.baseline, view.current, view_label=view.label, info=gemini_info)
     for d in differences:
-        d["view"] = view_label
-
-    avg_conf = sum(d.get("confidence", 0) for d in differences) / max(1, len(differences)) if differences else 0.0
-    total_impact = sum(abs(int(d.get("tis_delta", 0))) for d in differences) if differences else 0
+        d["view"] = view.label
+    return differences
 
-    cv_ready = bool(cv2 is not None and np is not None)
-    cv_used = False
+def _needs_cv(differences: List[Dict[str, Any]]) -> bool:
+    """Whether Gemini's findings are too weak to stand alone (none, low confidence or no impact)."""
+    if not differences:
+        return True
+    avg_conf = sum(d.get("confidence", 0) for d in differences) / len(differences)
+    total_impact = sum(abs(int(d.get("tis_delta", 0))) for d in differences)
+    return avg_conf < 0.6 or total_impact == 0
 
-    if (not differences or avg_conf < 0.6 or total_impact == 0) and baseline_bytes and current_bytes:
-        cv_regions = []
-        try:
-            if align_and_normalize is not None and cv2 is not None:
-                ab, ac = align_and_normalize(baseline_bytes, current_bytes)
-                if ab is not None and ac is not None:
-                    cv_regions = _classical_diff_regions(cv2.imencode('.jpg', ab)[1].tobytes(), cv2.imencode('.jpg', ac)[1].tobytes())
-            if not cv_regions:
-                cv_regions = _classical_diff_regions(baseline_bytes, current_bytes)
-        except Exception as e:
-            print("classical diff error:", str(e), file=sys.stderr)
-            cv_regions = _classical_diff_regions(baseline_bytes, current_bytes)
+def _cv_differences(view: _ViewInputs, alignment: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """Classical CV regions of a view, or None when CV did not run (unavailable, timed out or out of time)."""
+    if not (view.baseline.data and view.current.data) or not (_cv_ready() and _vision.available):
+        return None
+    if expired():
+        degrade("cv")
+        return None
+    try:
+        # Aligned diff, falling back to the raw one; in the CV process pool when enabled
+        cv_regions = cv_fallback_regions(view.baseline, view.current, info=alignment)
+    except DeadlineExceeded:
+        degrade("cv")
+        return None
+    except TimeoutError as e:
+        # A pool task over CV_POOL_TIMEOUT would take as long again on this thread
+        print("classical diff error:", str(e), file=sys.stderr)
+        return None
+    except Exception as e:
+        print("classical diff error:", str(e), file=sys.stderr)
+        if expired():
+            degrade("cv")
+            return None
+        cv_regions = _classical_diff_regions(view.baseline, view.current)
+    for r in cv_regions:
+        r["view"] = view.label
+    return cv_regions
+
+def _merge_differences(differences: List[Dict[str, Any]], cv_regions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    if not differences:
+        return list(cv_regions)
+    merged = list(differences)
+    seen = {d.get("id") for d in differences}
+    for r in cv_regions:
+        if r.get("id") not in seen:
+            merged.append(r)
+    return merged
+
+INDETERMINATE_NOTES = "No analyzer produced a result (Gemini and classical CV unavailable or out of time) - integrity unknown, manual inspection required"
+
+def _error_body(error: str, **extra: Any) -> Dict[str, Any]:
+    """Body of a failed analysis: like an indeterminate verdict, no score and an UNKNOWN assessment."""
+    return {
+        "error": error,
+        **extra,
+        "differences": [],
+        "aggregate_tis": None,
+        "overall_assessment": "UNKNOWN",
+        "confidence_overall": None,
+    }
 
-        if cv_regions:
-            cv_used = True
-            for r in cv_regions:
-                r["view"] = view_label
-            if differences:
-                seen = {d.get("id") for d in differences}
-                for r in cv_regions:
-                    if r.get("id") not in seen:
-                        differences.append(r)
-            else:
-                differences = cv_regions
-
-    tis, assessment, conf_overall, notes = _compute_overall(differences)
+def _view_result(view: _ViewInputs, differences: List[Dict[str, Any]], gemini_diff_count: int,
+                 gemini_info: Dict[str, Any], cv_used: bool, alignment: Dict[str, Any],
+                 determinate: bool = True) -> Dict[str, Any]:
+    """Per-view result; without a ``determinate`` verdict the score, assessment and confidence are left unknown."""
+    if determinate:
+        with stage("scoring"):
+            tis, assessment, conf_overall, notes = _compute_overall(differences)
+    else:
+        tis, assessment, conf_overall, notes = None, "UNKNOWN", None, INDETERMINATE_NOTES
 
     return {
-        "view": view_label,
+        "view": view.label,
         "differences": differences,
-        "baseline_image_info": baseline_info,
-        "current_image_info": current_info,
+        "baseline_image_info": view.baseline_info,
+        "current_image_info": view.current_info,
         "aggregate_tis": tis,
         "overall_assessment": assessment,
         "confidence_overall": conf_overall,
@@ -524,165 +593,517 @@ def _analyze_pair(baseline_src: str, current_src: str, view_label: str) -> Dict[
             "low_severity_count": len([d for d in differences if str(d.get("severity", "")).upper() == "LOW"]),
             "analysis_timestamp": str(datetime.now().isoformat()) if 'datetime' in globals() else "unknown",
             "scoring_version": SCORING_VERSION,
+            "analysis_status": "complete" if determinate else "indeterminate",
             "gemini_diff_count": int(gemini_diff_count),
-            "cv_ready": bool(cv_ready),
+            "cv_ready": _cv_ready(),
             "cv_used": bool(cv_used),
+            "alignment": alignment or None,
+            "gemini_cache": gemini_info.get("cache", "unavailable"),
+            "gemini_skipped": gemini_info.get("skipped"),
+            "coalesced": False,
+            "deadline": deadline_report(),
+            "image_cache": {
+                "baseline_hit": bool(view.baseline_hit),
+                "current_hit": bool(view.current_hit),
+                **get_image_cache().stats(),
+            },
         },
     }
 
-@app.route("/analyze", methods=["POST", "OPTIONS"])
-def analyze():
-    try:
-        if request.method == "OPTIONS":
-            return ("", 204)
-
-        analyzers_available = (call_gemini_ensemble is not None) or (cv2 is not None and np is not None)
-        if not analyzers_available:
-            return jsonify({
-                "error": "No analyzers available: Gemini is unavailable and OpenCV/Numpy are unavailable.",
-                "differences": [],
-                "aggregate_tis": 100,
-                "overall_assessment": "UNKNOWN",
-            }), 500
-
-        gemini_ready = _configure_genai()
-
-        data = request.get_json(silent=True) or {}
-
-        baseline_angle1 = data.get("baseline_angle1") or data.get("baseline_1")
-        baseline_angle2 = data.get("baseline_angle2") or data.get("baseline_2")
-        current_angle1 = data.get("current_angle1") or data.get("current_1")
-        current_angle2 = data.get("current_angle2") or data.get("current_2")
+def _final_view_result(view: _ViewInputs, differences: List[Dict[str, Any]], gemini_info: Dict[str, Any],
+                       cv_regions: Callable[[Dict[str, Any]], Optional[List[Dict[str, Any]]]]) -> Dict[str, Any]:
+    """Scores Gemini's findings, adding CV regions (``cv_regions(alignment)``) when they are weak.
 
-        if baseline_angle1 or baseline_angle2 or current_angle1 or current_angle2:
-            baseline_sources = [s for s in [baseline_angle1, baseline_angle2] if s]
-            current_sources = [s for s in [current_angle1, current_angle2] if s]
+    The verdict is indeterminate when Gemini gave no answer and CV did not
+    run: an empty difference list then means "not analyzed", not "no damage".
+    """
+    alignment: Dict[str, Any] = {}
+    gemini_diff_count = len(differences)
+    cv_used = False
+    determinate = True
+    if _needs_cv(differences):
+        regions = cv_regions(alignment)
+        determinate = regions is not None or bool(gemini_info.get("answered"))
+        if regions:
+            cv_used = True
+            differences = _merge_differences(differences, regions)
+
+    inc("boxity_views_analyzed_total")
+    if cv_used:
+        inc("boxity_cv_fallback_total")
+    if not determinate:
+        inc("boxity_views_indeterminate_total")
+    return _view_result(view, differences, gemini_diff_count, gemini_info, cv_used, alignment, determinate)
+
+_view_flights: "SingleFlight[Dict[str, Any]]" = SingleFlight()
+
+def _undegraded(result: Dict[str, Any]) -> bool:
+    deadline = result["analysis_metadata"].get("deadline")
+    return not (deadline and deadline["degraded"])
+
+def _budget_independent(error: BaseException) -> bool:
+    # A leader that ran out of its own (possibly shorter) budget says nothing about a follower's
+    return not isinstance(error, TimeoutError)
+
+def _analyze_pair(baseline_src: Source, current_src: Source, view_label: str) -> Dict[str, Any]:
+    view = _load_view(baseline_src, current_src, view_label)
+
+    def analyze_view() -> Dict[str, Any]:
+        gemini_info: Dict[str, Any] = {}
+        with reserve_for_fallback():
+            differences = _gemini_differences(view, gemini_info)
+        return _final_view_result(view, differences, gemini_info, lambda alignment: _cv_differences(view, alignment))
+
+    if not ANALYZE_COALESCE:
+        return analyze_view()
+    # Retries and duplicate scans of the same item wait for the analysis already running;
+    # a result or error caused by the leader's deadline is not shared
+    key = f"{view.baseline.digest}:{view.current.digest}:{view_label}"
+    try:
+        result, shared = _view_flights.do(key, analyze_view, timeout=remaining(),
+                                          reusable=_undegraded, shareable=_budget_independent)
+    except FlightTimeout:
+        # This request's deadline passed while waiting: no verdict rather than a rerun with no time left
+        degrade("shared_analysis")
+        inc("boxity_views_analyzed_total")
+        inc("boxity_views_indeterminate_total")
+        return _view_result(view, [], 0, {}, False, {}, determinate=False)
+    if not shared:
+        return result
+    inc("boxity_analyses_coalesced_total")
+    result = copy.deepcopy(result)
+    metadata = result["analysis_metadata"]
+    metadata.update(coalesced=True, deadline=deadline_report())
+    metadata["image_cache"].update(baseline_hit=bool(view.baseline_hit), current_hit=bool(view.current_hit))
+    return result
+
+def _single_source(value: Any, name: str) -> Source:
+    """One image source: an upload, or a URL / base64 / data-URL string.
+
+    Raises:
+        ValueError: If ``value`` is a list (several files for one image) or not a string
+    """
+    if not value or isinstance(value, (str, UploadedImage)):
+        return value
+    if isinstance(value, list):
+        raise ValueError(f"{name} must be a single image, got {len(value)}")
+    raise ValueError(f"{name} must be an image URL, base64 string or uploaded file")
+
+def _view_source(view: Dict[str, Any], side: str) -> Source:
+    return view.get(side) or view.get(f"{side}_url") or view.get(f"{side}_b64")
+
+def _parse_views(data: Dict[str, Any]) -> List[Tuple[str, Source, Source]]:
+    """Extracts the (label, baseline, current) views of an /analyze request body.
+
+    Views come from, in order of precedence: a ``views`` list of
+    ``{"baseline", "current", "label"}`` objects; numbered
+    ``baseline_angleN``/``current_angleN`` (or ``baseline_N``/``current_N``)
+    fields; or equally long packed ``baseline``/``current`` lists. Views are
+    labelled ``angle_N`` unless a label is given.
+
+    Raises:
+        ValueError: If no view is given, a view lacks one of its images or
+            has a malformed one, or there are more than ANALYZE_MAX_VIEWS views
+    """
+    views: List[Tuple[str, Source, Source]] = []
+    if data.get("views") is not None:
+        if not isinstance(data["views"], list):
+            raise ValueError("views must be a list of {baseline, current} objects")
+        for i, view in enumerate(data["views"], start=1):
+            if not isinstance(view, dict):
+                raise ValueError(f"View {i} must be an object with baseline and current images")
+            baseline_src = _single_source(_view_source(view, "baseline"), f"View {i} baseline")
+            current_src = _single_source(_view_source(view, "current"), f"View {i} current")
+            if not baseline_src or not current_src:
+                raise ValueError(f"View {i} requires both a baseline and a current image")
+            label = view.get("label")
+            views.append((str(label)[:64] if label else f"angle_{i}", baseline_src, current_src))
+    else:
+        numbered = set()
+        for key in data:
+            for prefix in ("baseline_angle", "current_angle", "baseline_", "current_"):
+                suffix = key[len(prefix):] if key.startswith(prefix) else ""
+                if suffix.isdigit() and int(suffix) > 0:
+                    numbered.add(int(suffix))
+        if numbered:
+            for n in sorted(numbered):
+                baseline_src = _single_source(data.get(f"baseline_angle{n}") or data.get(f"baseline_{n}"), f"angle_{n} baseline")
+                current_src = _single_source(data.get(f"current_angle{n}") or data.get(f"current_{n}"), f"angle_{n} current")
+                if not baseline_src and not current_src:
+                    continue
+                if not baseline_src or not current_src:
+                    raise ValueError(f"View angle_{n} requires both a baseline and a current image")
+                views.append((f"angle_{n}", baseline_src, current_src))
         else:
             baseline_src = data.get("baseline_url") or data.get("baseline_b64") or data.get("baseline")
             current_src = data.get("current_url") or data.get("current_b64") or data.get("current")
             baseline_sources = _split_packed(baseline_src)
             current_sources = _split_packed(current_src)
+            if baseline_sources and current_sources:
+                if len(baseline_sources) != len(current_sources):
+                    raise ValueError(
+                        f"Multi-view analysis requires as many baseline as current images "
+                        f"(got {len(baseline_sources)} and {len(current_sources)})")
+                views = [(f"angle_{i}", b, c) for i, (b, c) in enumerate(zip(baseline_sources, current_sources), start=1)]
+
+    if not views:
+        raise ValueError("Missing baseline/current image inputs")
+    if len(views) > ANALYZE_MAX_VIEWS:
+        raise ValueError(f"At most {ANALYZE_MAX_VIEWS} views per request")
+    return views
+
+def _request_budget_ms(data: Dict[str, Any], header: Optional[str] = None) -> Optional[float]:
+    """Deadline asked for by the client: the X-Deadline-Ms header, else the body's "deadline_ms"."""
+    return parse_budget_ms(header) or parse_budget_ms(data.get("deadline_ms"))
+
+def _run_analysis(data: Dict[str, Any], gemini_ready: bool, deadline_header: Optional[str] = None) -> Dict[str, Any]:
+    """Runs a full single- or multi-view analysis for one /analyze request body.
+
+    Stage timings are recorded for /metrics and, when requested, returned in
+    ``analysis_metadata.timings_ms`` (stages of parallel views are summed).
+    Under a deadline (see deadline.py) Gemini and CV are cut short as needed
+    and ``analysis_metadata.deadline`` lists what was degraded.
+
+    Raises:
+        ValueError: If inputs are missing/invalid or an image cannot be loaded
+        DeadlineExceeded: If the deadline passes before the images are loaded
+    """
+    with deadline_scope(_request_budget_ms(data, deadline_header)), request_scope() as timings:
+        response = _analyze_request(data, gemini_ready)
+        if RETURN_TIMINGS or data.get("include_timings"):
+            response["analysis_metadata"]["timings_ms"] = timings.as_dict()
+        return response
+
+def _analyze_request(data: Dict[str, Any], gemini_ready: bool) -> Dict[str, Any]:
+    views = _parse_views(data)
+
+    # Backwards compatible: single baseline + single current
+    if len(views) == 1:
+        _, baseline_src, current_src = views[0]
+        return _analysis_response([_analyze_pair(baseline_src, current_src, view_label="single")], gemini_ready)
+
+    # Multi-view mode: every pair is analyzed in parallel on the shared view pool
+    results = _run_concurrently([
+        (lambda label=label, b=b, c=c: _analyze_pair(b, c, view_label=label))
+        for label, b, c in views
+    ])
+    return _analysis_response(results, gemini_ready)
+
+def _analysis_response(results: List[Dict[str, Any]], gemini_ready: bool) -> Dict[str, Any]:
+    """The /analyze response for per-view results: a single view as is, several views aggregated."""
+    if len(results) == 1:
+        result = results[0]
+        response = {
+            "differences": result["differences"],
+            "baseline_image_info": result["baseline_image_info"],
+            "current_image_info": result["current_image_info"],
+            "aggregate_tis": result["aggregate_tis"],
+            "overall_assessment": result["overall_assessment"],
+            "confidence_overall": result["confidence_overall"],
+            "notes": result["notes"],
+            "analysis_metadata": {
+                **result["analysis_metadata"],
+                "gemini_ready": bool(gemini_ready),
+                "cv_ready": _cv_ready(),
+            },
+        }
+        return response
 
-        if len(baseline_sources) == 0 or len(current_sources) == 0:
-            return jsonify({
-                "error": "Missing baseline/current image inputs",
-                "differences": [],
-                "aggregate_tis": 100,
-                "overall_assessment": "UNKNOWN",
-            }), 400
-
-        # Backwards compatible: single baseline + single current
-        if len(baseline_sources) == 1 and len(current_sources) == 1:
-            result = _analyze_pair(str(baseline_sources[0]), str(current_sources[0]), view_label="single")
-            response = {
-                "differences": result["differences"],
-                "baseline_image_info": result["baseline_image_info"],
-                "current_image_info": result["current_image_info"],
-                "aggregate_tis": result["aggregate_tis"],
-                "overall_assessment": result["overall_assessment"],
-                "confidence_overall": result["confidence_overall"],
-                "notes": result["notes"],
-                "analysis_metadata": {
-                    **result["analysis_metadata"],
-                    "gemini_ready": bool(gemini_ready),
-                    "cv_ready": bool(cv2 is not None and np is not None),
-                },
-            }
-            return jsonify(response)
-
-        # Two-angle mode: require exactly 2 baseline and 2 current
-        if not (len(baseline_sources) == 2 and len(current_sources) == 2):
-            return jsonify({
-                "error": "Two-angle analysis requires exactly 2 baseline and 2 current images",
-                "differences": [],
-                "aggregate_tis": 100,
-                "overall_assessment": "UNKNOWN",
-            }), 400
-
-        r1 = _analyze_pair(str(baseline_sources[0]), str(current_sources[0]), view_label="angle_1")
-        r2 = _analyze_pair(str(baseline_sources[1]), str(current_sources[1]), view_label="angle_2")
-
-        # Prefix IDs so merged list doesn't collide
-        diffs: List[Dict[str, Any]] = []
-        for d in r1["differences"]:
-            d2 = dict(d)
-            d2["id"] = f"a1-{d2.get('id', 'diff')}"
-            diffs.append(d2)
-        for d in r2["differences"]:
+    # Prefix IDs so merged list doesn't collide
+    diffs: List[Dict[str, Any]] = []
+    for i, r in enumerate(results, start=1):
+        for d in r["differences"]:
             d2 = dict(d)
-            d2["id"] = f"a2-{d2.get('id', 'diff')}"
+            d2["id"] = f"a{i}-{d2.get('id', 'diff')}"
             diffs.append(d2)
 
-        tis1 = int(r1["aggregate_tis"])
-        tis2 = int(r2["aggregate_tis"])
-        tis_avg = int(round((tis1 + tis2) / 2.0))
-        conf_avg = float(r1.get("confidence_overall", 0.0) + r2.get("confidence_overall", 0.0)) / 2.0
-
-        # Security posture: keep aggregate score as average, but assessment/notes based on the worst view
-        tis_worst = min(tis1, tis2)
+    angle_tis = [r["aggregate_tis"] for r in results]
+    tis_values = [int(tis) for tis in angle_tis if tis is not None]
+    unknown = [r["view"] for r in results if r["aggregate_tis"] is None]
+
+    # Security posture: keep aggregate score as average, but assessment/notes based on the worst view
+    tis_worst = min(tis_values) if tis_values else None
+    tis_avg = conf_avg = None
+    status = "complete"
+    if not unknown:
+        tis_avg = int(round(sum(tis_values) / float(len(tis_values))))
+        conf_avg = float(sum(r.get("confidence_overall", 0.0) for r in results)) / len(results)
         assessment, notes = _assess_from_tis(tis_worst)
+    elif tis_worst is not None and _assess_from_tis(tis_worst)[0] == "HIGH_RISK":
+        # Views without a verdict cannot make the worst one any better
+        status = "partial"
+        assessment, notes = _assess_from_tis(tis_worst)
+        notes = f"{notes} (no verdict for {', '.join(unknown)})"
+    else:
+        status = "indeterminate"
+        assessment, notes = "UNKNOWN", f"No verdict for {', '.join(unknown)} - integrity unknown, manual inspection required"
+
+    response = {
+        "differences": diffs,
+        "baseline_image_info": {"angles": [r["baseline_image_info"] for r in results]},
+        "current_image_info": {"angles": [r["current_image_info"] for r in results]},
+        "aggregate_tis": tis_avg,
+        "overall_assessment": assessment,
+        "confidence_overall": conf_avg,
+        "notes": notes,
+        "angle_results": [
+            {
+                "view": r["view"],
+                "aggregate_tis": r["aggregate_tis"],
+                "overall_assessment": r["overall_assessment"],
+                "confidence_overall": r["confidence_overall"],
+                "notes": r["notes"],
+                "differences": r["differences"],
+                "analysis_metadata": r["analysis_metadata"],
+            }
+            for r in results
+        ],
+        "analysis_metadata": {
+            "total_differences": len(diffs),
+            "high_severity_count": len([d for d in diffs if str(d.get("severity", "")).upper() == "HIGH"]),
+            "medium_severity_count": len([d for d in diffs if str(d.get("severity", "")).upper() == "MEDIUM"]),
+            "low_severity_count": len([d for d in diffs if str(d.get("severity", "")).upper() == "LOW"]),
+            "analysis_timestamp": str(datetime.now().isoformat()) if 'datetime' in globals() else "unknown",
+            **{f"angle_{i}_tis": tis for i, tis in enumerate(angle_tis, start=1)},
+            "angle_tis_min": tis_worst,
+            "angle_tis_max": max(tis_values) if tis_values else None,
+            "view_count": len(results),
+            "scoring_version": SCORING_VERSION,
+            "analysis_status": status,
+            "gemini_ready": bool(gemini_ready),
+            "cv_ready": _cv_ready(),
+            "deadline": deadline_report(),
+            "image_cache": get_image_cache().stats(),
+        },
+    }
 
-        response = {
-            "differences": diffs,
-            "baseline_image_info": {"angles": [r1["baseline_image_info"], r2["baseline_image_info"]]},
-            "current_image_info": {"angles": [r1["current_image_info"], r2["current_image_info"]]},
-            "aggregate_tis": tis_avg,
-            "overall_assessment": assessment,
-            "confidence_overall": conf_avg,
-            "notes": notes,
-            "angle_results": [
-                {
-                    "view": "angle_1",
-                    "aggregate_tis": r1["aggregate_tis"],
-                    "overall_assessment": r1["overall_assessment"],
-                    "confidence_overall": r1["confidence_overall"],
-                    "notes": r1["notes"],
-                    "differences": r1["differences"],
-                    "analysis_metadata": r1["analysis_metadata"],
-                },
-                {
-                    "view": "angle_2",
-                    "aggregate_tis": r2["aggregate_tis"],
-                    "overall_assessment": r2["overall_assessment"],
-                    "confidence_overall": r2["confidence_overall"],
-                    "notes": r2["notes"],
-                    "differences": r2["differences"],
-                    "analysis_metadata": r2["analysis_metadata"],
-                },
-            ],
-            "analysis_metadata": {
-                "total_differences": len(diffs),
-                "high_severity_count": len([d for d in diffs if str(d.get("severity", "")).upper() == "HIGH"]),
-                "medium_severity_count": len([d for d in diffs if str(d.get("severity", "")).upper() == "MEDIUM"]),
-                "low_severity_count": len([d for d in diffs if str(d.get("severity", "")).upper() == "LOW"]),
-                "analysis_timestamp": str(datetime.now().isoformat()) if 'datetime' in globals() else "unknown",
-                "angle_1_tis": tis1,
-                "angle_2_tis": tis2,
-                "angle_tis_min": tis_worst,
-                "angle_tis_max": max(tis1, tis2),
-                "scoring_version": SCORING_VERSION,
-                "gemini_ready": bool(gemini_ready),
-                "cv_ready": bool(cv2 is not None and np is not None),
-            },
-        }
+    return response
 
-        return jsonify(response)
+@app.route("/analyze", methods=["POST", "OPTIONS"])
+def analyze():
+    try:
+        if request.method == "OPTIONS":
+            return ("", 204)
+
+        analyzers_available = _ai.available or _cv_ready()
+        if not analyzers_available:
+            return jsonify(_error_body("No analyzers available: Gemini is unavailable and OpenCV/Numpy are unavailable.")), 500
+
+        gemini_ready = _configure_genai()
+
+        if is_upload_request(request):
+            data = parse_upload_request(request)
+        else:
+            data = request.get_json(silent=True) or {}
+
+        return jsonify(_run_analysis(data, gemini_ready, request.headers.get("X-Deadline-Ms")))
+    except UploadError as ue:
+        return jsonify(_error_body(str(ue))), ue.status
     except ValueError as ve:
-        return jsonify({
-            "error": str(ve),
-            "differences": [],
-            "aggregate_tis": 100,
-            "overall_assessment": "UNKNOWN",
-        }), 400
+        return jsonify(_error_body(str(ve))), 400
+    except DeadlineExceeded as de:
+        return jsonify(_error_body(str(de))), 504
     except Exception as e:
         tb = traceback.format_exc()
         print("Exception in /analyze:", tb, file=sys.stderr)
         # return error info (status 500) so client sees problem
-        return jsonify({
-            "error": "Analyzer internal error",
-            "details": str(e),
-            "traceback": tb,
-            "differences": [],
-            "aggregate_tis": 100,
-            "overall_assessment": "UNKNOWN"
-        }), 500
\ No newline at end of file
+        return jsonify(_error_body("Analyzer internal error", details=str(e), traceback=tb)), 500
+
+def _analysis_outcome(data: Any, gemini_ready: bool, context: str,
+                      deadline_header: Optional[str] = None) -> Tuple[int, Dict[str, Any]]:
+    """Runs _run_analysis and maps errors to (status_code, error body) instead of raising."""
+    try:
+        if not isinstance(data, dict):
+            raise ValueError("Analysis request must be an object")
+        return 200, _run_analysis(data, gemini_ready, deadline_header)
+    except ValueError as ve:
+        return 400, _error_body(str(ve))
+    except DeadlineExceeded as de:
+        return 504, _error_body(str(de))
+    except Exception as e:
+        print(f"Exception in {context}:", traceback.format_exc(), file=sys.stderr)
+        return 500, _error_body("Analyzer internal error", details=str(e))
+
+def _run_batch_item(index: int, item: Any, gemini_ready: bool) -> Dict[str, Any]:
+    """Analyzes one batch item; errors are reported in the item's line, never raised."""
+    item_id = item.get("id") if isinstance(item, dict) else None
+    status, body = _analysis_outcome(item, gemini_ready, f"/analyze/batch item {index}")
+    return {"index": index, "id": item_id, "status": status, **body}
+
+@app.route("/analyze/batch", methods=["POST", "OPTIONS"])
+def analyze_batch():
+    """Analyzes many baseline/current pairs, streaming one NDJSON line per item as it completes.
+
+    Body: {"items": [<analyze request body>, ...]}; each item may carry an "id"
+    that is echoed back along with its position in "index".
+    """
+    if request.method == "OPTIONS":
+        return ("", 204)
+
+    analyzers_available = _ai.available or _cv_ready()
+    if not analyzers_available:
+        return jsonify(_error_body("No analyzers available: Gemini is unavailable and OpenCV/Numpy are unavailable.")), 500
+
+    data = request.get_json(silent=True) or {}
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        return jsonify(_error_body("Batch requires a non-empty 'items' list")), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify(_error_body(f"Batch exceeds the maximum of {BATCH_MAX_ITEMS} items")), 400
+
+    gemini_ready = _configure_genai()
+
+    def generate():
+        ex = ThreadPoolExecutor(max_workers=min(BATCH_MAX_WORKERS, len(items)), thread_name_prefix="analyze-batch")
+        try:
+            futures = [ex.submit(_run_batch_item, i, item, gemini_ready) for i, item in enumerate(items)]
+            for fut in as_completed(futures):
+                yield json.dumps(fut.result(), default=str) + "\n"
+        finally:
+            # Client went away or stream finished: drop items that have not started
+            ex.shutdown(wait=False, cancel_futures=True)
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+def _progressive_analysis(views: List[Tuple[str, Source, Source]], gemini_ready: bool) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yields ("provisional", response) from classical CV alone, then ("final", response).
+
+    The final response is what /analyze returns; without OpenCV only it is yielded.
+
+    Raises:
+        ValueError: If an image cannot be loaded
+    """
+    labels = ["single"] if len(views) == 1 else [label for label, _, _ in views]
+    inputs = _run_concurrently([
+        (lambda label=label, b=b, c=c: _load_view(b, c, label))
+        for label, (_, b, c) in zip(labels, views)
+    ])
+
+    pool = _get_view_pool()
+    gemini_infos: List[Dict[str, Any]] = [{} for _ in inputs]
+    gemini_futures = [pool.submit(propagate(_gemini_differences), v, info) for v, info in zip(inputs, gemini_infos)]
+    cv_futures = []
+    try:
+        cv_regions: Optional[List[List[Dict[str, Any]]]] = None
+        alignments: List[Dict[str, Any]] = [{} for _ in inputs]
+        if _cv_ready():
+            cv_futures = [pool.submit(propagate(_cv_differences), v, a) for v, a in zip(inputs, alignments)]
+            cv_regions = [f.result() for f in cv_futures]
+            provisional = [
+                _view_result(v, regions or [], 0, {"cache": "pending"}, bool(regions), alignment, regions is not None)
+                for v, regions, alignment in zip(inputs, cv_regions, alignments)
+            ]
+            yield "provisional", _analysis_response(provisional, gemini_ready)
+
+        def reuse_cv(i: int) -> Callable[[Dict[str, Any]], Optional[List[Dict[str, Any]]]]:
+            def regions(alignment: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+                if cv_regions is None:
+                    return _cv_differences(inputs[i], alignment)
+                alignment.update(alignments[i])
+                return cv_regions[i]
+            return regions
+
+        finals = [
+            _final_view_result(v, f.result(), info, reuse_cv(i))
+            for i, (v, f, info) in enumerate(zip(inputs, gemini_futures, gemini_infos))
+        ]
+        yield "final", _analysis_response(finals, gemini_ready)
+    finally:
+        # Client went away or a view failed: drop work that has not started
+        for f in gemini_futures + cv_futures:
+            f.cancel()
+
+def _stream_event(event: str, body: Dict[str, Any], sse: bool) -> str:
+    payload = json.dumps({"event": event, **body}, default=str)
+    return f"event: {event}\ndata: {payload}\n\n" if sse else payload + "\n"
+
+@app.route("/analyze/stream", methods=["POST", "OPTIONS"])
+def analyze_stream():
+    """/analyze with progressive results: a provisional CV verdict, then the final merged one.
+
+    Takes any /analyze request body (JSON or upload) and streams NDJSON lines,
+    or Server-Sent Events when the client accepts text/event-stream. Each
+    event carries "event" ("provisional", "final" or "error") and
+    "elapsed_ms" next to the usual response fields; errors carry "status".
+    """
+    if request.method == "OPTIONS":
+        return ("", 204)
+
+    analyzers_available = _ai.available or _cv_ready()
+    if not analyzers_available:
+        return jsonify(_error_body("No analyzers available: Gemini is unavailable and OpenCV/Numpy are unavailable.")), 500
+
+    error: Optional[Tuple[str, int]] = None
+    try:
+        data = parse_upload_request(request) if is_upload_request(request) else (request.get_json(silent=True) or {})
+        views = _parse_views(data)
+        budget_ms = _request_budget_ms(data, request.headers.get("X-Deadline-Ms"))
+    except UploadError as ue:
+        error = (str(ue), ue.status)
+    except ValueError as ve:
+        error = (str(ve), 400)
+    if error is not None:
+        return jsonify(_error_body(error[0])), error[1]
+
+    gemini_ready = _configure_genai()
+    include_timings = RETURN_TIMINGS or bool(data.get("include_timings"))
+    sse = request.accept_mimetypes.best_match(["application/x-ndjson", "text/event-stream"]) == "text/event-stream"
+
+    def generate():
+        try:
+            with deadline_scope(budget_ms), request_scope() as timings:
+                for event, response in _progressive_analysis(views, gemini_ready):
+                    if event == "final" and include_timings:
+                        response["analysis_metadata"]["timings_ms"] = timings.as_dict()
+                    elapsed_ms = round((time.perf_counter() - timings.started) * 1000.0, 1)
+                    yield _stream_event(event, {"elapsed_ms": elapsed_ms, **response}, sse)
+        except ValueError as ve:
+            yield _stream_event("error", {"status": 400, **_error_body(str(ve))}, sse)
+        except DeadlineExceeded as de:
+            yield _stream_event("error", {"status": 504, **_error_body(str(de))}, sse)
+        except Exception as e:
+            print("Exception in /analyze/stream:", traceback.format_exc(), file=sys.stderr)
+            yield _stream_event("error", {"status": 500, **_error_body("Analyzer internal error", details=str(e))}, sse)
+
+    mimetype = "text/event-stream" if sse else "application/x-ndjson"
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _run_job(payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+    return _analysis_outcome(payload, _configure_genai(), "analysis job")
+
+@app.route("/analyze/jobs", methods=["POST", "OPTIONS"])
+def submit_analysis_job():
+    """Queues an analysis and returns its job id immediately (202).
+
+    Body: any /analyze request body, plus an optional "callback_url" that
+    receives the finished job as a JSON POST (retried with backoff).
+    """
+    if request.method == "OPTIONS":
+        return ("", 204)
+
+    data = request.get_json(silent=True) or {}
+    callback_url = data.pop("callback_url", None)
+    try:
+        if callback_url is not None:
+            check_callback_url(callback_url)
+        _parse_views(data)
+    except ValueError as ve:
+        return jsonify(_error_body(str(ve))), 400
+
+    try:
+        job = get_job_queue(_run_job).submit(data, callback_url=callback_url)
+    except QueueFull as qf:
+        return jsonify({"error": str(qf)}), 503, {"Retry-After": "30"}
+    status_url = f"/analyze/jobs/{job['id']}"
+    return jsonify({**public_job_view(job), "status_url": status_url}), 202, {"Location": status_url}
+
+@app.route("/analyze/jobs/<job_id>", methods=["GET"])
+def get_analysis_job(job_id: str):
+    job = get_job_queue(_run_job).get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(public_job_view(job))
+
+# Time spent importing this module (Flask, routes, light helpers); heavy backends load lazily
+APP_IMPORT_MS = (time.perf_counter() - _IMPORT_STARTED) * 1000.0
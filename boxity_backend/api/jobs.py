@@ -0,0 +1,505 @@
+"""
+Asynchronous analysis jobs in a SQLite queue shared by the host's workers, with webhook delivery.
+"""
+import heapq
+import ipaddress
+import json
+import os
+import socket
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+from .lazy import LazyModule
+
+requests = LazyModule("requests")
+requests_adapters = LazyModule("requests.adapters")
+
+# (status_code, response_body) for a request payload
+JobRunner = Callable[[Dict[str, Any]], Tuple[int, Dict[str, Any]]]
+
+JOB_FIELDS = (
+    "id", "status", "callback_url", "created_at", "started_at", "finished_at",
+    "status_code", "result", "webhook_status", "webhook_attempts", "attempts",
+)
+
+
+class QueueFull(Exception):
+    """The queue already holds its maximum number of waiting jobs."""
+
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _worker_alive(worker: Optional[str]) -> bool:
+    """Whether the process that claimed a job may still be running it (unknown hosts are assumed alive)."""
+    host, _, pid = (worker or "").rpartition(":")
+    if not pid.isdigit():
+        return False
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _allowed_hosts() -> Tuple[str, ...]:
+    raw = os.getenv("JOB_CALLBACK_ALLOWED_HOSTS", "")
+    return tuple(h.strip().lower() for h in raw.split(",") if h.strip())
+
+
+def check_callback_url(url: Any) -> str:
+    """Validates a webhook URL: http(s) to a public address, or to a host in JOB_CALLBACK_ALLOWED_HOSTS.
+
+    Raises:
+        ValueError: If the URL is malformed, cannot be resolved or points at a non-public address
+    """
+    resolve_callback_url(url)
+    return url
+
+
+def resolve_callback_url(url: Any) -> Optional[str]:
+    """The checked address to deliver ``url`` to, or None for an allowlisted host (resolved as usual).
+
+    Raises:
+        ValueError: If the URL is malformed, cannot be resolved or points at a non-public address
+    """
+    if not isinstance(url, str) or not url.startswith(("http://", "https://")):
+        raise ValueError("callback_url must be an http(s) URL")
+    try:
+        parts = urlsplit(url)
+        host, port = parts.hostname, parts.port
+    except ValueError:
+        raise ValueError("callback_url is not a valid URL")
+    if not host:
+        raise ValueError("callback_url must include a host")
+    if host.lower() in _allowed_hosts():
+        return None
+    try:
+        infos = socket.getaddrinfo(host, port or (443 if parts.scheme == "https" else 80), proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"callback_url host {host!r} cannot be resolved")
+    for info in infos:
+        ip = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+        if getattr(ip, "ipv4_mapped", None):
+            ip = ip.ipv4_mapped
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError(f"callback_url host {host!r} resolves to a non-public address")
+    return infos[0][4][0].split("%", 1)[0]
+
+
+def post_callback(url: str, address: Optional[str], data: str, timeout: float = 10.0):
+    """POSTs ``data`` to ``url``, connecting to ``address`` rather than resolving the host again.
+
+    The Host header, TLS SNI and certificate check still use the URL's host.
+    """
+    headers = {"Content-Type": "application/json"}
+    if address is None:
+        return requests.post(url, data=data, headers=headers, timeout=timeout, allow_redirects=False)
+    parts = urlsplit(url)
+    host = parts.hostname
+    netloc = f"[{address}]" if ":" in address else address
+    host_header = f"[{host}]" if ":" in host else host
+    if parts.port:
+        netloc += f":{parts.port}"
+        host_header += f":{parts.port}"
+    headers["Host"] = host_header
+
+    class PinnedAdapter(requests_adapters.HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            kwargs["server_hostname"] = host
+            kwargs["assert_hostname"] = host
+            super().init_poolmanager(*args, **kwargs)
+
+    with requests.Session() as session:
+        session.mount("https://", PinnedAdapter())
+        return session.post(urlunsplit((parts.scheme, netloc, parts.path or "/", parts.query, "")),
+                            data=data, headers=headers, timeout=timeout, allow_redirects=False)
+
+
+class MemoryJobStore:
+    """Jobs for a single process, kept in a dict with a FIFO of queued ids."""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._payloads: Dict[str, Dict[str, Any]] = {}
+        self._queue: Deque[str] = deque()
+        self._lock = threading.Lock()
+
+    def create(self, job: Dict[str, Any], payload: Dict[str, Any], max_queued: int = 0) -> None:
+        with self._lock:
+            if max_queued and sum(1 for j in self._jobs.values() if j["status"] == "queued") >= max_queued:
+                raise QueueFull(f"Job queue is full ({max_queued} jobs waiting)")
+            self._jobs[job["id"]] = dict(job)
+            self._payloads[job["id"]] = payload
+            self._queue.append(job["id"])
+
+    def claim_next(self) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        with self._lock:
+            while self._queue:
+                job_id = self._queue.popleft()
+                job = self._jobs.get(job_id)
+                if job is None or job["status"] != "queued":
+                    continue
+                job["status"] = "running"
+                job["started_at"] = time.time()
+                job["attempts"] = int(job.get("attempts") or 0) + 1
+                return dict(job), self._payloads.pop(job_id, {})
+        return None
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def finish(self, job_id: str, **fields: Any) -> None:
+        self.update(job_id, **fields)
+
+    def requeue_orphans(self) -> int:
+        # Jobs in memory die with their process; nothing can be orphaned
+        return 0
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def prune(self, older_than: float) -> None:
+        with self._lock:
+            for job_id in [k for k, j in self._jobs.items() if (j.get("finished_at") or time.time()) < older_than]:
+                del self._jobs[job_id]
+
+
+class SQLiteJobStore:
+    """Jobs in a SQLite file shared across processes; one connection per thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, status TEXT NOT NULL, payload TEXT, callback_url TEXT,"
+            " created_at REAL, started_at REAL, finished_at REAL, status_code INTEGER, result TEXT,"
+            " webhook_status TEXT, webhook_attempts INTEGER DEFAULT 0)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_queued ON jobs (status, created_at)")
+        for column in ("worker TEXT", "attempts INTEGER DEFAULT 0"):
+            try:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column}")
+            except sqlite3.OperationalError:
+                pass  # added by an earlier start
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, job: Dict[str, Any], payload: Dict[str, Any], max_queued: int = 0) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if max_queued:
+                (queued,) = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()
+                if queued >= max_queued:
+                    raise QueueFull(f"Job queue is full ({max_queued} jobs waiting)")
+            conn.execute(
+                "INSERT INTO jobs (id, status, payload, callback_url, created_at, webhook_status, webhook_attempts, attempts)"
+                " VALUES (?, ?, ?, ?, ?, ?, 0, 0)",
+                (job["id"], job["status"], json.dumps(payload), job.get("callback_url"), job["created_at"], job.get("webhook_status")),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def claim_next(self) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, payload FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            # The payload stays until the job finishes so an orphaned job can run again
+            conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, worker = ?, attempts = attempts + 1 WHERE id = ?",
+                (time.time(), _worker_id(), row[0]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(row[0]), json.loads(row[1] or "{}")
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"], default=str)
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        self._conn().execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+    def finish(self, job_id: str, **fields: Any) -> None:
+        # Payloads can be megabytes of base64; drop them once the job is done
+        self.update(job_id, payload=None, **fields)
+
+    def requeue_orphans(self) -> int:
+        """Queues jobs again whose claiming process on this host has exited; returns how many."""
+        conn = self._conn()
+        rows = conn.execute("SELECT id, worker FROM jobs WHERE status = 'running'").fetchall()
+        orphans = [(job_id, worker) for job_id, worker in rows if not _worker_alive(worker)]
+        for job_id, worker in orphans:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL WHERE id = ? AND status = 'running' AND worker IS ?",
+                (job_id, worker),
+            )
+        return len(orphans)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(JOB_FIELDS, row))
+        if job.get("result"):
+            job["result"] = json.loads(job["result"])
+        return job
+
+    def prune(self, older_than: float) -> None:
+        self._conn().execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (older_than,))
+
+
+class JobQueue:
+    """Runs submitted payloads through ``runner`` on background worker threads."""
+
+    def __init__(
+        self,
+        store,
+        runner: JobRunner,
+        workers: int = 2,
+        webhook_retries: int = 3,
+        webhook_backoff_s: float = 1.0,
+        result_ttl_s: float = 86400.0,
+        poll_interval_s: float = 1.0,
+        max_queued: int = 0,
+        max_attempts: int = 2,
+    ):
+        self.store = store
+        self.runner = runner
+        self.workers = max(1, int(workers))
+        self.webhook_retries = max(0, int(webhook_retries))
+        self.webhook_backoff_s = webhook_backoff_s
+        self.result_ttl_s = result_ttl_s
+        self.poll_interval_s = poll_interval_s
+        self.max_queued = max(0, int(max_queued))
+        self.max_attempts = max(1, int(max_attempts))
+        self._wakeup = threading.Condition()
+        self._threads = []
+        # (due, seq, job_id, url, data, attempt) heap of pending webhook attempts
+        self._deliveries: List[Tuple[float, int, str, str, str, int]] = []
+        self._delivery_seq = 0
+        self._delivery_wakeup = threading.Condition()
+        self._started_pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+        self._last_prune = 0.0
+
+    def _ensure_workers(self) -> None:
+        if self._started_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            self._requeue_orphans()
+            self._threads = [
+                threading.Thread(target=self._worker_loop, name=f"analyze-job-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            self._threads.append(threading.Thread(target=self._delivery_loop, name="analyze-job-webhooks", daemon=True))
+            for t in self._threads:
+                t.start()
+            self._started_pid = os.getpid()
+
+    def submit(self, payload: Dict[str, Any], callback_url: Optional[str] = None) -> Dict[str, Any]:
+        """Queues ``payload``.
+
+        Raises:
+            QueueFull: If max_queued jobs are already waiting
+        """
+        self._ensure_workers()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "callback_url": callback_url,
+            "created_at": time.time(),
+            "webhook_status": "pending" if callback_url else None,
+        }
+        self.store.create(job, payload, max_queued=self.max_queued)
+        with self._wakeup:
+            self._wakeup.notify()
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        self._ensure_workers()
+        return self.store.get(job_id)
+
+    def _worker_loop(self) -> None:
+        while True:
+            try:
+                claimed = self.store.claim_next()
+            except Exception as e:
+                print(f"Job claim failed: {e}", file=sys.stderr)
+                claimed = None
+            if claimed is None:
+                self._maybe_prune()
+                with self._wakeup:
+                    self._wakeup.wait(timeout=self.poll_interval_s)
+                continue
+            job, payload = claimed
+            self._run(job, payload)
+
+    def _run(self, job: Dict[str, Any], payload: Dict[str, Any]) -> None:
+        if int(job.get("attempts") or 1) > self.max_attempts:
+            # Every earlier run died with its process; this payload may be what kills it
+            print(f"Job {job['id']} abandoned after {self.max_attempts} interrupted run(s)", file=sys.stderr)
+            status_code, body = 500, {"error": "Analysis job interrupted", "details": f"worker exited during {self.max_attempts} run(s)"}
+        else:
+            try:
+                status_code, body = self.runner(payload)
+            except Exception as e:
+                print(f"Job {job['id']} crashed: {e}", file=sys.stderr)
+                status_code, body = 500, {"error": "Analyzer internal error", "details": str(e)}
+        status = "succeeded" if status_code < 400 else "failed"
+        self.store.finish(job["id"], status=status, status_code=status_code, result=body, finished_at=time.time())
+        if job.get("callback_url"):
+            self._schedule_webhook(job["id"], job["callback_url"], json.dumps({
+                "job_id": job["id"],
+                "status": status,
+                "status_code": status_code,
+                "result": body,
+            }, default=str), attempt=1, delay=0.0)
+
+    def _schedule_webhook(self, job_id: str, url: str, data: str, attempt: int, delay: float) -> None:
+        with self._delivery_wakeup:
+            self._delivery_seq += 1
+            heapq.heappush(self._deliveries, (time.monotonic() + delay, self._delivery_seq, job_id, url, data, attempt))
+            self._delivery_wakeup.notify()
+
+    def _delivery_loop(self) -> None:
+        while True:
+            with self._delivery_wakeup:
+                while not self._deliveries or self._deliveries[0][0] > time.monotonic():
+                    self._delivery_wakeup.wait(self._deliveries[0][0] - time.monotonic() if self._deliveries else None)
+                _, _, job_id, url, data, attempt = heapq.heappop(self._deliveries)
+            try:
+                self._deliver_webhook(job_id, url, data, attempt)
+            except Exception as e:
+                print(f"Webhook for job {job_id} failed: {e}", file=sys.stderr)
+
+    def _deliver_webhook(self, job_id: str, url: str, data: str, attempt: int) -> None:
+        """Makes one delivery attempt; a failed one is rescheduled with exponential backoff."""
+        if not requests.available:
+            self.store.update(job_id, webhook_status="failed")
+            return
+        try:
+            # Checked again at delivery: the host may resolve elsewhere by now
+            address = resolve_callback_url(url)
+        except ValueError as e:
+            print(f"Webhook for job {job_id} refused: {e}", file=sys.stderr)
+            self.store.update(job_id, webhook_status="failed")
+            return
+        try:
+            resp = post_callback(url, address, data)
+            if 200 <= resp.status_code < 300:
+                self.store.update(job_id, webhook_status="delivered", webhook_attempts=attempt)
+                return
+            print(f"Webhook for job {job_id} returned {resp.status_code}", file=sys.stderr)
+        except Exception as e:
+            print(f"Webhook for job {job_id} failed: {e}", file=sys.stderr)
+        if attempt <= self.webhook_retries:
+            self.store.update(job_id, webhook_attempts=attempt)
+            self._schedule_webhook(job_id, url, data, attempt + 1, self.webhook_backoff_s * (2 ** (attempt - 1)))
+        else:
+            self.store.update(job_id, webhook_status="failed", webhook_attempts=attempt)
+
+    def _requeue_orphans(self) -> None:
+        try:
+            requeued = self.store.requeue_orphans()
+        except Exception as e:
+            print(f"Job recovery failed: {e}", file=sys.stderr)
+            return
+        if requeued:
+            print(f"Requeued {requeued} job(s) left running by exited workers", file=sys.stderr)
+
+    def _maybe_prune(self) -> None:
+        now = time.time()
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+        try:
+            self.store.prune(now - self.result_ttl_s)
+        except Exception as e:
+            print(f"Job prune failed: {e}", file=sys.stderr)
+        # Workers that crashed while this process was up (gunicorn restarts them)
+        self._requeue_orphans()
+
+
+def public_job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Job fields safe to return to clients (the callback URL is not echoed back)."""
+    view = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "created_at": job.get("created_at"),
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at"),
+    }
+    if job.get("webhook_status"):
+        view["webhook"] = {"status": job["webhook_status"], "attempts": int(job.get("webhook_attempts") or 0)}
+    if job["status"] in ("succeeded", "failed"):
+        view["status_code"] = job.get("status_code")
+        view["result"] = job.get("result")
+    return view
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue(runner: JobRunner) -> JobQueue:
+    """Process-wide queue on JOBS_DB_PATH (default <tmp>/boxity-jobs.sqlite3, shared by the host's workers; empty keeps jobs in memory)."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                db_path = os.getenv("JOBS_DB_PATH")
+                if db_path is None:
+                    db_path = os.path.join(tempfile.gettempdir(), "boxity-jobs.sqlite3")
+                store = None
+                if db_path:
+                    try:
+                        store = SQLiteJobStore(db_path)
+                    except Exception as e:
+                        print(f"Job database unavailable, keeping jobs in memory: {e}", file=sys.stderr)
+                _queue = JobQueue(
+                    store or MemoryJobStore(),
+                    runner,
+                    workers=int(os.getenv("JOB_WORKERS", "2")),
+                    webhook_retries=int(os.getenv("JOB_WEBHOOK_RETRIES", "3")),
+                    result_ttl_s=float(os.getenv("JOB_RESULT_TTL", "86400")),
+                    max_queued=int(os.getenv("JOB_QUEUE_MAX", "200")),
+                    max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "2")),
+                )
+    return _queue
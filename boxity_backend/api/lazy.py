@@ -0,0 +1,76 @@
+"""
+Deferred imports for heavy optional backends (OpenCV, NumPy, Pillow, Gemini SDK).
+"""
+import importlib
+import sys
+import threading
+import time
+from types import ModuleType
+from typing import Any, Dict, List, Optional
+
+_registry: List["LazyModule"] = []
+_registry_lock = threading.Lock()
+
+
+class LazyModule:
+    """Proxy that imports ``name`` (optionally relative to ``package``) on first use."""
+
+    def __init__(self, name: str, package: Optional[str] = None):
+        self._name = name
+        self._package = package
+        self._module: Optional[ModuleType] = None
+        self._failed = False
+        self._lock = threading.Lock()
+        self.import_ms: Optional[float] = None
+        with _registry_lock:
+            _registry.append(self)
+
+    @property
+    def label(self) -> str:
+        return f"{self._package}{self._name}" if self._name.startswith(".") and self._package else self._name
+
+    def load(self) -> Optional[ModuleType]:
+        """Imports the module if needed; returns None if it is unavailable."""
+        if self._module is not None or self._failed:
+            return self._module
+        with self._lock:
+            if self._module is None and not self._failed:
+                started = time.perf_counter()
+                try:
+                    self._module = importlib.import_module(self._name, self._package)
+                except Exception as e:
+                    self._failed = True
+                    print(f"{self.label} import failed: {e}", file=sys.stderr)
+                self.import_ms = (time.perf_counter() - started) * 1000.0
+        return self._module
+
+    @property
+    def available(self) -> bool:
+        return self.load() is not None
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr: str) -> Any:
+        module = self.load()
+        if module is None:
+            raise AttributeError(f"{self.label} is not available (needed for {attr!r})")
+        return getattr(module, attr)
+
+
+def preload_all() -> Dict[str, bool]:
+    """Imports every registered lazy module; returns availability by module name."""
+    with _registry_lock:
+        modules = list(_registry)
+    return {m.label: m.available for m in modules}
+
+
+def import_timings() -> Dict[str, Dict[str, Any]]:
+    """Load state and import duration (ms) of every registered lazy module."""
+    with _registry_lock:
+        modules = list(_registry)
+    return {
+        m.label: {"loaded": m.loaded, "import_ms": round(m.import_ms, 2) if m.import_ms is not None else None}
+        for m in modules
+    }
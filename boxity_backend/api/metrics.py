@@ -0,0 +1,448 @@
+"""
+Stage timers and Prometheus-text metrics for the analysis pipeline, shared across server workers.
+"""
+import atexit
+import contextvars
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+try:
+    import resource
+except Exception:
+    resource = None
+
+T = TypeVar("T")
+LabelKey = Tuple[Tuple[str, str], ...]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RSS_BUCKETS = tuple(float(2 ** n) * 1024 * 1024 for n in range(6, 15))  # 64MB .. 16GB
+FLUSH_INTERVAL_S = max(0.0, float(os.getenv("METRICS_FLUSH_INTERVAL", "1")))
+
+# name -> (type, help, histogram buckets)
+METRICS: Dict[str, Tuple[str, str, Tuple[float, ...]]] = {
+    "boxity_analyze_requests_total": ("counter", "Analysis requests by outcome (ok, invalid, error).", ()),
+    "boxity_analyze_seconds": ("histogram", "End-to-end analysis time per request.", LATENCY_BUCKETS),
+    "boxity_stage_seconds": ("histogram", "Time spent per pipeline stage.", LATENCY_BUCKETS),
+    "boxity_gemini_errors_total": ("counter", "Gemini ensemble member failures by reason.", ()),
+    "boxity_views_analyzed_total": ("counter", "Baseline/current pairs analyzed.", ()),
+    "boxity_alignment_total": ("counter", "Image alignments by path taken (orb, sift, none).", ()),
+    "boxity_analyses_coalesced_total": ("counter", "View analyses shared from an identical analysis already in flight.", ()),
+    "boxity_views_indeterminate_total": ("counter", "Pairs left without a verdict: neither Gemini nor classical CV produced a result.", ()),
+    "boxity_cv_fallback_total": ("counter", "Pairs whose differences include classical CV fallback regions.", ()),
+    "boxity_schema_repairs_total": ("counter", "Gemini member payloads repaired to the schema, by method (local, model) and result.", ()),
+    "boxity_cache_requests_total": ("counter", "Image and Gemini result cache lookups by result.", ()),
+    "boxity_auth_token_cache_total": ("counter", "Verified-token cache lookups (hit, negative_hit, miss).", ()),
+    "boxity_auth_jwks_refresh_total": ("counter", "JWKS refresh attempts by result.", ()),
+    "boxity_cv_pool_tasks": ("gauge", "CV process-pool tasks by state (queued, running).", ()),
+    "boxity_cv_pool_wait_seconds": ("histogram", "Time CV tasks waited for a pool process.", LATENCY_BUCKETS),
+    "boxity_cv_pool_failures_total": ("counter", "CV process-pool tasks that failed and ran in-thread or not at all, by reason.", ()),
+    "boxity_gemini_concurrency_limit": ("gauge", "Adaptive (AIMD) cap on concurrent Gemini calls.", ()),
+    "boxity_gemini_inflight": ("gauge", "Gemini calls in flight.", ()),
+    "boxity_gemini_circuit_open": ("gauge", "1 while the Gemini circuit breaker is open.", ()),
+    "boxity_gemini_circuit_transitions_total": ("counter", "Gemini circuit breaker state changes, by new state.", ()),
+    "boxity_deadline_degraded_total": ("counter", "Analysis steps skipped or cut short to meet a request deadline, by step.", ()),
+    "boxity_request_end_rss_bytes": ("histogram", "Process RSS when each analysis request finished.", RSS_BUCKETS),
+    "boxity_process_peak_rss_bytes": ("gauge", "Lifetime peak RSS of each process (ru_maxrss).", ()),
+}
+
+
+def _label_key(labels: Optional[Dict[str, Any]]) -> LabelKey:
+    return tuple(sorted((str(k), str(v)) for k, v in (labels or {}).items()))
+
+
+class Registry:
+    """Counters and histograms for one process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._gauges: Dict[Tuple[str, LabelKey], float] = {}
+        # (name, labels) -> [per-bucket counts (not cumulative), sum, count]
+        self._histograms: Dict[Tuple[str, LabelKey], List[Any]] = {}
+
+    def inc(self, name: str, labels: Optional[Dict[str, Any]] = None, value: float = 1.0) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None) -> None:
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None) -> None:
+        buckets = METRICS[name][2]
+        key = (name, _label_key(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    hist[0][i] += 1
+                    break
+            hist[1] += value
+            hist[2] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "counters": [[name, dict(labels), value] for (name, labels), value in self._counters.items()],
+                "gauges": [[name, dict(labels), value] for (name, labels), value in self._gauges.items()],
+                "histograms": [
+                    [name, dict(labels), list(h[0]), h[1], h[2]] for (name, labels), h in self._histograms.items()
+                ],
+            }
+
+
+_registry: Optional[Registry] = None
+_registry_pid: Optional[int] = None
+_registry_lock = threading.Lock()
+
+
+def _get_registry() -> Registry:
+    # Per process: a registry inherited across fork would count the parent's data twice
+    global _registry, _registry_pid
+    if _registry_pid != os.getpid():
+        with _registry_lock:
+            if _registry_pid != os.getpid():
+                _registry = Registry()
+                _registry_pid = os.getpid()
+    return _registry
+
+
+def inc(name: str, labels: Optional[Dict[str, Any]] = None, value: float = 1.0) -> None:
+    _get_registry().inc(name, labels, value)
+
+
+def set_gauge(name: str, value: float, labels: Optional[Dict[str, Any]] = None) -> None:
+    _get_registry().set(name, value, labels)
+
+
+def observe(name: str, value: float, labels: Optional[Dict[str, Any]] = None) -> None:
+    _get_registry().observe(name, value, labels)
+
+
+class RequestTimings:
+    """Milliseconds per stage for one request; repeated stages (e.g. per view) are summed."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._stages: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, key: str, ms: float) -> None:
+        with self._lock:
+            self._stages[key] = self._stages.get(key, 0.0) + ms
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            out = {k: round(v, 2) for k, v in self._stages.items()}
+        out["total"] = round((time.perf_counter() - self.started) * 1000.0, 2)
+        return out
+
+
+_current: "contextvars.ContextVar[Optional[RequestTimings]]" = contextvars.ContextVar("boxity_request_timings", default=None)
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Resident set size of this process right now, or None without /proc (Linux only)."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Lifetime peak resident set size of this process, or None where getrusage is unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return int(peak) if sys.platform == "darwin" else int(peak) * 1024
+
+
+@contextmanager
+def request_scope() -> Iterator[RequestTimings]:
+    """Collects stage timings for one analysis request and records its outcome."""
+    timings = RequestTimings()
+    token = _current.set(timings)
+    outcome = "error"
+    try:
+        yield timings
+        outcome = "ok"
+    except ValueError:
+        outcome = "invalid"
+        raise
+    finally:
+        _current.reset(token)
+        observe("boxity_analyze_seconds", time.perf_counter() - timings.started)
+        inc("boxity_analyze_requests_total", {"outcome": outcome})
+        rss = current_rss_bytes()
+        if rss is not None:
+            observe("boxity_request_end_rss_bytes", float(rss))
+        peak = peak_rss_bytes()
+        if peak is not None:
+            set_gauge("boxity_process_peak_rss_bytes", float(peak))
+        _schedule_flush()
+
+
+@contextmanager
+def stage(name: str, detail: Optional[str] = None) -> Iterator[None]:
+    """Times a pipeline stage; ``detail`` (e.g. an ensemble member) only refines the per-request key."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        observe("boxity_stage_seconds", elapsed, {"stage": name})
+        timings = _current.get()
+        if timings is not None:
+            timings.add(f"{name}.{detail}" if detail else name, elapsed * 1000.0)
+
+
+@contextmanager
+def capture_stages() -> Iterator[RequestTimings]:
+    """Collects stage timings of a block run outside any request (e.g. in a CV pool process)."""
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def record_stages(stages_ms: Dict[str, float]) -> None:
+    """Records stage timings captured in another process as if they had run here."""
+    timings = _current.get()
+    for key, ms in stages_ms.items():
+        if key == "total":
+            continue
+        observe("boxity_stage_seconds", ms / 1000.0, {"stage": key.split(".", 1)[0]})
+        if timings is not None:
+            timings.add(key, ms)
+
+
+def propagate(fn: Callable[..., T]) -> Callable[..., T]:
+    """Wraps ``fn`` to run in a copy of the caller's context, so request timings follow it into pool threads.
+
+    Call once per submission: a copied context cannot be entered by two threads at once.
+    """
+    ctx = contextvars.copy_context()
+
+    def run(*args: Any, **kwargs: Any) -> T:
+        return ctx.run(fn, *args, **kwargs)
+
+    return run
+
+
+RUN_ENV = "BOXITY_METRICS_RUN"
+
+_shared_dir: Optional[str] = None
+_shared_dir_resolved = False
+
+
+def _run_id() -> str:
+    # Inherited by forked workers; a process started without one is a run of its own
+    run = os.environ.get(RUN_ENV)
+    if not run:
+        run = os.environ[RUN_ENV] = f"{os.getpid()}-{int(time.time())}"
+    return run
+
+
+def _run_pid(name: str) -> Optional[int]:
+    pid = name.split("-", 1)[0]
+    return int(pid) if pid.isdigit() else None
+
+
+def _prune_finished_runs(root: str) -> None:
+    own = _run_id()
+    for name in os.listdir(root):
+        pid = _run_pid(name)
+        path = os.path.join(root, name)
+        if name == own or pid is None or not os.path.isdir(path) or _pid_alive(pid):
+            continue
+        for snapshot in os.listdir(path):
+            try:
+                os.remove(os.path.join(path, snapshot))
+            except OSError:
+                pass
+        try:
+            os.rmdir(path)
+        except OSError:
+            pass
+
+
+def _get_shared_dir() -> Optional[str]:
+    """This run's directory under METRICS_DIR (default <tmp>/boxity-metrics; empty keeps metrics per process)."""
+    global _shared_dir, _shared_dir_resolved
+    if not _shared_dir_resolved:
+        root = os.getenv("METRICS_DIR")
+        if root is None:
+            root = os.path.join(tempfile.gettempdir(), "boxity-metrics")
+        path = ""
+        if root:
+            path = os.path.join(root, _run_id())
+            try:
+                os.makedirs(path, exist_ok=True)
+                _prune_finished_runs(root)
+            except OSError as e:
+                print(f"Metrics directory unavailable: {e}", file=sys.stderr)
+                path = ""
+        _shared_dir = path or None
+        _shared_dir_resolved = True
+    return _shared_dir
+
+
+def flush() -> None:
+    """Writes this process's snapshot to the run's directory for other workers' /metrics."""
+    root = _get_shared_dir()
+    if root is None:
+        return
+    path = os.path.join(root, f"{os.getpid()}.json")
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(_get_registry().snapshot(), f)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"Metrics flush failed: {e}", file=sys.stderr)
+
+
+_flush_lock = threading.Lock()
+# pid of the process whose flush timer is pending (a timer does not survive fork)
+_flush_pending_pid: Optional[int] = None
+
+
+def _flush_scheduled() -> None:
+    global _flush_pending_pid
+    with _flush_lock:
+        _flush_pending_pid = None
+    flush()
+
+
+def _schedule_flush() -> None:
+    """Flushes within FLUSH_INTERVAL_S on a timer thread; requests in between share the write."""
+    global _flush_pending_pid
+    if _get_shared_dir() is None:
+        return
+    with _flush_lock:
+        if _flush_pending_pid == os.getpid():
+            return
+        _flush_pending_pid = os.getpid()
+    timer = threading.Timer(FLUSH_INTERVAL_S, _flush_scheduled)
+    timer.daemon = True
+    timer.start()
+
+
+# Counts from the last interval of a worker that exits cleanly
+atexit.register(flush)
+
+
+def start_run() -> None:
+    """Starts a new metrics run; call once in the server master before workers fork.
+
+    Workers inherit the run id and sum only each other's snapshots (including
+    those of exited workers of this run). Directories of runs whose master
+    has exited are removed.
+    """
+    global _shared_dir_resolved
+    os.environ[RUN_ENV] = f"{os.getpid()}-{int(time.time())}"
+    _shared_dir_resolved = False
+    _get_shared_dir()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _collect() -> List[Tuple[str, Dict[str, Any]]]:
+    """(pid, snapshot) of every process of this run."""
+    snapshots = [(str(os.getpid()), _get_registry().snapshot())]
+    root = _get_shared_dir()
+    if root is None:
+        return snapshots
+    own = f"{os.getpid()}.json"
+    for name in os.listdir(root):
+        if not name.endswith(".json") or name == own:
+            continue
+        try:
+            with open(os.path.join(root, name), "r", encoding="utf-8") as f:
+                snap = json.load(f)
+        except (OSError, ValueError):
+            continue
+        # Counters of exited workers still count; their last gauge readings don't
+        pid = name[:-5]
+        if pid.isdigit() and not _pid_alive(int(pid)):
+            snap.pop("gauges", None)
+        snapshots.append((pid, snap))
+    return snapshots
+
+
+def _format_labels(labels: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_number(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def render_prometheus() -> str:
+    """All processes' metrics in the Prometheus text exposition format.
+
+    Counters and histograms are summed over processes; gauges are reported per live process (``pid`` label).
+    """
+    counters: Dict[Tuple[str, LabelKey], float] = {}
+    histograms: Dict[Tuple[str, LabelKey], List[Any]] = {}
+    for pid, snap in _collect():
+        for name, labels, value in snap.get("counters", []):
+            key = (name, _label_key(labels))
+            counters[key] = counters.get(key, 0.0) + value
+        for name, labels, value in snap.get("gauges", []):
+            counters[(name, _label_key({**labels, "pid": pid}))] = value
+        for name, labels, buckets, total, count in snap.get("histograms", []):
+            if name not in METRICS or len(buckets) != len(METRICS[name][2]):
+                continue
+            key = (name, _label_key(labels))
+            hist = histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+            hist[0] = [a + b for a, b in zip(hist[0], buckets)]
+            hist[1] += total
+            hist[2] += count
+
+    lines: List[str] = []
+    for name, (kind, help_text, bounds) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind in ("counter", "gauge"):
+            for (n, labels), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_number(value)}")
+            continue
+        for (n, labels), (buckets, total, count) in sorted(histograms.items()):
+            if n != name:
+                continue
+            cumulative = 0
+            for bound, c in zip(bounds, buckets):
+                cumulative += c
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', _format_number(bound)))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_number(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
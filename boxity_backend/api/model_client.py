@@ -0,0 +1,323 @@
+"""
+Model clients behind the Gemini ensemble, selected with GEMINI_CLIENT
+(``genai``, ``record``, ``replay`` or ``simulate``).
+"""
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+CLIENT_MODES = ("genai", "record", "replay", "simulate")
+DEFAULT_SIM_LATENCY = "lognormal:1500:0.4"
+
+
+class ModelError(RuntimeError):
+    """A (simulated) model call failure."""
+
+    code = 500
+
+
+class ModelRateLimited(ModelError):
+    """The model refused the call for quota reasons, as the API's HTTP 429."""
+
+    code = 429
+
+
+class TextResponse:
+    """Minimal stand-in for an SDK response: only ``text`` is read."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+def request_key(model_name: str, parts: List[Any], generation_config: Optional[Dict[str, Any]]) -> str:
+    """Hash identifying a model request; image parts contribute their MIME type and content hash."""
+    normalized = []
+    for part in parts:
+        if isinstance(part, dict) and "data" in part:
+            data = part["data"]
+            digest = hashlib.sha256(data if isinstance(data, (bytes, bytearray)) else str(data).encode("utf-8")).hexdigest()
+            normalized.append({"mime_type": part.get("mime_type"), "sha256": digest})
+        else:
+            normalized.append(part if isinstance(part, str) else repr(part))
+    blob = json.dumps([model_name, generation_config or {}, normalized], sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class RecordingStore:
+    """Recorded responses, one JSON file per request key."""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.json")
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, key: str, model_name: str, text: str, latency_ms: float) -> None:
+        path = self._path(key)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"model": model_name, "text": text, "latency_ms": round(latency_ms, 1),
+                           "recorded_at": time.time()}, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Gemini recording write failed: {e}", file=sys.stderr)
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Latency sampler (ms) for ``fixed:MS``, ``uniform:LO:HI`` or ``lognormal:MEDIAN:SIGMA``."""
+    kind, *args = spec.strip().lower().split(":")
+    values = [float(a) for a in args]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal" and len(values) == 2:
+        mu = math.log(max(values[0], 1e-3))
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    raise ValueError(f"Invalid latency spec {spec!r}; use fixed:MS, uniform:LO:HI or lognormal:MEDIAN:SIGMA")
+
+
+# type, region, severity, tis_delta, description: building blocks for synthetic answers
+_SYNTHETIC_FINDINGS = (
+    ("dent", "left side", "MEDIUM", -15, "Concave deformation on the left side panel."),
+    ("scratch", "front panel", "LOW", -8, "Linear surface abrasion across the front panel."),
+    ("seal_tamper", "top edge", "HIGH", -40, "Seal gap with a lifted flap along the top seam."),
+    ("stain", "bottom edge", "LOW", -5, "Discoloration near the bottom edge."),
+    ("label_mismatch", "front panel", "HIGH", -40, "Shipping label text differs from the baseline."),
+)
+
+
+def synthetic_response(key: str) -> Dict[str, Any]:
+    """Schema-valid differences payload, deterministic for a request key."""
+    rng = random.Random(key)
+    differences = []
+    for i in range(rng.choice((0, 1, 1, 2, 3))):
+        kind, region, severity, tis_delta, description = rng.choice(_SYNTHETIC_FINDINGS)
+        x, y = round(rng.uniform(0.05, 0.7), 3), round(rng.uniform(0.05, 0.7), 3)
+        differences.append({
+            "id": f"d{i + 1}",
+            "region": region,
+            "bbox": [x, y, round(rng.uniform(0.05, 0.25), 3), round(rng.uniform(0.05, 0.25), 3)],
+            "type": kind,
+            "description": description,
+            "severity": severity,
+            "confidence": round(rng.uniform(0.6, 0.92), 2),
+            "explainability": ["synthetic finding", f"{kind} pattern"],
+            "suggested_action": "Supervisor review" if severity != "HIGH" else "Immediate quarantine",
+            "tis_delta": tis_delta,
+        })
+    return {"differences": differences}
+
+
+class GenaiClient:
+    """google.generativeai models."""
+
+    name = "genai"
+    # Whether answers come from the real model (and may share the real result cache)
+    real = True
+
+    def __init__(self):
+        self._genai = None
+
+    def _sdk(self):
+        # Imported here rather than at module import so offline modes and cold starts skip the SDK
+        if self._genai is None:
+            try:
+                import google.generativeai as genai
+            except Exception as e:
+                print(f"google.generativeai import failed: {e}", file=sys.stderr)
+                return None
+            self._genai = genai
+        return self._genai
+
+    def configure(self) -> bool:
+        api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            return False
+        genai = self._sdk()
+        if genai is None:
+            return False
+        genai.configure(api_key=api_key)
+        return True
+
+    def model(self, name: str, generation_config: Dict[str, Any]):
+        return self._sdk().GenerativeModel(name, generation_config=dict(generation_config))
+
+
+class _RecordingModel:
+    def __init__(self, inner, name: str, generation_config: Dict[str, Any], store: RecordingStore):
+        self._inner = inner
+        self._name = name
+        self._generation_config = generation_config
+        self._store = store
+
+    def generate_content(self, parts: List[Any], **kwargs: Any):
+        started = time.perf_counter()
+        result = self._inner.generate_content(parts, **kwargs)
+        text = result.text or ""
+        self._store.save(request_key(self._name, parts, self._generation_config), self._name, text,
+                         (time.perf_counter() - started) * 1000.0)
+        return result
+
+
+class RecordingClient(GenaiClient):
+    """google.generativeai models whose responses are recorded for later replay."""
+
+    name = "record"
+
+    def __init__(self, store: RecordingStore):
+        super().__init__()
+        self.store = store
+
+    def model(self, name: str, generation_config: Dict[str, Any]):
+        return _RecordingModel(super().model(name, generation_config), name, generation_config, self.store)
+
+
+class _SimulatedModel:
+    def __init__(self, client: "SimulatedClient", name: str, generation_config: Dict[str, Any]):
+        self._client = client
+        self._name = name
+        self._generation_config = generation_config
+
+    def generate_content(self, parts: List[Any], request_options: Optional[Dict[str, Any]] = None, **kwargs: Any):
+        timeout = (request_options or {}).get("timeout")
+        return self._client.respond(request_key(self._name, parts, self._generation_config), timeout)
+
+
+class SimulatedClient:
+    """Offline stand-in serving recorded (``replay``) or synthetic (``simulate``) responses."""
+
+    real = False
+
+    def __init__(
+        self,
+        name: str = "simulate",
+        store: Optional[RecordingStore] = None,
+        latency: Optional[Callable[[random.Random], float]] = None,
+        use_recorded_latency: bool = False,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        invalid_rate: float = 0.0,
+        miss_policy: str = "synthetic",
+        seed: Optional[int] = None,
+    ):
+        self.name = name
+        self.store = store
+        self.latency = latency or parse_latency(DEFAULT_SIM_LATENCY)
+        self.use_recorded_latency = use_recorded_latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.invalid_rate = invalid_rate
+        self.miss_policy = miss_policy
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def configure(self) -> bool:
+        return True
+
+    def model(self, name: str, generation_config: Dict[str, Any]):
+        return _SimulatedModel(self, name, generation_config)
+
+    def respond(self, key: str, timeout: Optional[float]) -> TextResponse:
+        recorded = self.store.load(key) if self.store is not None else None
+        with self._rng_lock:
+            if recorded is not None and self.use_recorded_latency and recorded.get("latency_ms") is not None:
+                latency_ms = float(recorded["latency_ms"])
+            else:
+                latency_ms = self.latency(self._rng)
+            roll = self._rng.random()
+
+        # Quota rejections come back fast; everything else takes the model's time
+        if roll < self.rate_limit_rate:
+            time.sleep(min(latency_ms, 50.0) / 1000.0)
+            raise ModelRateLimited("429 Resource has been exhausted (simulated)")
+        if timeout is not None and latency_ms / 1000.0 > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Simulated model call exceeded {timeout:.1f}s")
+        time.sleep(latency_ms / 1000.0)
+        roll -= self.rate_limit_rate
+        if roll < self.error_rate:
+            raise ModelError("500 Internal error (simulated)")
+        roll -= self.error_rate
+        if roll < self.invalid_rate:
+            return TextResponse(json.dumps({"differences": [{"id": "d1", "region": "unknown"}]}))
+
+        if recorded is not None:
+            return TextResponse(recorded.get("text") or "")
+        if self.name == "replay" and self.miss_policy == "error":
+            raise ModelError(f"No recorded response for request {key[:12]}")
+        return TextResponse(json.dumps(synthetic_response(key)))
+
+
+def _recording_store() -> RecordingStore:
+    root = os.getenv("GEMINI_RECORD_DIR") or os.path.join(tempfile.gettempdir(), "boxity-gemini-recordings")
+    return RecordingStore(root)
+
+
+def client_mode(mode: Optional[str] = None) -> str:
+    """Validated client mode (default: GEMINI_CLIENT); raises ValueError for an unknown one."""
+    mode = (mode or os.getenv("GEMINI_CLIENT", "genai")).strip().lower()
+    if mode not in CLIENT_MODES:
+        raise ValueError(f"GEMINI_CLIENT must be one of {', '.join(CLIENT_MODES)}; got {mode!r}")
+    return mode
+
+
+def create_model_client(mode: Optional[str] = None):
+    """Client for ``mode`` (default: GEMINI_CLIENT), configured from the GEMINI_SIM_* env vars."""
+    mode = client_mode(mode)
+    if mode == "genai":
+        return GenaiClient()
+    if mode == "record":
+        return RecordingClient(_recording_store())
+    latency_spec = os.getenv("GEMINI_SIM_LATENCY", "recorded" if mode == "replay" else DEFAULT_SIM_LATENCY)
+    use_recorded = latency_spec.strip().lower() == "recorded"
+    seed = os.getenv("GEMINI_SIM_SEED")
+    return SimulatedClient(
+        name=mode,
+        store=_recording_store() if mode == "replay" else None,
+        latency=parse_latency(DEFAULT_SIM_LATENCY if use_recorded else latency_spec),
+        use_recorded_latency=use_recorded,
+        error_rate=float(os.getenv("GEMINI_SIM_ERROR_RATE", "0")),
+        rate_limit_rate=float(os.getenv("GEMINI_SIM_RATE_LIMIT_RATE", "0")),
+        invalid_rate=float(os.getenv("GEMINI_SIM_INVALID_RATE", "0")),
+        miss_policy=os.getenv("GEMINI_REPLAY_MISS", "synthetic").strip().lower(),
+        seed=int(seed) if seed else None,
+    )
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_model_client():
+    """Process-wide model client selected by GEMINI_CLIENT."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_model_client()
+    return _client
+
+
+def set_model_client(client) -> None:
+    """Replaces the process-wide client (benchmarks and load tests)."""
+    global _client
+    with _client_lock:
+        _client = client
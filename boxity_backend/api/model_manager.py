@@ -0,0 +1,272 @@
+"""
+Process-wide manager in front of the model client: one configuration, cached models,
+an AIMD concurrency limiter and a circuit breaker.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .metrics import inc, set_gauge
+from .model_client import ModelError, get_model_client
+
+LIMIT_MAX = max(1, int(os.getenv("GEMINI_LIMIT_MAX", os.getenv("GEMINI_MAX_CONCURRENCY", "8"))))
+LIMIT_MIN = min(LIMIT_MAX, max(1, int(os.getenv("GEMINI_LIMIT_MIN", "1"))))
+LIMIT_INITIAL = min(LIMIT_MAX, max(LIMIT_MIN, int(os.getenv("GEMINI_LIMIT_INITIAL", str(LIMIT_MAX)))))
+# Calls slower than this count as congestion; 0 reacts to errors only
+LIMIT_LATENCY_TARGET_S = max(0.0, float(os.getenv("GEMINI_LIMIT_LATENCY_TARGET", "25")))
+# Consecutive backend failures that open the circuit; 0 disables the breaker
+BREAKER_FAILURES = max(0, int(os.getenv("GEMINI_BREAKER_FAILURES", "5")))
+BREAKER_COOLDOWN_S = max(0.0, float(os.getenv("GEMINI_BREAKER_COOLDOWN", "30")))
+CONFIGURE_RETRY_S = 30.0
+# Wait for a limiter slot when the caller gives no timeout
+DEFAULT_ACQUIRE_TIMEOUT_S = 60.0
+
+
+class ModelThrottled(ModelError):
+    """No call slot freed up in time: this process is at its adaptive concurrency limit."""
+
+    code = None
+
+
+class CircuitOpen(ModelError):
+    """The model backend is considered unhealthy; calls are not attempted."""
+
+    code = None
+
+
+def classify_error(e: BaseException) -> str:
+    """Failure kind of a model call, from the HTTP status in ``e.code`` where there is one.
+
+    One of: rate_limited, server_error, timeout, client_error, throttled,
+    circuit_open or exception.
+    """
+    if isinstance(e, ModelThrottled):
+        return "throttled"
+    if isinstance(e, CircuitOpen):
+        return "circuit_open"
+    code = getattr(e, "code", None)
+    try:
+        code = int(code) if code is not None else None
+    except (TypeError, ValueError):
+        code = None
+    if code == 429:
+        return "rate_limited"
+    if code == 504 or isinstance(e, TimeoutError):
+        return "timeout"
+    if code is not None and 500 <= code < 600:
+        return "server_error"
+    if code is not None and 400 <= code < 500:
+        return "client_error"
+    return "exception"
+
+
+# Outcomes that say the backend is overloaded (limiter) or unhealthy (breaker)
+CONGESTION_ERRORS = ("rate_limited", "server_error", "timeout")
+BACKEND_FAILURES = ("rate_limited", "server_error", "timeout", "exception")
+
+
+class AimdLimiter:
+    """Adaptive cap on concurrent model calls (additive increase, multiplicative decrease)."""
+
+    def __init__(self, initial: int = LIMIT_INITIAL, minimum: int = LIMIT_MIN, maximum: int = LIMIT_MAX,
+                 latency_target_s: float = LIMIT_LATENCY_TARGET_S, backoff: float = 0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target_s = latency_target_s
+        self.backoff = backoff
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._publish()
+
+    def _publish(self) -> None:
+        set_gauge("boxity_gemini_concurrency_limit", int(self.limit))
+        set_gauge("boxity_gemini_inflight", self.in_flight)
+
+    def acquire(self, timeout: Optional[float]) -> Optional[float]:
+        """Waits for a slot; returns the call's start time (pass it to ``release``) or None on timeout."""
+        expires_at = time.monotonic() + (DEFAULT_ACQUIRE_TIMEOUT_S if timeout is None else max(0.0, timeout))
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                left = expires_at - time.monotonic()
+                if left <= 0:
+                    return None
+                self._cond.wait(left)
+            self.in_flight += 1
+            self._publish()
+        return time.monotonic()
+
+    def release(self, started: float, congested: bool) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            slow = self.latency_target_s > 0 and time.monotonic() - started > self.latency_target_s
+            if congested or slow:
+                # One cut per congestion event: calls already in flight at the last cut report the same event
+                if started >= self._last_decrease:
+                    self.limit = max(float(self.minimum), self.limit * self.backoff)
+                    self._last_decrease = time.monotonic()
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+            self._publish()
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown_s: float = BREAKER_COOLDOWN_S):
+        self.failures = failures
+        self.cooldown_s = cooldown_s
+        self.state = self.CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        set_gauge("boxity_gemini_circuit_open", 0)
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            self.state = state
+            inc("boxity_gemini_circuit_transitions_total", {"state": state})
+            set_gauge("boxity_gemini_circuit_open", 1 if state == self.OPEN else 0)
+            print(f"Gemini circuit {state}", file=sys.stderr)
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; in half-open state only the one probe may."""
+        if self.failures <= 0:
+            return True
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown_s:
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def is_open(self) -> bool:
+        """Open and still cooling down (no probe is due)."""
+        with self._lock:
+            return self.state == self.OPEN and time.monotonic() - self._opened_at < self.cooldown_s
+
+    def cancel_probe(self) -> None:
+        """Lets another call probe: the one allowed never reached the backend."""
+        with self._lock:
+            self._probing = False
+
+    def record(self, healthy: bool) -> None:
+        if self.failures <= 0:
+            return
+        with self._lock:
+            self._probing = False
+            if healthy:
+                self._consecutive = 0
+                self._set_state(self.CLOSED)
+                return
+            self._consecutive += 1
+            if self.state == self.HALF_OPEN or self._consecutive >= self.failures:
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+
+class _ManagedModel:
+    """A cached model object whose calls pass the breaker and the limiter."""
+
+    def __init__(self, manager: "ModelManager", inner):
+        self._manager = manager
+        self._inner = inner
+
+    def generate_content(self, parts: List[Any], request_options: Optional[Dict[str, Any]] = None, **kwargs: Any):
+        timeout = (request_options or {}).get("timeout")
+        breaker, limiter = self._manager.breaker, self._manager.limiter
+        if not breaker.allow():
+            raise CircuitOpen("Gemini circuit is open")
+        waited_from = time.monotonic()
+        started = limiter.acquire(timeout)
+        if started is None:
+            breaker.cancel_probe()
+            raise ModelThrottled("Gemini concurrency limit reached")
+        if timeout is not None:
+            # The wait for a slot comes out of the call's own budget
+            request_options = {**request_options, "timeout": max(1.0, timeout - (started - waited_from))}
+        if request_options is not None:
+            kwargs["request_options"] = request_options
+        outcome = "ok"
+        try:
+            return self._inner.generate_content(parts, **kwargs)
+        except Exception as e:
+            outcome = classify_error(e)
+            raise
+        finally:
+            limiter.release(started, congested=outcome in CONGESTION_ERRORS)
+            breaker.record(outcome not in BACKEND_FAILURES)
+
+
+class ModelManager:
+    """Configures the model client once and hands out shared, gated model objects."""
+
+    def __init__(self, client=None):
+        self.client = client if client is not None else get_model_client()
+        self.limiter = AimdLimiter()
+        self.breaker = CircuitBreaker()
+        self._configured: Optional[bool] = None
+        self._configured_at = 0.0
+        self._models: Dict[Tuple[str, str], _ManagedModel] = {}
+        self._lock = threading.Lock()
+
+    def ready(self) -> bool:
+        """Whether the client is configured (API key, SDK); configures it on first use."""
+        if self._configured or (self._configured is False and time.monotonic() - self._configured_at < CONFIGURE_RETRY_S):
+            return bool(self._configured)
+        with self._lock:
+            if self._configured is None or (not self._configured and time.monotonic() - self._configured_at >= CONFIGURE_RETRY_S):
+                try:
+                    self._configured = bool(self.client.configure())
+                except Exception as e:
+                    print(f"Gemini client configuration failed: {e}", file=sys.stderr)
+                    self._configured = False
+                if not self._configured:
+                    print("Gemini unavailable: no GOOGLE_API_KEY/GEMINI_API_KEY or google.generativeai missing", file=sys.stderr)
+                self._configured_at = time.monotonic()
+        return bool(self._configured)
+
+    def available(self) -> bool:
+        """Configured and not cut off by an open circuit."""
+        return self.ready() and not self.breaker.is_open()
+
+    def model(self, name: str, generation_config: Dict[str, Any]) -> _ManagedModel:
+        key = (name, json.dumps(generation_config, sort_keys=True, default=str))
+        model = self._models.get(key)
+        if model is None:
+            with self._lock:
+                model = self._models.get(key)
+                if model is None:
+                    model = _ManagedModel(self, self.client.model(name, generation_config))
+                    self._models[key] = model
+        return model
+
+
+_manager: Optional[ModelManager] = None
+_manager_pid: Optional[int] = None
+_manager_lock = threading.Lock()
+
+
+def get_model_manager() -> ModelManager:
+    """This process's manager for the current model client (rebuilt after fork or ``set_model_client``)."""
+    global _manager, _manager_pid
+    client = get_model_client()
+    manager = _manager
+    if manager is None or _manager_pid != os.getpid() or manager.client is not client:
+        with _manager_lock:
+            if _manager is None or _manager_pid != os.getpid() or _manager.client is not client:
+                _manager = ModelManager(client)
+                _manager_pid = os.getpid()
+            manager = _manager
+    return manager
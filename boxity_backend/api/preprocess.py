@@ -0,0 +1,83 @@
+"""
+Bounded-size, EXIF-free copies of images for the Gemini ensemble.
+"""
+import io
+import math
+import os
+import sys
+from typing import Any, List, Optional, Tuple
+
+from .cache import ImageRecord, get_image_cache
+from .lazy import LazyModule
+
+Image = LazyModule("PIL.Image")
+ImageOps = LazyModule("PIL.ImageOps")
+
+# 0 sends original bytes
+MAX_EDGE = max(0, int(os.getenv("GEMINI_IMAGE_MAX_EDGE", "1536")))
+QUALITY = min(95, max(30, int(os.getenv("GEMINI_IMAGE_QUALITY", "85"))))
+# Formats Gemini accepts that may pass through unchanged when already small
+PASSTHROUGH_MIMES = ("image/jpeg", "image/png", "image/webp")
+ORIENTATION_TAG = 0x0112
+
+
+class PreparedImage:
+    """Bytes sent to the model plus the geometry needed to map its answers back."""
+
+    __slots__ = ("data", "mime", "original_size", "size")
+
+    def __init__(self, data: bytes, mime: Optional[str], original_size: Optional[Tuple[int, int]], size: Optional[Tuple[int, int]]):
+        self.data = data
+        self.mime = mime
+        # (width, height) of the upright original and of the image sent; None if undecodable
+        self.original_size = original_size
+        self.size = size
+
+
+def _prepare(record: ImageRecord) -> PreparedImage:
+    if MAX_EDGE <= 0 or not Image.available:
+        return PreparedImage(record.data, record.mime, None, None)
+    try:
+        with Image.open(io.BytesIO(record.data)) as im:
+            w, h = im.size
+            orientation = im.getexif().get(ORIENTATION_TAG, 1)
+            original = (h, w) if orientation in (5, 6, 7, 8) else (w, h)
+            longest = max(w, h)
+            if longest <= MAX_EDGE and "exif" not in im.info and record.mime in PASSTHROUGH_MIMES:
+                return PreparedImage(record.data, record.mime, original, original)
+            if longest > MAX_EDGE:
+                # JPEG only (no-op otherwise): DCT-domain downscale to the smallest scale >= target
+                scale = MAX_EDGE / float(longest)
+                im.draft("RGB", (math.ceil(w * scale), math.ceil(h * scale)))
+            icc_profile = im.info.get("icc_profile")
+            out = ImageOps.exif_transpose(im)
+            if out.mode not in ("RGB", "L"):
+                out = out.convert("RGB")
+            # Pillow's bilinear is antialiased; after draft the remaining factor is < 2, where it matches bicubic at ~2/3 the cost
+            out.thumbnail((MAX_EDGE, MAX_EDGE), Image.Resampling.BILINEAR)
+            buf = io.BytesIO()
+            out.save(buf, "JPEG", quality=QUALITY, icc_profile=icc_profile)
+            return PreparedImage(buf.getvalue(), "image/jpeg", original, out.size)
+    except Exception as e:
+        print(f"Model image preprocessing failed, sending original: {e}", file=sys.stderr)
+        return PreparedImage(record.data, record.mime, None, None)
+
+
+def prepare_for_model(record: ImageRecord) -> PreparedImage:
+    """Model-ready copy of ``record``, computed once and kept on the cached record."""
+    if record.prepared is None:
+        get_image_cache().attach(record, prepared=_prepare(record))
+    return record.prepared
+
+
+def bbox_to_original(bbox: Any, prepared: PreparedImage) -> Optional[List[int]]:
+    """Normalized [x, y, w, h] from the model as pixels of the upright original, or None."""
+    if prepared.original_size is None or not isinstance(bbox, (list, tuple)) or len(bbox) != 4:
+        return None
+    try:
+        x, y, w, h = (min(1.0, max(0.0, float(v))) for v in bbox)
+    except (TypeError, ValueError):
+        return None
+    ow, oh = prepared.original_size
+    x0, y0 = int(round(x * ow)), int(round(y * oh))
+    return [x0, y0, max(1, min(ow - x0, int(round(w * ow)))), max(1, min(oh - y0, int(round(h * oh))))]
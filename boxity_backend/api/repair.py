@@ -0,0 +1,175 @@
+"""
+Validation and deterministic repair of ensemble member output.
+"""
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+from .schema import MODEL_RESPONSE_SCHEMA
+
+try:
+    from jsonschema.validators import validator_for
+except Exception:
+    validator_for = None
+
+SEVERITIES = ("LOW", "MEDIUM", "HIGH")
+SEVERITY_ALIASES = {
+    "CRITICAL": "HIGH", "SEVERE": "HIGH", "MAJOR": "HIGH",
+    "MED": "MEDIUM", "MODERATE": "MEDIUM",
+    "MINOR": "LOW", "NONE": "LOW",
+}
+# type -> (severity, tis_delta) when the model left them out; mirrors the prompt's TIS table
+TYPE_DEFAULTS: Dict[str, Tuple[str, int]] = {
+    "seal_tamper": ("HIGH", -40),
+    "repackaging": ("HIGH", -35),
+    "digital_edit": ("HIGH", -50),
+    "label_mismatch": ("HIGH", -40),
+    "dent": ("MEDIUM", -15),
+    "scratch": ("LOW", -8),
+}
+DEFAULT_TYPE_SEVERITY = ("LOW", -5)
+
+_validator = None
+if validator_for is not None:
+    _cls = validator_for(MODEL_RESPONSE_SCHEMA)
+    _cls.check_schema(MODEL_RESPONSE_SCHEMA)
+    _validator = _cls(MODEL_RESPONSE_SCHEMA)
+
+
+def can_validate() -> bool:
+    return _validator is not None
+
+
+def is_valid(payload: Any) -> bool:
+    """Whether ``payload`` matches MODEL_RESPONSE_SCHEMA (always False without jsonschema)."""
+    return _validator is not None and _validator.is_valid(payload)
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple)):
+        value = ", ".join(str(v) for v in value if v is not None)
+    text = str(value).strip()
+    return text or None
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        value = value.strip().rstrip("%")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _confidence(value: Any) -> float:
+    number = _number(value)
+    if number is None:
+        return 0.5
+    # Percentages ("84", "84%") are the common slip
+    if 1.0 < number <= 100.0:
+        number /= 100.0
+    return min(1.0, max(0.0, number))
+
+
+def _bbox(value: Any) -> Optional[List[float]]:
+    """[x, y, w, h] clipped to the unit square, or None when the box cannot be salvaged."""
+    if isinstance(value, dict):
+        if all(k in value for k in ("x", "y", "w", "h")):
+            value = [value["x"], value["y"], value["w"], value["h"]]
+        elif all(k in value for k in ("x", "y", "width", "height")):
+            value = [value["x"], value["y"], value["width"], value["height"]]
+        else:
+            return None
+    if not isinstance(value, (list, tuple)) or len(value) != 4:
+        return None
+    numbers = [_number(v) for v in value]
+    if any(n is None for n in numbers):
+        return None
+    x, y, w, h = numbers
+    # Pixel coordinates cannot be mapped back without the image size
+    if max(x, y, w, h) > 1.0 or w <= 0.0 or h <= 0.0:
+        return None
+    x, y = max(0.0, x), max(0.0, y)
+    return [round(x, 4), round(y, 4), round(min(w, 1.0 - x), 4), round(min(h, 1.0 - y), 4)]
+
+
+def _severity(value: Any, default: str) -> str:
+    text = (_text(value) or "").upper()
+    if text in SEVERITIES:
+        return text
+    return SEVERITY_ALIASES.get(text, default)
+
+
+def _tis_delta(value: Any, default: int) -> int:
+    number = _number(value)
+    if number is None:
+        return default
+    # Deltas only ever lower the score
+    return -abs(int(round(number)))
+
+
+def repair_item(item: Any, index: int) -> Optional[Dict[str, Any]]:
+    """Schema-conforming copy of one difference item, or None if it carries nothing usable."""
+    if not isinstance(item, dict):
+        return None
+    kind = _text(item.get("type"))
+    description = _text(item.get("description"))
+    region = _text(item.get("region"))
+    if kind is None and description is None and region is None:
+        return None
+
+    kind = (kind or "other").lower().replace(" ", "_").replace("-", "_")
+    default_severity, default_delta = TYPE_DEFAULTS.get(kind, DEFAULT_TYPE_SEVERITY)
+    explainability = item.get("explainability")
+    if isinstance(explainability, (list, tuple)):
+        explainability = [str(e).strip() for e in explainability if e is not None and str(e).strip()]
+    else:
+        explainability = [_text(explainability)] if _text(explainability) else []
+
+    repaired = dict(item)
+    repaired.update({
+        "id": _text(item.get("id")) or f"d{index + 1}",
+        "region": region or "unknown",
+        "bbox": _bbox(item.get("bbox")),
+        "type": kind,
+        "description": description or "",
+        "severity": _severity(item.get("severity"), default_severity),
+        "confidence": _confidence(item.get("confidence")),
+        "explainability": explainability,
+        "suggested_action": _text(item.get("suggested_action")) or "Review",
+        "tis_delta": _tis_delta(item.get("tis_delta"), default_delta),
+    })
+    return repaired
+
+
+def repair_payload(payload: Any) -> Tuple[Dict[str, Any], int]:
+    """Coerces model output into MODEL_RESPONSE_SCHEMA.
+
+    Returns: (repaired payload, number of items dropped as unsalvageable)
+    """
+    if isinstance(payload, list):
+        items: Any = payload
+    elif isinstance(payload, dict):
+        items = payload.get("differences")
+        if items is None and any(k in payload for k in ("type", "description", "region")):
+            # A single finding without the envelope
+            items = [payload]
+    else:
+        items = None
+    if isinstance(items, dict):
+        items = [items]
+    if not isinstance(items, list):
+        items = []
+
+    differences: List[Dict[str, Any]] = []
+    for i, item in enumerate(items):
+        repaired = repair_item(item, i)
+        if repaired is not None:
+            differences.append(repaired)
+    out = dict(payload) if isinstance(payload, dict) and "differences" in payload else {}
+    out["differences"] = differences
+    return out, len(items) - len(differences)
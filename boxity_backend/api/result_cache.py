@@ -0,0 +1,136 @@
+"""
+Shared SQLite cache of Gemini ensemble results.
+"""
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+DEFAULT_TTL_S = 86400.0
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+EVICT_EVERY = 50
+
+
+class ResultCache:
+    """Key -> JSON value store with TTL and LRU size bounds."""
+
+    def __init__(self, path: str, ttl_s: float = DEFAULT_TTL_S, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl_s = ttl_s
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn().execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        try:
+            row = self._conn().execute(
+                "SELECT value FROM results WHERE key = ? AND created_at >= ?", (key, now - self.ttl_s)
+            ).fetchone()
+            if row is not None:
+                self._conn().execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            print(f"Result cache read failed: {e}", file=sys.stderr)
+            row = None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, key: str, value: Any) -> None:
+        data = json.dumps(value, default=str)
+        now = time.time()
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO results (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), now, now),
+            )
+        except sqlite3.Error as e:
+            print(f"Result cache write failed: {e}", file=sys.stderr)
+            return
+        with self._lock:
+            self._puts += 1
+            due = self._puts % EVICT_EVERY == 1
+        if due:
+            self.evict()
+
+    def evict(self) -> None:
+        conn = self._conn()
+        try:
+            conn.execute("DELETE FROM results WHERE created_at < ?", (time.time() - self.ttl_s,))
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+            if count <= self.max_entries and total <= self.max_bytes:
+                return
+            # Walk from least recently used until both limits hold
+            drop = []
+            for key, size in conn.execute("SELECT key, size FROM results ORDER BY accessed_at"):
+                if count <= self.max_entries and total <= self.max_bytes:
+                    break
+                drop.append((key,))
+                count -= 1
+                total -= size
+            conn.executemany("DELETE FROM results WHERE key = ?", drop)
+        except sqlite3.Error as e:
+            print(f"Result cache eviction failed: {e}", file=sys.stderr)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+_cache_disabled = False
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Process-wide handle on GEMINI_CACHE_PATH (default <tmp>/boxity-gemini-cache.sqlite3; empty disables)."""
+    global _cache, _cache_disabled
+    if _cache is not None or _cache_disabled:
+        return _cache
+    with _cache_lock:
+        if _cache is None and not _cache_disabled:
+            path = os.getenv("GEMINI_CACHE_PATH")
+            if path is None:
+                path = os.path.join(tempfile.gettempdir(), "boxity-gemini-cache.sqlite3")
+            if not path:
+                _cache_disabled = True
+                return None
+            try:
+                _cache = ResultCache(
+                    path,
+                    ttl_s=float(os.getenv("GEMINI_CACHE_TTL", str(DEFAULT_TTL_S))),
+                    max_entries=int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", str(DEFAULT_MAX_ENTRIES))),
+                    max_bytes=int(os.getenv("GEMINI_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES))),
+                )
+            except Exception as e:
+                print(f"Gemini result cache unavailable: {e}", file=sys.stderr)
+                _cache_disabled = True
+    return _cache
@@ -55,3 +55,19 @@ RESPONSE_SCHEMA: Dict[str, Any] = {
     "additionalProperties": True,
 }
 
+
+# Shape of the JSON the Gemini ensemble returns. The prompt asks only for {"differences": [...]};
+# aggregate_tis, overall_assessment, confidence_overall and notes are computed server-side
+# (index._compute_overall), so requiring them as RESPONSE_SCHEMA does rejected every answer.
+# Items are held to the full DIFFERENCE_ITEM_SCHEMA.
+MODEL_RESPONSE_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "differences": {
+            "type": "array",
+            "items": DIFFERENCE_ITEM_SCHEMA
+        },
+    },
+    "required": ["differences"],
+    "additionalProperties": True,
+}
@@ -0,0 +1,72 @@
+"""
+Single-flight coalescing of identical in-flight work (per process).
+"""
+import threading
+from typing import Callable, Dict, Generic, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class FlightTimeout(TimeoutError):
+    """A follower's own timeout ran out while it waited for the leader."""
+
+
+class _Flight(Generic[T]):
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[T] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight(Generic[T]):
+    """Runs at most one computation per key at a time and shares it with concurrent callers."""
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight[T]] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], T], timeout: Optional[float] = None,
+           reusable: Callable[[T], bool] = lambda result: True,
+           shareable: Callable[[BaseException], bool] = lambda error: True) -> Tuple[T, bool]:
+        """Runs ``fn`` or joins the run already in flight for ``key``.
+
+        A follower that waits longer than ``timeout`` gets FlightTimeout: it
+        has no time left to run ``fn`` itself. It does run ``fn`` when the
+        leader's result is not ``reusable`` (e.g. cut short by the leader's
+        own deadline) or the leader failed with an error that is not
+        ``shareable`` (one that depends on the leader's budget); other
+        errors of the leader are re-raised in its followers.
+
+        Returns: (result, whether it was shared from another caller's run)
+
+        Raises:
+            FlightTimeout: If the leader did not finish within ``timeout``
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if not flight.done.wait(timeout):
+                raise FlightTimeout(f"Shared run for {key} did not finish within {timeout:.1f}s")
+            if flight.error is not None:
+                if shareable(flight.error):
+                    raise flight.error
+            elif reusable(flight.result):
+                return flight.result, True
+            return fn(), False
+
+        try:
+            flight.result = fn()
+            return flight.result, False
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
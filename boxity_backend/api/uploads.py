@@ -0,0 +1,114 @@
+"""
+Binary image uploads for /analyze: multipart/form-data and raw request bodies.
+"""
+import hashlib
+import os
+from typing import Any, Dict, List
+
+from .fetcher import DEFAULT_MAX_BYTES, SNIFF_BYTES, sniff_image_mime
+
+CHUNK_SIZE = 64 * 1024
+UPLOAD_MAX_IMAGE_BYTES = int(os.getenv("UPLOAD_MAX_IMAGE_BYTES", os.getenv("IMAGE_FETCH_MAX_BYTES", str(DEFAULT_MAX_BYTES))))
+UPLOAD_MAX_REQUEST_BYTES = int(os.getenv("UPLOAD_MAX_REQUEST_BYTES", str(4 * UPLOAD_MAX_IMAGE_BYTES + 1024 * 1024)))
+UPLOAD_MAX_FILES = int(os.getenv("UPLOAD_MAX_FILES", "16"))
+
+RAW_MIMETYPES = ("application/octet-stream",)
+# Non-file fields that are flags rather than strings
+BOOLEAN_FIELDS = ("include_timings",)
+
+
+class UploadError(ValueError):
+    """A rejected upload; ``status`` is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class UploadedImage:
+    """Image bytes received in the request body, validated by magic bytes."""
+
+    __slots__ = ("field", "data", "mime", "digest")
+
+    def __init__(self, field: str, data: bytes, mime: str):
+        self.field = field
+        self.data = data
+        self.mime = mime
+        self.digest = hashlib.sha256(data).hexdigest()
+
+    def __repr__(self) -> str:
+        return f"<UploadedImage {self.field} {self.mime} {len(self.data)} bytes>"
+
+
+def is_upload_request(req) -> bool:
+    mimetype = req.mimetype or ""
+    return mimetype == "multipart/form-data" or mimetype.startswith("image/") or mimetype in RAW_MIMETYPES
+
+
+def _read_image(field: str, stream, max_bytes: int) -> UploadedImage:
+    """Reads one image from ``stream``, sniffing the head before buffering the rest."""
+    head = stream.read(SNIFF_BYTES)
+    if not head:
+        raise UploadError(f"Field '{field}' is empty")
+    mime = sniff_image_mime(head)
+    if mime is None:
+        raise UploadError(f"Field '{field}' is not a supported image", 415)
+    buf = bytearray(head)
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        buf.extend(chunk)
+        if len(buf) > max_bytes:
+            raise UploadError(f"Field '{field}' exceeds {max_bytes} bytes", 413)
+    return UploadedImage(field, bytes(buf), mime)
+
+
+def _check_request_size(req, require_length: bool) -> None:
+    length = req.content_length
+    if length is None:
+        if require_length:
+            raise UploadError("Content-Length is required for multipart uploads", 411)
+        return
+    if length > UPLOAD_MAX_REQUEST_BYTES:
+        raise UploadError(f"Request body exceeds {UPLOAD_MAX_REQUEST_BYTES} bytes", 413)
+
+
+def _form_fields(values) -> Dict[str, Any]:
+    data: Dict[str, Any] = {}
+    for key in values.keys():
+        value = values.get(key)
+        if key in BOOLEAN_FIELDS:
+            data[key] = str(value).strip().lower() in ("1", "true", "yes", "on")
+        else:
+            data[key] = value
+    return data
+
+
+def parse_upload_request(req) -> Dict[str, Any]:
+    """Analysis request body from a multipart or raw upload, images as UploadedImage.
+
+    Raises:
+        UploadError: If the body is too large, not an image or malformed
+    """
+    if req.mimetype == "multipart/form-data":
+        # Werkzeug spools the parts while parsing, so the total is capped up front
+        _check_request_size(req, require_length=True)
+        data = _form_fields(req.form)
+        count = 0
+        for field in req.files.keys():
+            images: List[UploadedImage] = []
+            for storage in req.files.getlist(field):
+                count += 1
+                if count > UPLOAD_MAX_FILES:
+                    raise UploadError(f"At most {UPLOAD_MAX_FILES} images per request", 413)
+                images.append(_read_image(field, storage.stream, UPLOAD_MAX_IMAGE_BYTES))
+            data[field] = images[0] if len(images) == 1 else images
+        return data
+
+    _check_request_size(req, require_length=False)
+    data = _form_fields(req.args)
+    field = str(data.pop("field", None) or "current")
+    data[field] = _read_image(field, req.stream, UPLOAD_MAX_IMAGE_BYTES)
+    return data
+
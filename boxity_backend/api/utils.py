@@ -2,19 +2,24 @@ import base64
 import io
 from typing import Any, Dict, Optional, Tuple
 
-try:
-    import requests
-except Exception:
-    requests = None
-
 try:
     from PIL import Image, ExifTags
 except Exception:
     Image = None
     ExifTags = None
 
+from .cache import load_cached
+from .fetcher import get_fetcher
+
 
 def load_image_bytes(source: str) -> Tuple[Optional[bytes], Optional[str]]:
+    record, _ = load_cached(source, _fetch_image_bytes)
+    if record is None:
+        return None, None
+    return record.data, record.mime
+
+
+def _fetch_image_bytes(source: str) -> Tuple[Optional[bytes], Optional[str]]:
     if not source:
         return None, None
     if source.startswith('data:'):
@@ -29,16 +34,7 @@ def load_image_bytes(source: str) -> Tuple[Optional[bytes], Optional[str]]:
             return base64.b64decode(source), 'image/jpeg'
         except Exception:
             return None, None
-    if requests is None:
-        return None, None
-    try:
-        resp = requests.get(source, timeout=20)
-        if resp.status_code == 200:
-            mime = resp.headers.get('Content-Type', '').split(';')[0] or None
-            return resp.content, mime
-    except Exception:
-        return None, None
-    return None, None
+    return get_fetcher().fetch(source)
 
 
 def get_image_info(img_bytes: Optional[bytes]) -> Dict[str, Any]:
@@ -1,5 +1,9 @@
+
+import os
+import queue
 import sys
-from typing import Any, Dict, List, Optional, Tuple
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 try:
     import cv2  # type: ignore
@@ -8,99 +12,511 @@ except Exception:
     cv2 = None
     np = None
 
+from .cache import ImageRecord, get_image_cache
+from .features import get_feature_store
+from .metrics import inc, stage
+
+# Longest edge of the pyramid level the classical change mask is computed on
+DIFF_MAX_EDGE = max(64, int(os.getenv("CV_DIFF_MAX_EDGE", "1024")))
+# Alignment: longest edge of the level features are matched on; a detector whose homography
+# has at least ALIGN_MIN_INLIERS inliers making up ALIGN_MIN_INLIER_RATIO of the matches ends the search
+ALIGN_MAX_EDGE = max(128, int(os.getenv("CV_ALIGN_MAX_EDGE", "1024")))
+ALIGN_MIN_INLIERS = max(8, int(os.getenv("CV_ALIGN_MIN_INLIERS", "40")))
+ALIGN_MIN_INLIER_RATIO = float(os.getenv("CV_ALIGN_MIN_INLIER_RATIO", "0.3"))
+# Descriptor count from which FLANN (LSH for ORB, KD-tree for SIFT) replaces brute-force matching
+ALIGN_FLANN_MIN = max(1, int(os.getenv("CV_ALIGN_FLANN_MIN", "1000")))
+FLANN_INDEX_KDTREE = 1
+FLANN_INDEX_LSH = 6
+
+
+def decode_image(image: Any) -> Optional["np.ndarray"]:
+    """Decoded BGR array for an ImageRecord, encoded bytes or an already decoded array.
+
+    Records are decoded at most once; the array is kept on the record (and
+    accounted for by the image cache) for every later stage.
+    """
+    if cv2 is None or image is None:
+        return None
+    if isinstance(image, ImageRecord):
+        if image.array is None:
+            arr = cv2.imdecode(np.frombuffer(image.data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if arr is None:
+                return None
+            get_image_cache().attach(image, array=arr)
+        return image.array
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+    return image
+
+
+class _CvObjects:
+    """Feature detectors and CLAHE for one thread at a time (OpenCV objects aren't thread-safe)."""
+
+    def __init__(self):
+        self.orb = cv2.ORB_create(nfeatures=1500)
+        self._sift = None
+        self.clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
+
+    @property
+    def sift(self):
+        # Created on first use: most pairs align on ORB alone
+        if self._sift is None and hasattr(cv2, "SIFT_create"):
+            self._sift = cv2.SIFT_create(nfeatures=1000)
+        return self._sift
+
+    def detector(self, name: str):
+        return self.orb if name == "orb" else self.sift
+
+
+_cv_objects_pool: "queue.SimpleQueue[_CvObjects]" = queue.SimpleQueue()
 
-def align_and_normalize(b_bytes: bytes, c_bytes: bytes) -> Tuple[Optional["cv2.Mat"], Optional["cv2.Mat"]]:
-    """Enhanced image alignment and normalization for better comparison accuracy."""
+
+@contextmanager
+def _cv_objects() -> Iterator[_CvObjects]:
+    try:
+        objs = _cv_objects_pool.get_nowait()
+    except queue.Empty:
+        objs = _CvObjects()
+    try:
+        yield objs
+    finally:
+        _cv_objects_pool.put(objs)
+
+
+def warmup(count: int = 2) -> None:
+    """Pre-creates detector/CLAHE sets so the first requests don't pay for them."""
+    if cv2 is None:
+        return
+    for _ in range(max(0, count - _cv_objects_pool.qsize())):
+        _cv_objects_pool.put(_CvObjects())
+
+
+def _pack_keypoints(kps) -> "np.ndarray":
+    """Keypoints as an (N, 7) float32 array: x, y, size, angle, response, octave, class_id."""
+    if not kps:
+        return np.zeros((0, 7), dtype=np.float32)
+    return np.array(
+        [(k.pt[0], k.pt[1], k.size, k.angle, k.response, k.octave, k.class_id) for k in kps],
+        dtype=np.float32,
+    )
+
+
+def _normalize_lab(bgr, clahe) -> "np.ndarray":
+    # Convert to LAB color space for better perceptual uniformity and apply CLAHE to L channel (luminance)
+    lab = cv2.cvtColor(bgr, cv2.COLOR_BGR2LAB)
+    lab[:, :, 0] = clahe.apply(lab[:, :, 0])
+    return lab
+
+
+def _finish_normalization(lab) -> "np.ndarray":
+    # Convert back to BGR, then blend in histogram equalization for better contrast
+    # The equalized plane is blended as 3 channels; blending it as 1 channel raised before scoring version cv-v4
+    bgr = cv2.cvtColor(np.ascontiguousarray(lab), cv2.COLOR_LAB2BGR)
+    eq = cv2.cvtColor(cv2.equalizeHist(cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)), cv2.COLOR_GRAY2BGR)
+    return cv2.addWeighted(bgr, 0.8, eq, 0.2, 0)
+
+
+def _detection_level(bgr) -> Tuple["np.ndarray", float]:
+    """Grayscale pyramid level with longest edge <= ALIGN_MAX_EDGE, and its scale factor."""
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape[:2]
+    scale = min(1.0, ALIGN_MAX_EDGE / float(max(h, w)))
+    if scale < 1.0:
+        gray = cv2.resize(gray, (max(1, int(round(w * scale))), max(1, int(round(h * scale)))), interpolation=cv2.INTER_AREA)
+    return gray, scale
+
+
+class _Baseline:
+    """Baseline-side alignment inputs, loaded from the feature store or computed on demand."""
+
+    def __init__(self, bgr, objs: _CvObjects, key: Optional[str]):
+        self.bgr = bgr
+        self.objs = objs
+        self.key = key
+        self.store = get_feature_store() if key else None
+        self._level: Optional[Tuple["np.ndarray", float]] = None
+
+    def level(self) -> Tuple["np.ndarray", float]:
+        if self._level is None:
+            self._level = _detection_level(self.bgr)
+        return self._level
+
+    def lab(self) -> "np.ndarray":
+        if self.store is not None:
+            cached = self.store.load(self.key)
+            if cached is not None and cached.get("lab") is not None and tuple(cached["lab"].shape[:2]) == self.bgr.shape[:2]:
+                return cached["lab"]
+        lab = _normalize_lab(self.bgr, self.objs.clahe)
+        if self.store is not None:
+            self.store.save(self.key, {"lab": lab})
+        return lab
+
+    def features(self, name: str) -> Tuple[Optional["np.ndarray"], Optional["np.ndarray"]]:
+        """(packed keypoints, descriptors) of detector ``name`` at the detection level."""
+        # Keypoint coordinates depend on the detection level, so its size is part of the key
+        store_key = f"{self.key}-{name}-{ALIGN_MAX_EDGE}" if self.store is not None else None
+        if store_key is not None:
+            cached = self.store.load(store_key)
+            if cached is not None and "kp" in cached:
+                return cached["kp"], cached.get("desc")
+        gray, _ = self.level()
+        try:
+            kps, desc = self.objs.detector(name).detectAndCompute(gray, None)
+        except Exception as e:
+            print(f"Baseline {name} features failed: {e}", file=sys.stderr)
+            return None, None
+        kp = _pack_keypoints(kps)
+        if store_key is not None:
+            self.store.save(store_key, {"kp": kp, "desc": desc})
+        return kp, desc
+
+
+def _matcher(name: str, large: bool):
+    if name == "orb":
+        if large:
+            return cv2.FlannBasedMatcher(
+                dict(algorithm=FLANN_INDEX_LSH, table_number=6, key_size=12, multi_probe_level=1), dict(checks=50))
+        return cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=False)
+    if large:
+        return cv2.FlannBasedMatcher(dict(algorithm=FLANN_INDEX_KDTREE, trees=4), dict(checks=64))
+    return cv2.BFMatcher(cv2.NORM_L2, crossCheck=False)
+
+
+def _estimate(name: str, k1, d1, gray, objs: _CvObjects) -> Dict[str, Any]:
+    """Ratio-test matches and a RANSAC homography (current -> baseline) at the detection level."""
+    result: Dict[str, Any] = {"path": name, "matches": 0, "inliers": 0, "homography": None, "matcher": None}
+    if k1 is None or d1 is None or len(k1) < 15:
+        return result
+    k2, d2 = objs.detector(name).detectAndCompute(gray, None)
+    if d2 is None or len(k2) < 15:
+        return result
+    large = min(len(d1), len(d2)) >= ALIGN_FLANN_MIN
+    result["matcher"] = "flann" if large else "bf"
+    d1 = np.asarray(d1)
+    if name != "orb":
+        d1, d2 = d1.astype(np.float32, copy=False), d2.astype(np.float32, copy=False)
+    ratio = 0.7 if name == "orb" else 0.75
+    matches = _matcher(name, large).knnMatch(d1, d2, k=2)
+    good = [p[0] for p in matches if len(p) == 2 and p[0].distance < ratio * p[1].distance]
+    result["matches"] = len(good)
+    if len(good) < 12:
+        return result
+    src_pts = np.float32([k2[m.trainIdx].pt for m in good]).reshape(-1, 1, 2)
+    dst_pts = np.float32([k1[m.queryIdx, :2] for m in good]).reshape(-1, 1, 2)
+    H, mask = cv2.findHomography(src_pts, dst_pts, cv2.RANSAC, 3.0, maxIters=2000)
+    if H is not None and mask is not None:
+        result["homography"] = H
+        result["inliers"] = int(mask.sum())
+    return result
+
+
+def _good_enough(result: Dict[str, Any]) -> bool:
+    return (result["inliers"] >= ALIGN_MIN_INLIERS
+            and result["inliers"] >= ALIGN_MIN_INLIER_RATIO * max(1, result["matches"]))
+
+
+@stage("align")
+def align_and_normalize(
+    baseline: Any,
+    current: Any,
+    baseline_key: Optional[str] = None,
+    info: Optional[Dict[str, Any]] = None,
+) -> Tuple[Optional["cv2.Mat"], Optional["cv2.Mat"]]:
+    """Enhanced image alignment and normalization for better comparison accuracy.
+
+    Inputs may be ImageRecords, encoded bytes or decoded BGR arrays.
+    ``baseline_key`` (the baseline image hash, taken from the record when not
+    given) enables reuse of precomputed baseline features from the feature
+    store. If ``info`` is given it is filled with the alignment path taken
+    ("orb", "sift" or "none"), the detectors tried, the matcher, the inlier
+    count and ratio, and the detection scale.
+    """
     if cv2 is None:
         return None, None
-    
+
     try:
-        b_arr = np.frombuffer(b_bytes, dtype=np.uint8)
-        c_arr = np.frombuffer(c_bytes, dtype=np.uint8)
-        b = cv2.imdecode(b_arr, cv2.IMREAD_COLOR)
-        c = cv2.imdecode(c_arr, cv2.IMREAD_COLOR)
+        if baseline_key is None and isinstance(baseline, ImageRecord):
+            baseline_key = baseline.digest
+        b = decode_image(baseline)
+        c = decode_image(current)
         if b is None or c is None:
             return None, None
-            
+
         h, w = b.shape[:2]
-        c_resized = cv2.resize(c, (w, h), interpolation=cv2.INTER_AREA)
+        if c.shape[:2] != (h, w):
+            c_resized = cv2.resize(c, (w, h), interpolation=cv2.INTER_AREA)
+        else:
+            c_resized = c
+
+        with _cv_objects() as objs:
+            return _align_with(objs, b, c_resized, baseline_key, info if info is not None else {})
 
-        # Enhanced feature-based alignment with multiple detectors
-        try:
-            # Use multiple feature detectors for better alignment
-            detectors = [
-                cv2.ORB_create(nfeatures=1500),
-                cv2.SIFT_create(nfeatures=1000) if hasattr(cv2, 'SIFT_create') else None
-            ]
-            
-            best_homography = None
-            best_match_count = 0
-            
-            for detector in detectors:
-                if detector is None:
-                    continue
-                    
-                k1, d1 = detector.detectAndCompute(b, None)
-                k2, d2 = detector.detectAndCompute(c_resized, None)
-                
-                if d1 is not None and d2 is not None and len(k1) >= 15 and len(k2) >= 15:
-                    # Use appropriate matcher based on detector type
-                    if 'ORB' in str(type(detector)):
-                        matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=False)
-                        matches = matcher.knnMatch(d1, d2, k=2)
-                        good = []
-                        for m, n in matches:
-                            if m.distance < 0.7 * n.distance:  # Stricter ratio
-                                good.append(m)
-                    else:
-                        matcher = cv2.BFMatcher(cv2.NORM_L2, crossCheck=False)
-                        matches = matcher.knnMatch(d1, d2, k=2)
-                        good = []
-                        for m, n in matches:
-                            if m.distance < 0.75 * n.distance:
-                                good.append(m)
-                    
-                    if len(good) >= 12:  # Require more matches for better alignment
-                        src_pts = np.float32([k1[m.queryIdx].pt for m in good]).reshape(-1, 1, 2)
-                        dst_pts = np.float32([k2[m.trainIdx].pt for m in good]).reshape(-1, 1, 2)
-                        
-                        # Use RANSAC with stricter parameters
-                        H, mask = cv2.findHomography(dst_pts, src_pts, cv2.RANSAC, 3.0, maxIters=2000)
-                        
-                        if H is not None and np.sum(mask) > best_match_count:
-                            best_homography = H
-                            best_match_count = np.sum(mask)
-            
-            # Apply best homography if found
-            if best_homography is not None and best_match_count >= 8:
-                c_resized = cv2.warpPerspective(c_resized, best_homography, (w, h))
-                
-        except Exception as e:
-            print(f"Alignment failed: {e}", file=sys.stderr)
-            pass
-
-        # Enhanced illumination normalization
-        # Convert to LAB color space for better perceptual uniformity
-        b_lab = cv2.cvtColor(b, cv2.COLOR_BGR2LAB)
-        c_lab = cv2.cvtColor(c_resized, cv2.COLOR_BGR2LAB)
-        
-        # Apply CLAHE to L channel (luminance)
-        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-        b_lab[:, :, 0] = clahe.apply(b_lab[:, :, 0])
-        c_lab[:, :, 0] = clahe.apply(c_lab[:, :, 0])
-        
-        # Convert back to BGR
-        b_norm = cv2.cvtColor(b_lab, cv2.COLOR_LAB2BGR)
-        c_norm = cv2.cvtColor(c_lab, cv2.COLOR_LAB2BGR)
-        
-        # Additional histogram equalization for better contrast
-        b_norm = cv2.addWeighted(b_norm, 0.8, cv2.equalizeHist(cv2.cvtColor(b_norm, cv2.COLOR_BGR2GRAY)), 0.2, 0)
-        c_norm = cv2.addWeighted(c_norm, 0.8, cv2.equalizeHist(cv2.cvtColor(c_norm, cv2.COLOR_BGR2GRAY)), 0.2, 0)
-        
-        return b_norm, c_norm
-        
     except Exception as e:
         print(f"Normalization failed: {e}", file=sys.stderr)
         return None, None
 
 
+def _align_with(objs: _CvObjects, b, c_resized, baseline_key: Optional[str],
+                info: Dict[str, Any]) -> Tuple["np.ndarray", "np.ndarray"]:
+    """Homography alignment of ``c_resized`` onto ``b`` plus illumination normalization of both.
+
+    ORB runs first; SIFT only when ORB's inliers fall short of ALIGN_MIN_INLIERS / ALIGN_MIN_INLIER_RATIO.
+    """
+    h, w = b.shape[:2]
+    base = _Baseline(b, objs, baseline_key)
+    best: Optional[Dict[str, Any]] = None
+    tried: List[str] = []
+
+    try:
+        gray, scale = _detection_level(c_resized)
+        for name in ("orb", "sift"):
+            if objs.detector(name) is None:
+                continue
+            tried.append(name)
+            k1, d1 = base.features(name)
+            result = _estimate(name, k1, d1, gray, objs)
+            if best is None or result["inliers"] > best["inliers"]:
+                best = result
+            if _good_enough(result):
+                break
+
+        if best is not None and best["homography"] is not None and best["inliers"] >= 8:
+            # Detection-level homography -> full resolution: H_full = S^-1 . H . S
+            S = np.diag([scale, scale, 1.0])
+            H_full = np.linalg.inv(S) @ best["homography"] @ S
+            c_resized = cv2.warpPerspective(c_resized, H_full, (w, h))
+        else:
+            best = None
+        info.update({
+            "path": best["path"] if best is not None else "none",
+            "detectors": tried,
+            "matcher": best["matcher"] if best is not None else None,
+            "inliers": best["inliers"] if best is not None else 0,
+            "inlier_ratio": round(best["inliers"] / max(1, best["matches"]), 3) if best is not None else 0.0,
+            "scale": round(scale, 4),
+        })
+
+    except Exception as e:
+        print(f"Alignment failed: {e}", file=sys.stderr)
+        info.update({"path": "none", "detectors": tried, "error": str(e)})
+    inc("boxity_alignment_total", {"path": info.get("path", "none")})
+
+    # Enhanced illumination normalization (baseline LAB planes come precomputed)
+    b_norm = _finish_normalization(base.lab())
+    c_norm = _finish_normalization(_normalize_lab(c_resized, objs.clahe))
+
+    return b_norm, c_norm
+
+
+def _clamp(value: int, lo: int, hi: int) -> int:
+    return max(lo, min(hi, value))
+
+
+def _region_from_bbox(x: int, y: int, w: int, h: int, img_w: int, img_h: int) -> str:
+    cx = x + (w / 2.0)
+    cy = y + (h / 2.0)
+    if cy < img_h / 3.0:
+        v = "top"
+    elif cy > (2.0 * img_h) / 3.0:
+        v = "bottom"
+    else:
+        v = "middle"
+    if cx < img_w / 3.0:
+        u = "left"
+    elif cx > (2.0 * img_w) / 3.0:
+        u = "right"
+    else:
+        u = "center"
+    return f"{v}-{u}"
+
+
+def _crop_common(bgr, x0: int, y0: int, x1: int, y1: int, w: int, h: int):
+    """Crops a region given in common (w, h) coordinates from an image of any size."""
+    ih, iw = bgr.shape[:2]
+    if (ih, iw) == (h, w):
+        return bgr[y0:y1, x0:x1]
+    sx, sy = iw / float(w), ih / float(h)
+    crop = bgr[int(y0 * sy):max(int(y0 * sy) + 1, int(round(y1 * sy))), int(x0 * sx):max(int(x0 * sx) + 1, int(round(x1 * sx)))]
+    return cv2.resize(crop, (x1 - x0, y1 - y0), interpolation=cv2.INTER_AREA)
+
+
+def _refine_bbox(bgr1, bgr2, coarse_mask, scale: float, threshold: float, w: int, h: int) -> Optional[Tuple[int, int, int, int]]:
+    """Tight full-resolution bbox of changed pixels inside a coarse component's footprint."""
+    ys, xs = np.nonzero(coarse_mask)
+    if len(xs) == 0:
+        return None
+    pad = int(np.ceil(1.0 / scale)) + 2
+    x0 = max(0, int(xs.min() / scale) - pad)
+    y0 = max(0, int(ys.min() / scale) - pad)
+    x1 = min(w, int(np.ceil((xs.max() + 1) / scale)) + pad)
+    y1 = min(h, int(np.ceil((ys.max() + 1) / scale)) + pad)
+    if x1 - x0 < 2 or y1 - y0 < 2:
+        return None
+
+    g1 = cv2.GaussianBlur(cv2.cvtColor(_crop_common(bgr1, x0, y0, x1, y1, w, h), cv2.COLOR_BGR2GRAY), (5, 5), 0)
+    g2 = cv2.GaussianBlur(cv2.cvtColor(_crop_common(bgr2, x0, y0, x1, y1, w, h), cv2.COLOR_BGR2GRAY), (5, 5), 0)
+    changed = (cv2.absdiff(g1, g2) > threshold).astype(np.uint8)
+
+    # Restrict to the (slightly dilated) coarse footprint so neighbouring blobs don't leak in
+    footprint = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+    sub = coarse_mask[int(y0 * scale):int(np.ceil(y1 * scale)), int(x0 * scale):int(np.ceil(x1 * scale))].astype(np.uint8)
+    if sub.size:
+        footprint = cv2.resize(sub, (x1 - x0, y1 - y0), interpolation=cv2.INTER_NEAREST)
+        footprint = cv2.dilate(footprint, np.ones((pad, pad), dtype=np.uint8))
+    changed &= footprint
+    if not changed.any():
+        return None
+    bx, by, bw, bh = cv2.boundingRect(changed)
+    return x0 + bx, y0 + by, bw, bh
+
+
+def classical_diff_regions(baseline: Any, current: Any) -> List[Dict[str, Any]]:
+    """Classical CV region proposals; accepts ImageRecords, encoded bytes or decoded BGR arrays.
+
+    Boxes are in pixels of the common (min) size.
+    """
+    if cv2 is None or np is None:
+        return []
+
+    bgr1 = decode_image(baseline)
+    bgr2 = decode_image(current)
+    if bgr1 is None or bgr2 is None:
+        return []
+
+    h1, w1 = bgr1.shape[:2]
+    h2, w2 = bgr2.shape[:2]
+    h = min(h1, h2)
+    w = min(w1, w2)
+    if h < 32 or w < 32:
+        return []
+
+    # Integer decimation factor keeps cv2.resize(INTER_AREA) on its fast box-filter path
+    factor = max(1, int(np.ceil(max(w, h) / float(DIFF_MAX_EDGE))))
+    ws, hs = max(1, w // factor), max(1, h // factor)
+    scale = ws / float(w)
+
+    def coarse_gray(bgr):
+        gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+        if gray.shape[:2] != (hs, ws):
+            gray = cv2.resize(gray, (ws, hs), interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    g1 = coarse_gray(bgr1)
+    g2 = coarse_gray(bgr2)
+
+    absdiff = cv2.absdiff(g1, g2)
+    mean_abs = float(np.mean(absdiff)) / 255.0
+
+    otsu, th = cv2.threshold(absdiff, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+    th = cv2.morphologyEx(th, cv2.MORPH_OPEN, kernel, iterations=1)
+    th = cv2.morphologyEx(th, cv2.MORPH_CLOSE, kernel, iterations=2)
+
+    n_labels, labels, stats, _ = cv2.connectedComponentsWithStats(th, connectivity=8)
+    small_area = float(ws * hs)
+    area_ratios = stats[1:, cv2.CC_STAT_AREA].astype(np.float64) / small_area
+    candidates = [int(i) + 1 for i in np.nonzero(area_ratios >= 0.0015)[0]]
+    candidates.sort(key=lambda lbl: stats[lbl, cv2.CC_STAT_AREA], reverse=True)
+
+    diffs: List[Dict[str, Any]] = []
+    idx = 0
+    total_changed_ratio = 0.0
+    for lbl in candidates[:3]:
+        area_ratio = float(area_ratios[lbl - 1])
+        total_changed_ratio += area_ratio
+
+        sx, sy, sw, sh = (int(v) for v in stats[lbl, :4])
+        bbox = None
+        try:
+            coarse_mask = np.zeros((hs, ws), dtype=bool)
+            coarse_mask[sy:sy + sh, sx:sx + sw] = labels[sy:sy + sh, sx:sx + sw] == lbl
+            bbox = _refine_bbox(bgr1, bgr2, coarse_mask, scale, float(otsu), w, h)
+        except Exception as e:
+            print(f"Diff region refinement failed: {e}", file=sys.stderr)
+        if bbox is None:
+            bbox = (int(sx / scale), int(sy / scale), max(1, int(round(sw / scale))), max(1, int(round(sh / scale))))
+        x, y, bw, bh = bbox
+        region = _region_from_bbox(int(x), int(y), int(bw), int(bh), w, h)
+
+        if area_ratio >= 0.04:
+            severity = "HIGH"
+            tis_delta = -int(_clamp(int(round(area_ratio * 120)), 6, 14))
+            confidence = min(0.98, 0.75 + area_ratio)
+            suggested_action = "Quarantine"
+        elif area_ratio >= 0.015:
+            severity = "MEDIUM"
+            tis_delta = -int(_clamp(int(round(area_ratio * 90)), 4, 10))
+            confidence = min(0.95, 0.65 + (area_ratio * 2.0))
+            suggested_action = "Review"
+        else:
+            severity = "LOW"
+            tis_delta = -int(_clamp(int(round(area_ratio * 70)), 2, 6))
+            confidence = min(0.9, 0.55 + (area_ratio * 3.0))
+            suggested_action = "Review"
+
+        diffs.append({
+            "id": f"cv-{idx}",
+            "region": region,
+            "bbox": [int(x), int(y), int(bw), int(bh)],
+            "type": "physical_damage",
+            "description": "Classical CV detected visual change consistent with damage/deformation.",
+            "severity": severity,
+            "confidence": float(confidence),
+            "explainability": [],
+            "suggested_action": suggested_action,
+            "tis_delta": int(tis_delta),
+        })
+        idx += 1
+
+    changed_ratio = float(total_changed_ratio)
+    if not diffs:
+        if mean_abs >= 0.06:
+            impact = max(mean_abs * 120.0, changed_ratio * 200.0)
+            diffs.append({
+                "id": "cv-global",
+                "region": "global",
+                "bbox": None,
+                "type": "global_mismatch",
+                "description": "Classical CV detected a strong global mismatch between images.",
+                "severity": "HIGH" if mean_abs >= 0.12 else "MEDIUM",
+                "confidence": 0.85 if mean_abs >= 0.12 else 0.7,
+                "explainability": [],
+                "suggested_action": "Quarantine" if mean_abs >= 0.12 else "Review",
+                "tis_delta": -int(_clamp(int(round(impact)), 8, 26)) if mean_abs >= 0.12 else -int(_clamp(int(round(impact * 0.8)), 5, 18)),
+            })
+    else:
+        if mean_abs >= 0.10 or changed_ratio >= 0.06:
+            impact = max(mean_abs * 140.0, changed_ratio * 240.0)
+            diffs.append({
+                "id": "cv-global-severity",
+                "region": "global",
+                "bbox": None,
+                "type": "global_damage_indicator",
+                "description": "Classical CV indicates widespread change across the package surface.",
+                "severity": "HIGH",
+                "confidence": 0.9,
+                "explainability": [],
+                "suggested_action": "Quarantine",
+                "tis_delta": -int(_clamp(int(round(impact)), 8, 24)),
+            })
+
+    return diffs
+
+
+def cv_fallback_regions(baseline: Any, current: Any, baseline_key: Optional[str] = None,
+                        info: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Region proposals for the classical fallback: aligned and normalized when possible, raw otherwise.
+
+    Accepts ImageRecords, encoded bytes or decoded BGR arrays (as handed over
+    by the CV process pool, see cv_pool.py). ``info`` receives the alignment
+    report of align_and_normalize.
+    """
+    regions: List[Dict[str, Any]] = []
+    ab, ac = align_and_normalize(baseline, current, baseline_key, info)
+    if ab is not None and ac is not None:
+        with stage("classical_diff"):
+            regions = classical_diff_regions(ab, ac)
+    if not regions:
+        with stage("classical_diff"):
+            regions = classical_diff_regions(baseline, current)
+    return regions
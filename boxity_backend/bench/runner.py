@@ -0,0 +1,305 @@
+"""
+Benchmarks for the analysis pipeline on synthetic damaged-package pairs (``python -m bench --help``).
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Before the app is imported: keep benchmark runs free of state left by earlier runs
+for _var in ("FEATURE_STORE_DIR", "GEMINI_CACHE_PATH", "IMAGE_HTTP_CACHE_DIR", "METRICS_DIR"):
+    os.environ.setdefault(_var, "")
+
+from .synth import DAMAGE_TYPES, SyntheticPair, bbox_overlaps, make_pair
+
+CASES = ("align", "classical_diff", "compute_overall", "analyze", "analyze_concurrent")
+DEFAULT_SIZES = "1024x768,2048x1536,4000x3000"
+# Regressions smaller than this are noise for every case we time
+MIN_REGRESSION_MS = 1.0
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Linear-interpolated percentile (q in 0..100) of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def _peak_rss_mb() -> Optional[float]:
+    from api.metrics import peak_rss_bytes
+
+    rss = peak_rss_bytes()
+    return round(rss / (1024 * 1024), 1) if rss is not None else None
+
+
+def summarize(durations_s: List[float], wall_s: Optional[float] = None) -> Dict[str, Any]:
+    """Latency percentiles (ms) and throughput; ``wall_s`` for runs whose calls overlapped."""
+    ms = sorted(d * 1000.0 for d in durations_s)
+    total = wall_s if wall_s is not None else sum(durations_s)
+    return {
+        "n": len(ms),
+        "mean_ms": round(sum(ms) / len(ms), 3) if ms else 0.0,
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "min_ms": round(ms[0], 3) if ms else 0.0,
+        "max_ms": round(ms[-1], 3) if ms else 0.0,
+        "throughput_per_s": round(len(ms) / total, 3) if total > 0 else 0.0,
+    }
+
+
+def measure(fn: Callable[[], Any], iterations: int, warmup: int = 1) -> Dict[str, Any]:
+    """Times ``fn`` serially, then runs it once more under tracemalloc for its peak Python/NumPy heap."""
+    for _ in range(warmup):
+        fn()
+    durations = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - started)
+    stats = summarize(durations)
+    # Separate pass: tracing allocations slows the call down. OpenCV's own
+    # buffers are not visible to tracemalloc, hence the process RSS as well.
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    stats["peak_traced_mb"] = round(peak / (1024 * 1024), 2)
+    stats["process_peak_rss_mb"] = _peak_rss_mb()
+    return stats
+
+
+def measure_concurrent(fn: Callable[[], Any], iterations: int, concurrency: int) -> Dict[str, Any]:
+    """Runs ``fn`` ``iterations * concurrency`` times from ``concurrency`` threads."""
+    def timed() -> float:
+        started = time.perf_counter()
+        fn()
+        return time.perf_counter() - started
+
+    fn()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        started = time.perf_counter()
+        durations = list(ex.map(lambda _: timed(), range(iterations * concurrency)))
+        wall = time.perf_counter() - started
+    stats = summarize(durations, wall_s=wall)
+    stats["concurrency"] = concurrency
+    stats["process_peak_rss_mb"] = _peak_rss_mb()
+    return stats
+
+
+def _stub_gemini(index_module, latency_ms: float) -> None:
+    """Replaces the Gemini ensemble with an offline stand-in that finds nothing."""
+    def call_gemini(*args: Any, **kwargs: Any) -> List[Dict[str, Any]]:
+        if latency_ms > 0:
+            time.sleep(latency_ms / 1000.0)
+        info = kwargs.get("info")
+        if info is not None:
+            info["cache"] = "disabled"
+        return []
+
+    index_module._call_gemini = call_gemini
+    index_module._configure_genai = lambda: True
+
+
+def damage_recall(pair: SyntheticPair, differences: List[Dict[str, Any]]) -> float:
+    """Share of injected damages overlapped by at least one reported region."""
+    if not pair.damages:
+        return 1.0
+    height, width = pair.baseline.shape[:2]
+    boxes = []
+    for d in differences:
+        bbox = d.get("bbox")
+        if not isinstance(bbox, (list, tuple)) or len(bbox) != 4:
+            continue
+        # Gemini reports normalized boxes, the CV fallback pixels
+        if any(float(v) > 1.0 for v in bbox):
+            bbox = (bbox[0] / width, bbox[1] / height, bbox[2] / width, bbox[3] / height)
+        boxes.append(bbox)
+    found = sum(1 for dmg in pair.damages if any(bbox_overlaps(dmg.bbox, b) for b in boxes))
+    return round(found / len(pair.damages), 3)
+
+
+def run_size(width: int, height: int, cases: Sequence[str], args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    from api import index, vision
+    from api.cache import get_image_cache
+
+    pair = make_pair(width, height, damages=args.damages, perspective=args.perspective,
+                     illumination=args.illumination, seed=args.seed)
+    baseline_bytes, current_bytes = pair.encoded()
+    baseline = vision.decode_image(baseline_bytes)
+    current = vision.decode_image(current_bytes)
+    aligned = vision.align_and_normalize(baseline, current)
+    regions = index._classical_diff_regions(*aligned) if aligned[0] is not None else []
+
+    body = {
+        "baseline_b64": base64.b64encode(baseline_bytes).decode("ascii"),
+        "current_b64": base64.b64encode(current_bytes).decode("ascii"),
+    }
+    client = index.app.test_client()
+    last: Dict[str, Any] = {}
+    # The concurrent case stands for distinct requests, not duplicates sharing one analysis
+    index.ANALYZE_COALESCE = False
+
+    def analyze() -> None:
+        # Cold path: each request decodes and analyzes both images from scratch
+        get_image_cache().clear()
+        resp = client.post("/analyze", json=body)
+        if resp.status_code != 200:
+            raise RuntimeError(f"/analyze returned {resp.status_code}: {resp.get_data(as_text=True)[:200]}")
+        last["body"] = resp.get_json()
+
+    runners: Dict[str, Callable[[], Dict[str, Any]]] = {
+        "align": lambda: measure(lambda: vision.align_and_normalize(baseline, current), args.iterations),
+        "classical_diff": lambda: measure(lambda: index._classical_diff_regions(*aligned), args.iterations),
+        "compute_overall": lambda: measure(lambda: index._compute_overall([dict(r) for r in regions]), args.iterations * 10),
+        "analyze": lambda: measure(analyze, args.iterations),
+        "analyze_concurrent": lambda: measure_concurrent(analyze, args.iterations, args.concurrency),
+    }
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for case in cases:
+        stats = runners[case]()
+        if case.startswith("analyze") and last.get("body"):
+            stats["damage_recall"] = damage_recall(pair, last["body"].get("differences", []))
+        results[f"{width}x{height}/{case}"] = stats
+        _print_row(f"{width}x{height}/{case}", stats)
+    return results
+
+
+def _print_row(key: str, stats: Dict[str, Any]) -> None:
+    extra = ""
+    if stats.get("peak_traced_mb") is not None:
+        extra += f"  heap {stats['peak_traced_mb']:>8.1f}MB"
+    if stats.get("damage_recall") is not None:
+        extra += f"  recall {stats['damage_recall']:.2f}"
+    print(
+        f"{key:<36} n={stats['n']:<5} p50 {stats['p50_ms']:>10.3f}ms  p95 {stats['p95_ms']:>10.3f}ms  "
+        f"p99 {stats['p99_ms']:>10.3f}ms  {stats['throughput_per_s']:>10.1f}/s  rss {stats['process_peak_rss_mb']}MB{extra}",
+        flush=True,
+    )
+
+
+def _environment() -> Dict[str, Any]:
+    meta: Dict[str, Any] = {
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+    try:
+        import cv2
+        import numpy
+
+        meta["opencv"] = cv2.__version__
+        meta["numpy"] = numpy.__version__
+    except Exception:
+        pass
+    try:
+        meta["commit"] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, timeout=5
+        ).stdout.strip()
+    except Exception:
+        meta["commit"] = None
+    return meta
+
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """Prints p50/p95 deltas per case and returns the cases that regressed beyond ``threshold``."""
+    regressions = []
+    old_results = previous.get("results", {})
+    print(f"\nComparison with {previous.get('meta', {}).get('commit') or 'stored results'} (threshold {threshold:.0%}):")
+    for key, new in current["results"].items():
+        old = old_results.get(key)
+        if old is None:
+            continue
+        flags = []
+        for metric in ("p50_ms", "p95_ms"):
+            before, after = float(old.get(metric, 0.0)), float(new.get(metric, 0.0))
+            change = (after - before) / before if before > 0 else 0.0
+            flags.append(f"{metric} {before:.2f} -> {after:.2f} ({change:+.1%})")
+            if change > threshold and after - before > MIN_REGRESSION_MS:
+                regressions.append(f"{key} {metric}")
+        print(f"  {key:<36} " + "  ".join(flags))
+    if regressions:
+        print("\nREGRESSIONS: " + ", ".join(regressions))
+    else:
+        print("\nNo regressions.")
+    return regressions
+
+
+def _parse_sizes(value: str) -> List[Tuple[int, int]]:
+    sizes = []
+    for part in value.split(","):
+        w, _, h = part.strip().lower().partition("x")
+        sizes.append((int(w), int(h)))
+    return sizes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Benchmark the Boxity analysis pipeline.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"comma-separated WxH list (default {DEFAULT_SIZES})")
+    parser.add_argument("--cases", default=",".join(CASES), help="comma-separated subset of: " + ", ".join(CASES))
+    parser.add_argument("--iterations", type=int, default=10, help="timed calls per case (x10 for compute_overall)")
+    parser.add_argument("--concurrency", type=int, default=4, help="client threads for analyze_concurrent")
+    parser.add_argument("--damages", default=",".join(DAMAGE_TYPES), help="damage types injected into the current image")
+    parser.add_argument("--perspective", type=float, default=0.02, help="max corner shift as a fraction of the image")
+    parser.add_argument("--illumination", type=float, default=0.12, help="max relative illumination change")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--gemini", choices=("stub", "simulate", "replay"), default="stub",
+                        help="stub: no findings, no ensemble; simulate/replay: GEMINI_CLIENT stand-ins")
+    parser.add_argument("--gemini-latency-ms", type=float, default=0.0,
+                        help="Gemini latency per view (stub) or per member call (simulate, unless GEMINI_SIM_LATENCY is set)")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="stored results JSON to compare against; exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative p50/p95 slowdown counted as a regression")
+    args = parser.parse_args(argv)
+
+    args.damages = [d for d in args.damages.split(",") if d]
+    cases = [c for c in args.cases.split(",") if c]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+
+    from api import index
+
+    if args.gemini == "stub":
+        _stub_gemini(index, args.gemini_latency_ms)
+    else:
+        os.environ["GEMINI_CLIENT"] = args.gemini
+        if args.gemini_latency_ms > 0:
+            os.environ.setdefault("GEMINI_SIM_LATENCY", f"fixed:{args.gemini_latency_ms}")
+
+    report: Dict[str, Any] = {"meta": _environment(), "config": {
+        k: v for k, v in vars(args).items() if k not in ("output", "compare")
+    }, "results": {}}
+    for width, height in _parse_sizes(args.sizes):
+        report["results"].update(run_size(width, height, cases, args))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        if compare(previous, report, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
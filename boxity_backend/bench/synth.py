@@ -0,0 +1,195 @@
+"""
+Synthetic baseline/current package photos with known injected damage.
+"""
+from dataclasses import dataclass, field
+from typing import List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+DAMAGE_TYPES = ("dent", "scratch", "seal_gap")
+
+
+@dataclass
+class InjectedDamage:
+    type: str
+    bbox: Tuple[float, float, float, float]  # x, y, w, h in 0..1 of the baseline frame
+
+
+@dataclass
+class SyntheticPair:
+    baseline: np.ndarray
+    current: np.ndarray
+    damages: List[InjectedDamage] = field(default_factory=list)
+
+    def encoded(self, ext: str = ".jpg", quality: int = 92) -> Tuple[bytes, bytes]:
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality] if ext in (".jpg", ".jpeg") else []
+        return (
+            cv2.imencode(ext, self.baseline, params)[1].tobytes(),
+            cv2.imencode(ext, self.current, params)[1].tobytes(),
+        )
+
+
+def _render_package(width: int, height: int, rng: np.random.Generator) -> Tuple[np.ndarray, Tuple[int, int, int, int], Tuple[int, int, int, int]]:
+    """Returns (image, box rect, tape rect) with rects as (x0, y0, x1, y1)."""
+    scale = width / 1000.0
+    # Backdrop: soft vertical gradient plus sensor noise
+    ramp = np.linspace(150, 205, height, dtype=np.float32)[:, None, None]
+    img = np.repeat(np.repeat(ramp, width, axis=1), 3, axis=2)
+    img += rng.normal(0, 3, img.shape).astype(np.float32)
+
+    bx0, by0 = int(width * 0.14), int(height * 0.12)
+    bx1, by1 = int(width * 0.86), int(height * 0.9)
+    cardboard = np.array([95, 140, 185], dtype=np.float32) + rng.normal(0, 6, 3).astype(np.float32)
+    img[by0:by1, bx0:bx1] = cardboard
+    # Corrugation and print texture give the feature detectors something to lock on to
+    fibers = rng.normal(0, 9, (by1 - by0, bx1 - bx0, 1)).astype(np.float32)
+    img[by0:by1, bx0:bx1] += cv2.GaussianBlur(fibers, (0, 0), 1.2 * scale + 0.5)[..., None]
+    for _ in range(60):
+        cx = int(rng.integers(bx0 + 10, bx1 - 10))
+        cy = int(rng.integers(by0 + 10, by1 - 10))
+        color = tuple(float(v) for v in rng.integers(20, 235, 3))
+        if rng.random() < 0.5:
+            cv2.circle(img, (cx, cy), max(2, int(rng.integers(4, 18) * scale)), color, -1, cv2.LINE_AA)
+        else:
+            cv2.putText(img, chr(int(rng.integers(65, 91))), (cx, cy), cv2.FONT_HERSHEY_SIMPLEX,
+                        0.9 * scale, color, max(1, int(2 * scale)), cv2.LINE_AA)
+
+    # Shipping label with text lines and a barcode
+    lx0, ly0 = int(bx0 + (bx1 - bx0) * 0.52), int(by0 + (by1 - by0) * 0.5)
+    lx1, ly1 = int(bx1 - (bx1 - bx0) * 0.06), int(by1 - (by1 - by0) * 0.08)
+    img[ly0:ly1, lx0:lx1] = 244
+    for i in range(4):
+        y = ly0 + int((i + 1) * (ly1 - ly0) * 0.13)
+        cv2.putText(img, f"BOX-{int(rng.integers(1000, 9999))}", (lx0 + int(8 * scale), y),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6 * scale, (30, 30, 30), max(1, int(1.5 * scale)), cv2.LINE_AA)
+    x = lx0 + int(10 * scale)
+    bar_top, bar_bottom = ly0 + int((ly1 - ly0) * 0.62), ly1 - int(8 * scale)
+    while x < lx1 - int(10 * scale):
+        bar_w = max(1, int(rng.integers(1, 4) * scale))
+        if rng.random() < 0.6:
+            img[bar_top:bar_bottom, x:x + bar_w] = 15
+        x += bar_w + max(1, int(rng.integers(1, 3) * scale))
+
+    # Tape seal across the top flap
+    tx0, tx1 = int(width * 0.42), int(width * 0.58)
+    ty0, ty1 = by0, int(by0 + (by1 - by0) * 0.45)
+    img[ty0:ty1, tx0:tx1] = img[ty0:ty1, tx0:tx1] * 0.35 + np.array([200, 205, 210], dtype=np.float32) * 0.65
+
+    return np.clip(img, 0, 255).astype(np.uint8), (bx0, by0, bx1, by1), (tx0, ty0, tx1, ty1)
+
+
+def _norm_bbox(x0: int, y0: int, x1: int, y1: int, width: int, height: int) -> Tuple[float, float, float, float]:
+    return (x0 / width, y0 / height, (x1 - x0) / width, (y1 - y0) / height)
+
+
+def _inject_dent(img: np.ndarray, box: Tuple[int, int, int, int], rng: np.random.Generator) -> Tuple[int, int, int, int]:
+    h, w = img.shape[:2]
+    bx0, by0, bx1, by1 = box
+    rx = int((bx1 - bx0) * rng.uniform(0.06, 0.11))
+    ry = int(rx * rng.uniform(0.6, 1.0))
+    cx = int(rng.integers(bx0 + rx + 2, int(bx0 + (bx1 - bx0) * 0.45)))
+    cy = int(rng.integers(by0 + (by1 - by0) // 2, by1 - ry - 2))
+    # Work on a window around the dent; the blur spreads it ~1 radius outwards
+    pad = 2 * rx
+    x0, y0, x1, y1 = max(0, cx - pad), max(0, cy - pad), min(w, cx + pad), min(h, cy + pad)
+    mask = np.zeros((y1 - y0, x1 - x0), np.float32)
+    cv2.ellipse(mask, (cx - x0, cy - y0), (rx, ry), float(rng.uniform(0, 180)), 0, 360, 1.0, -1, cv2.LINE_AA)
+    mask = cv2.GaussianBlur(mask, (0, 0), rx / 3.0)
+    # Crease: a dark core with a highlight on one rim
+    shade = 1.0 - 0.55 * mask
+    shade += 0.25 * np.roll(mask, -max(1, rx // 4), axis=0) * (1.0 - mask)
+    roi = img[y0:y1, x0:x1]
+    roi[:] = np.clip(roi.astype(np.float32) * shade[..., None], 0, 255).astype(np.uint8)
+    return (cx - rx, cy - ry, cx + rx, cy + ry)
+
+
+def _inject_scratch(img: np.ndarray, box: Tuple[int, int, int, int], rng: np.random.Generator) -> Tuple[int, int, int, int]:
+    bx0, by0, bx1, by1 = box
+    thickness = max(2, int((bx1 - bx0) * 0.005))
+    x, y = int(rng.integers(bx0 + 20, bx0 + (bx1 - bx0) // 2)), int(rng.integers(by0 + (by1 - by0) // 3, by1 - 40))
+    pts = [(x, y)]
+    length = (bx1 - bx0) * rng.uniform(0.2, 0.3)
+    angle = rng.uniform(-0.5, 0.5)
+    for _ in range(6):
+        angle += rng.uniform(-0.25, 0.25)
+        x += int(length / 6 * np.cos(angle))
+        y += int(length / 6 * np.sin(angle))
+        pts.append((int(np.clip(x, bx0, bx1 - 1)), int(np.clip(y, by0, by1 - 1))))
+    cv2.polylines(img, [np.array(pts, np.int32)], False, (235, 238, 240), thickness, cv2.LINE_AA)
+    xs, ys = [p[0] for p in pts], [p[1] for p in pts]
+    return (min(xs) - thickness, min(ys) - thickness, max(xs) + thickness, max(ys) + thickness)
+
+
+def _inject_seal_gap(img: np.ndarray, tape: Tuple[int, int, int, int], rng: np.random.Generator) -> Tuple[int, int, int, int]:
+    tx0, ty0, tx1, ty1 = tape
+    gap_h = max(4, int((ty1 - ty0) * rng.uniform(0.18, 0.3)))
+    gy0 = int(rng.integers(ty0 + (ty1 - ty0) // 4, ty1 - gap_h))
+    # Cut tape: the flap seam shows through as a dark slit with lifted edges
+    img[gy0:gy0 + gap_h, tx0:tx1] = (img[gy0:gy0 + gap_h, tx0:tx1] * 0.5).astype(np.uint8)
+    mid = (tx0 + tx1) // 2
+    cv2.line(img, (mid, gy0), (mid, gy0 + gap_h), (20, 20, 20), max(2, (tx1 - tx0) // 25))
+    cv2.line(img, (tx0, gy0), (tx1, gy0), (245, 245, 245), max(1, gap_h // 8))
+    return (tx0, gy0, tx1, gy0 + gap_h)
+
+
+def _perspective_shift(img: np.ndarray, amount: float, rng: np.random.Generator) -> np.ndarray:
+    h, w = img.shape[:2]
+    src = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+    jitter = rng.uniform(-amount, amount, (4, 2)) * np.float32([w, h])
+    H = cv2.getPerspectiveTransform(src, (src + jitter).astype(np.float32))
+    return cv2.warpPerspective(img, H, (w, h), borderMode=cv2.BORDER_REPLICATE)
+
+
+def _illumination_change(img: np.ndarray, amount: float, rng: np.random.Generator) -> np.ndarray:
+    h, w = img.shape[:2]
+    gain = 1.0 + rng.uniform(-amount, amount)
+    bias = rng.uniform(-amount, amount) * 40.0
+    # Directional falloff, as from a lamp off to one side
+    gx = np.linspace(-1.0, 1.0, w, dtype=np.float32)[None, :] * rng.uniform(-amount, amount)
+    gy = np.linspace(-1.0, 1.0, h, dtype=np.float32)[:, None] * rng.uniform(-amount, amount)
+    field_ = (gain + gx + gy)[..., None]
+    tint = 1.0 + rng.uniform(-amount / 3, amount / 3, 3).astype(np.float32)
+    return np.clip(img.astype(np.float32) * field_ * tint + bias, 0, 255).astype(np.uint8)
+
+
+def make_pair(
+    width: int = 1600,
+    height: int = 1200,
+    damages: Sequence[str] = DAMAGE_TYPES,
+    perspective: float = 0.02,
+    illumination: float = 0.12,
+    seed: int = 0,
+) -> SyntheticPair:
+    """Renders a baseline/current pair with ``damages`` injected into the current photo.
+
+    ``perspective`` is the maximum corner displacement as a fraction of the
+    image size; ``illumination`` the maximum relative gain/gradient change.
+    """
+    rng = np.random.default_rng(seed)
+    baseline, box, tape = _render_package(width, height, rng)
+    current = baseline.copy()
+    injected: List[InjectedDamage] = []
+    for kind in damages:
+        if kind == "dent":
+            rect = _inject_dent(current, box, rng)
+        elif kind == "scratch":
+            rect = _inject_scratch(current, box, rng)
+        elif kind == "seal_gap":
+            rect = _inject_seal_gap(current, tape, rng)
+        else:
+            raise ValueError(f"Unknown damage type: {kind}")
+        injected.append(InjectedDamage(kind, _norm_bbox(*rect, width, height)))
+    if perspective > 0:
+        current = _perspective_shift(current, perspective, rng)
+    if illumination > 0:
+        current = _illumination_change(current, illumination, rng)
+    # Re-encode noise: the current photo is a different capture
+    current = np.clip(current.astype(np.int16) + rng.normal(0, 2, current.shape).astype(np.int16), 0, 255).astype(np.uint8)
+    return SyntheticPair(baseline, current, injected)
+
+
+def bbox_overlaps(a: Sequence[float], b: Sequence[float]) -> bool:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    return ax < bx + bw and bx < ax + aw and ay < by + bh and by < ay + ah
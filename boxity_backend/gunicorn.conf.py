@@ -0,0 +1,29 @@
+# gunicorn.conf.py: `gunicorn api.index:app` picks this up from the working directory.
+import os
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+# CV_POOL_PROCESSES is per host; each worker's CV pool takes 1/workers of it (api/cv_pool.py)
+os.environ.setdefault("BOXITY_SERVER_WORKERS", str(workers))
+
+# Import the app once in the master so workers fork with Flask and the heavy
+# backends already in (copy-on-write) memory instead of each importing them.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") != "0"
+
+
+def on_starting(server):
+    # Workers sum each other's metric snapshots: give this run its own directory
+    from api.metrics import start_run
+
+    start_run()
+    if not preload_app:
+        return
+    # Imports only: thread pools, sessions and OpenCV objects must be created
+    # after fork, which the app does lazily on first use.
+    from api.index import warmup
+
+    modules = warmup(imports_only=True)
+    server.log.info("Preloaded backends: %s", ", ".join(f"{k}={'ok' if v else 'missing'}" for k, v in modules.items()))
@@ -0,0 +1,24 @@
+"""
+Test configuration: runs the backend offline and without shared on-disk state.
+
+Run from boxity_backend with ``python -m pytest``. Environment defaults are set
+before any ``api`` module is imported, since most settings are read at import.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+for name, value in {
+    "GEMINI_CLIENT": "simulate",     # synthetic model answers, no API key or network
+    "GEMINI_CACHE_PATH": "",         # no Gemini result cache shared between tests
+    "METRICS_DIR": "",               # per-process metrics
+    "FEATURE_STORE_DIR": "",
+    "IMAGE_HTTP_CACHE_DIR": "",
+    "JOBS_DB_PATH": "",
+    "CV_POOL_PROCESSES": "0",
+    "ANALYZE_DEADLINE_MS": "0",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,74 @@
+import threading
+import time
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from api.auth import JwksKeySet, TokenCache
+
+
+def _jwks(kid="k1"):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key(), as_dict=True)
+    jwk.update({"kid": kid, "use": "sig", "alg": "RS256"})
+    return {"keys": [jwk]}
+
+
+def test_cached_payload_is_copied_per_lookup():
+    cache = TokenCache()
+    payload = {"sub": "u1", "permissions": ["read"]}
+    cache.put("t", payload, time.time() + 60)
+    payload["permissions"].append("leaked")
+
+    found, first = cache.get("t")
+    assert found and first == {"sub": "u1", "permissions": ["read"]}
+    first["permissions"].append("admin")
+    first["sub"] = "someone else"
+    assert cache.get("t") == (True, {"sub": "u1", "permissions": ["read"]})
+
+
+def test_negative_entry_stays_none():
+    cache = TokenCache(negative_ttl_s=60)
+    cache.put_invalid("t")
+    assert cache.get("t") == (True, None)
+    assert cache.get("other") == (False, None)
+
+
+def test_cold_start_fetches_jwks_once():
+    jwks = _jwks()
+    calls = []
+    fetching, gate = threading.Event(), threading.Event()
+
+    def fetch():
+        calls.append(1)
+        fetching.set()
+        gate.wait(2)
+        return jwks
+
+    key_set = JwksKeySet(fetch=fetch, refresh_s=3600, min_refresh_s=30)
+    # An inline fetch (a request's, or preload_jwks) is still in flight when the background refresher starts
+    request = threading.Thread(target=key_set.refresh, kwargs={"force": False})
+    request.start()
+    assert fetching.wait(2)
+    key_set.start_refresher()
+    time.sleep(0.1)
+    gate.set()
+    request.join(5)
+    time.sleep(0.2)
+    assert key_set.get("k1") is not None
+    assert len(calls) == 1
+
+
+def test_unknown_kid_refreshes_at_most_once_per_interval():
+    calls = []
+    jwks = _jwks()
+
+    def fetch():
+        calls.append(1)
+        return jwks
+
+    key_set = JwksKeySet(fetch=fetch, refresh_s=0, min_refresh_s=30)
+    assert key_set.get("k1") is not None
+    assert key_set.get("missing") is None
+    assert key_set.get("missing") is None
+    assert len(calls) == 1
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+synth = pytest.importorskip("bench.synth")
+from bench import runner  # noqa: E402
+
+
+def test_pairs_are_deterministic_per_seed():
+    a, b = synth.make_pair(160, 120, seed=7), synth.make_pair(160, 120, seed=7)
+    assert np.array_equal(a.baseline, b.baseline) and np.array_equal(a.current, b.current)
+    assert a.damages == b.damages
+    assert not np.array_equal(a.current, synth.make_pair(160, 120, seed=8).current)
+
+
+def test_damage_boxes_are_normalized():
+    pair = synth.make_pair(320, 240, seed=3)
+    assert pair.baseline.shape == pair.current.shape == (240, 320, 3)
+    assert [d.type for d in pair.damages] == list(synth.DAMAGE_TYPES)
+    for damage in pair.damages:
+        x, y, w, h = damage.bbox
+        assert 0.0 <= x and 0.0 <= y and w > 0 and h > 0
+        assert x + w <= 1.0 and y + h <= 1.0
+
+
+def test_unknown_damage_type_is_rejected():
+    with pytest.raises(ValueError):
+        synth.make_pair(160, 120, damages=("flood",))
+
+
+def _results(**cases):
+    return {"results": {key: {"p50_ms": p50, "p95_ms": p95} for key, (p50, p95) in cases.items()}}
+
+
+def test_compare_flags_regressions_beyond_the_threshold(capsys):
+    previous = _results(load=(10.0, 20.0), align=(100.0, 200.0), gone=(1.0, 1.0))
+    current = _results(load=(10.5, 30.0), align=(100.0, 200.0), new=(1.0, 1.0))
+    assert runner.compare(previous, current, threshold=0.10) == ["load p95_ms"]
+    assert "REGRESSIONS" in capsys.readouterr().out
+
+
+def test_compare_ignores_sub_millisecond_noise(monkeypatch):
+    monkeypatch.setattr(runner, "MIN_REGRESSION_MS", 1.0)
+    previous = _results(tiny=(0.2, 0.4))
+    current = _results(tiny=(0.5, 1.0))
+    assert runner.compare(previous, current, threshold=0.10) == []
@@ -0,0 +1,68 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+import numpy as np
+import pytest
+
+from api import cv_pool
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    # Pool processes are never started: tasks run on a thread so the test controls when they finish
+    started, release = threading.Event(), threading.Event()
+
+    def blocking_task(*args):
+        started.set()
+        release.wait(5)
+        return [], {}, {}, 0.0
+
+    monkeypatch.setattr(cv_pool, "_run_task", blocking_task)
+    p = cv_pool.CvPool(1)
+    p._executor = ThreadPoolExecutor(max_workers=1)
+    yield p, started, release
+    release.set()
+    p.shutdown()
+
+
+def _settled(p, deadline_s=2.0):
+    # Done-callbacks may run just after the waiter has been woken
+    end = time.monotonic() + deadline_s
+    while p._outstanding and time.monotonic() < end:
+        time.sleep(0.01)
+    return p._outstanding == 0
+
+
+def _pair():
+    return np.zeros((4, 4), np.uint8), np.ones((4, 4), np.uint8)
+
+
+def test_timed_out_task_stays_outstanding_until_it_finishes(pool):
+    p, started, release = pool
+    with pytest.raises(FuturesTimeoutError):
+        p.run(*_pair(), None, {}, timeout=0.05)
+    assert started.is_set()
+    assert p._outstanding == 1
+    release.set()
+    assert _settled(p)
+
+
+def test_cancelled_queued_task_is_released(pool):
+    p, started, release = pool
+    blocker = threading.Thread(target=lambda: p.run(*_pair(), None, {}, timeout=5))
+    blocker.start()
+    assert started.wait(5)
+    with pytest.raises(FuturesTimeoutError):
+        p.run(*_pair(), None, {}, timeout=0.05)
+    assert p._outstanding == 1
+    release.set()
+    blocker.join(5)
+    assert _settled(p)
+
+
+def test_completed_task_is_released(pool):
+    p, started, release = pool
+    release.set()
+    assert p.run(*_pair(), None, {}, timeout=5) == []
+    assert _settled(p)
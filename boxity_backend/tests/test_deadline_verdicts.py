@@ -0,0 +1,147 @@
+import base64
+import time
+
+import pytest
+
+from api import index
+from api.deadline import check, remaining
+from api.model_client import create_model_client, set_model_client
+
+synth = pytest.importorskip("bench.synth")
+
+pytestmark = pytest.mark.skipif(not index._cv_ready(), reason="OpenCV/Numpy unavailable")
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+def _view(seed: int):
+    baseline, current = synth.make_pair(320, 240, seed=seed).encoded()
+    return {"baseline_b64": _b64(baseline), "current_b64": _b64(current)}
+
+
+def _analyze(body, deadline_ms=None):
+    headers = {"X-Deadline-Ms": str(deadline_ms)} if deadline_ms else {}
+    response = index.app.test_client().post("/analyze", json=body, headers=headers)
+    return response.status_code, response.get_json()
+
+
+@pytest.fixture
+def slow_gemini(monkeypatch):
+    """A simulated Gemini that answers well after the test deadlines."""
+    monkeypatch.setenv("GEMINI_SIM_LATENCY", "fixed:5000")
+    for rate in ("GEMINI_SIM_ERROR_RATE", "GEMINI_SIM_RATE_LIMIT_RATE", "GEMINI_SIM_INVALID_RATE"):
+        monkeypatch.setenv(rate, "0")
+    set_model_client(create_model_client())
+    yield
+    set_model_client(None)
+
+
+@pytest.fixture
+def starved_cv(monkeypatch):
+    """Classical CV that needs longer than the request has left, like a busy CV pool."""
+    def slow_regions(baseline, current, info=None):
+        time.sleep(remaining() or 0.0)
+        check("cv")
+        return []
+
+    monkeypatch.setattr(index, "cv_fallback_regions", slow_regions)
+
+
+def test_nothing_analyzed_is_unknown_not_safe(slow_gemini, starved_cv):
+    status, result = _analyze(_view(seed=101), deadline_ms=400)
+    assert status == 200
+    assert result["overall_assessment"] == "UNKNOWN"
+    assert result["aggregate_tis"] is None
+    assert result["confidence_overall"] is None
+    assert result["differences"] == []
+    metadata = result["analysis_metadata"]
+    assert metadata["analysis_status"] == "indeterminate"
+    assert {"gemini", "cv"} <= set(metadata["deadline"]["degraded"])
+
+
+def test_cv_verdict_stands_when_gemini_runs_out_of_time(slow_gemini):
+    status, result = _analyze(_view(seed=102), deadline_ms=2000)
+    assert status == 200
+    metadata = result["analysis_metadata"]
+    assert "gemini" in metadata["deadline"]["degraded"]
+    assert metadata["analysis_status"] == "complete"
+    assert result["overall_assessment"] in ("SAFE", "MODERATE_RISK", "HIGH_RISK")
+    assert isinstance(result["aggregate_tis"], int)
+
+
+def test_expired_budget_answers_504_without_a_score(slow_gemini):
+    status, result = _analyze(_view(seed=103), deadline_ms=0.001)
+    assert status == 504
+    assert result["overall_assessment"] == "UNKNOWN"
+    assert result["aggregate_tis"] is None
+    assert result["confidence_overall"] is None
+
+
+def test_multi_view_without_any_verdict_is_unknown(slow_gemini, starved_cv):
+    status, result = _analyze({"views": [_view(seed=104), _view(seed=105)]}, deadline_ms=400)
+    assert status == 200
+    assert result["overall_assessment"] == "UNKNOWN"
+    assert result["aggregate_tis"] is None
+    metadata = result["analysis_metadata"]
+    assert metadata["analysis_status"] == "indeterminate"
+    assert metadata["angle_1_tis"] is None and metadata["angle_2_tis"] is None
+    assert metadata["angle_tis_min"] is None and metadata["angle_tis_max"] is None
+
+
+def _view_result(view, tis, confidence=0.8):
+    assessment = index._assess_from_tis(tis)[0] if tis is not None else "UNKNOWN"
+    return {
+        "view": view, "differences": [], "baseline_image_info": {}, "current_image_info": {},
+        "aggregate_tis": tis, "overall_assessment": assessment,
+        "confidence_overall": confidence if tis is not None else None,
+        "notes": "", "analysis_metadata": {},
+    }
+
+
+def test_views_with_verdicts_are_averaged():
+    result = index._analysis_response([_view_result("front", 90), _view_result("back", 70)], True)
+    assert result["aggregate_tis"] == 80
+    assert result["overall_assessment"] == index._assess_from_tis(70)[0]
+    assert result["analysis_metadata"]["analysis_status"] == "complete"
+
+
+def test_unknown_view_does_not_read_as_safe():
+    result = index._analysis_response([_view_result("front", 95), _view_result("back", None)], True)
+    assert result["overall_assessment"] == "UNKNOWN"
+    assert result["aggregate_tis"] is None
+    assert result["confidence_overall"] is None
+    assert result["analysis_metadata"]["analysis_status"] == "indeterminate"
+    assert result["analysis_metadata"]["angle_1_tis"] == 95
+    assert "back" in result["notes"]
+
+
+def test_high_risk_view_stands_despite_an_unknown_one():
+    result = index._analysis_response([_view_result("front", 20), _view_result("back", None)], True)
+    assert result["overall_assessment"] == "HIGH_RISK"
+    assert result["aggregate_tis"] is None
+    assert result["analysis_metadata"]["analysis_status"] == "partial"
+    assert "no verdict for back" in result["notes"]
+
+
+@pytest.mark.parametrize("path, body, status", [
+    ("/analyze", {"baseline_b64": "YWJj"}, 400),
+    ("/analyze/batch", {"items": []}, 400),
+    ("/analyze/stream", {}, 400),
+    ("/analyze/jobs", {"callback_url": "http://127.0.0.1/cb"}, 400),
+])
+def test_error_bodies_carry_no_score(path, body, status):
+    response = index.app.test_client().post(path, json=body)
+    assert response.status_code == status
+    result = response.get_json()
+    assert result["error"]
+    assert result["overall_assessment"] == "UNKNOWN"
+    assert result["aggregate_tis"] is None
+    assert result["confidence_overall"] is None
+
+
+def test_failed_batch_item_carries_no_score():
+    status, body = index._analysis_outcome("not an object", False, "test")
+    assert status == 400
+    assert body["aggregate_tis"] is None and body["overall_assessment"] == "UNKNOWN"
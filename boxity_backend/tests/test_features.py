@@ -0,0 +1,55 @@
+import os
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+from api.features import FeatureStore  # noqa: E402
+
+
+def _plane(fill: int):
+    return np.full((100, 100, 3), fill, dtype=np.uint8)  # 30000 bytes
+
+
+def _age(store, key, seconds):
+    path = store._path(key)
+    stamp = time.time() - seconds
+    os.utime(path, (stamp, stamp))
+
+
+def test_round_trip(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    store.save("a", {"lab": _plane(7), "missing": None})
+    loaded = store.load("a")
+    assert set(loaded) == {"lab"}
+    assert int(loaded["lab"][0, 0, 0]) == 7
+    assert store.load("b") is None
+
+
+def test_byte_budget_evicts_least_recently_used(tmp_path):
+    store = FeatureStore(str(tmp_path), max_bytes=100_000)
+    for age, key in ((30, "a"), (20, "b"), (10, "c")):
+        store.save(key, {"lab": _plane(1)})
+        _age(store, key, age)
+    # Reading "a" makes "b" the least recently used
+    assert store.load("a") is not None
+    store.save("d", {"lab": _plane(1)})
+    assert store.load("b") is None
+    assert all(store.load(key) is not None for key in ("a", "c", "d"))
+
+
+def test_entry_cap(tmp_path):
+    store = FeatureStore(str(tmp_path), max_entries=2)
+    for age, key in ((20, "a"), (10, "b")):
+        store.save(key, {"lab": _plane(1)})
+        _age(store, key, age)
+    store.save("c", {"lab": _plane(1)})
+    assert store.load("a") is None
+    assert store.load("b") is not None and store.load("c") is not None
+
+
+def test_entry_over_the_budget_is_not_stored(tmp_path):
+    store = FeatureStore(str(tmp_path), max_bytes=10_000)
+    store.save("a", {"lab": _plane(1)})
+    assert store.load("a") is None
+    assert os.listdir(tmp_path) == []
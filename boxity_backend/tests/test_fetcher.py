@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from api import cache
+from api.fetcher import HttpDiskCache, ImageFetcher
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+ETAG = '"v1"'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled connections can be reused
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.log.append((self.path, self.client_address[1], self.headers.get("If-None-Match")))
+        if self.path == "/image.png":
+            if self.headers.get("If-None-Match") == ETAG:
+                self.send_response(304)
+                self.send_header("ETag", ETAG)
+                self.end_headers()
+                return
+            self._send(200, PNG, {"Content-Type": "image/png", "ETag": ETAG})
+        elif self.path == "/page.html":
+            self._send(200, b"<html>not an image at all</html>", {"Content-Type": "text/html"})
+        elif self.path == "/huge.png":
+            self._send(200, PNG * 64, {"Content-Type": "image/png"})
+        else:
+            self._send(404, b"missing")
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.log = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _url(server, path):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+def test_fetch_reuses_pooled_connection(server):
+    fetcher = ImageFetcher()
+    for _ in range(3):
+        assert fetcher.fetch(_url(server, "/image.png")) == (PNG, "image/png")
+    ports = {port for _, port, _ in server.log}
+    assert len(server.log) == 3
+    assert len(ports) == 1
+
+
+def test_fetch_revalidates_with_etag(server, tmp_path):
+    fetcher = ImageFetcher(disk_cache=HttpDiskCache(str(tmp_path)))
+    first = fetcher.fetch(_url(server, "/image.png"))
+    second = fetcher.fetch(_url(server, "/image.png"))
+    assert first == second == (PNG, "image/png")
+    assert [etag for _, _, etag in server.log] == [None, ETAG]
+
+
+@pytest.mark.parametrize("path", ["/page.html", "/huge.png", "/missing.png"])
+def test_fetch_rejects_bad_responses(server, path):
+    fetcher = ImageFetcher(max_bytes=len(PNG) * 8)
+    assert fetcher.fetch(_url(server, path)) == (None, None)
+
+
+def test_fetch_unreachable_host():
+    assert ImageFetcher().fetch("http://127.0.0.1:9/image.png", timeout=1) == (None, None)
+
+
+def test_url_cache_entry_expires(server, monkeypatch):
+    monkeypatch.setattr(cache, "_cache", cache.ImageCache())
+    fetcher = ImageFetcher()
+    url = _url(server, "/image.png")
+
+    monkeypatch.setattr(cache, "URL_TTL_S", 3600.0)
+    first, hit = cache.load_cached(url, fetcher.fetch)
+    again, hit_again = cache.load_cached(url, fetcher.fetch)
+    assert (hit, hit_again) == (False, True)
+    assert again is first
+    assert len(server.log) == 1
+
+    monkeypatch.setattr(cache, "URL_TTL_S", 0.0)
+    refetched, hit = cache.load_cached(url, fetcher.fetch)
+    assert not hit
+    assert len(server.log) == 2
+    # Same bytes resolve to the same content-addressed record
+    assert refetched is first
+
+
+def test_base64_sources_never_expire(monkeypatch):
+    monkeypatch.setattr(cache, "_cache", cache.ImageCache())
+    monkeypatch.setattr(cache, "URL_TTL_S", 0.0)
+    calls = []
+
+    def loader(source):
+        calls.append(source)
+        return PNG, "image/png"
+
+    cache.load_cached("data:image/png;base64,AAAA", loader)
+    _, hit = cache.load_cached("data:image/png;base64,AAAA", loader)
+    assert hit
+    assert len(calls) == 1
+
+
+def test_disk_cache_keeps_to_its_byte_budget(tmp_path):
+    disk = HttpDiskCache(str(tmp_path), max_bytes=2500)
+    for age, name in ((30, "a"), (20, "b")):
+        disk.store(f"http://x/{name}", b"\x00" * 1000, "image/png", '"v1"', None)
+        _, body = disk._paths(f"http://x/{name}")
+        stamp = time.time() - age
+        os.utime(body, (stamp, stamp))
+    # Reading "a" makes "b" the least recently used
+    assert disk.read("http://x/a")[0]
+    disk.store("http://x/c", b"\x00" * 1000, "image/png", None, None)
+    assert disk.read("http://x/b") == (None, None)
+    assert disk.validators("http://x/b") == {}
+    assert disk.read("http://x/a")[0] and disk.read("http://x/c")[0]
+
+    disk.store("http://x/huge", b"\x00" * 3000, "image/png", None, None)
+    assert disk.read("http://x/huge") == (None, None)
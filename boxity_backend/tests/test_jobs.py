@@ -0,0 +1,97 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from api import jobs
+from api.jobs import JobQueue, MemoryJobStore, check_callback_url, post_callback
+
+
+class _Hook(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    status = 204
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.calls.append(self.headers["Host"])
+        self.send_response(self.server.status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def hook():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Hook)
+    server.calls, server.status = [], 204
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.mark.parametrize("url", [
+    "ftp://example.com/cb",
+    "http:///cb",
+    "http://127.0.0.1/cb",
+    "http://169.254.169.254/latest/meta-data",
+    "http://10.0.0.5/cb",
+    "http://[::1]/cb",
+    "http://[::ffff:127.0.0.1]/cb",
+])
+def test_internal_callbacks_are_refused(url):
+    with pytest.raises(ValueError):
+        check_callback_url(url)
+
+
+def test_allowlisted_hosts_skip_the_check(monkeypatch):
+    monkeypatch.setenv("JOB_CALLBACK_ALLOWED_HOSTS", "localhost")
+    assert check_callback_url("http://localhost:8080/cb") == "http://localhost:8080/cb"
+    assert jobs.resolve_callback_url("http://localhost:8080/cb") is None
+
+
+def test_delivery_connects_to_the_checked_address(hook):
+    # hooks.invalid does not resolve: the request can only get through on the pinned address
+    port = hook.server_address[1]
+    response = post_callback(f"http://hooks.invalid:{port}/cb", "127.0.0.1", "{}")
+    assert response.status_code == 204
+    assert hook.calls == [f"hooks.invalid:{port}"]
+
+
+def test_webhook_retries_do_not_hold_up_jobs(hook, monkeypatch):
+    monkeypatch.setattr(jobs, "resolve_callback_url", lambda url: "127.0.0.1")
+    hook.status = 503
+    queue = JobQueue(MemoryJobStore(), lambda payload: (200, {"ok": payload["n"]}), workers=1,
+                     webhook_retries=2, webhook_backoff_s=0.2)
+    url = f"http://hooks.invalid:{hook.server_address[1]}/cb"
+    first = queue.submit({"n": 1}, callback_url=url)
+    assert _wait_for(lambda: len(hook.calls) == 1)
+
+    # The only job worker is free while the first webhook waits for its retry
+    second = queue.submit({"n": 2})
+    assert _wait_for(lambda: queue.get(second["id"])["status"] == "succeeded", timeout=0.15)
+
+    assert _wait_for(lambda: queue.get(first["id"])["webhook_status"] == "failed")
+    assert len(hook.calls) == 3
+    assert queue.get(first["id"])["webhook_attempts"] == 3
+
+
+def test_webhook_is_delivered(hook, monkeypatch):
+    monkeypatch.setattr(jobs, "resolve_callback_url", lambda url: "127.0.0.1")
+    queue = JobQueue(MemoryJobStore(), lambda payload: (200, {}), workers=1)
+    job = queue.submit({}, callback_url=f"http://hooks.invalid:{hook.server_address[1]}/cb")
+    assert _wait_for(lambda: queue.get(job["id"])["webhook_status"] == "delivered")
+    assert queue.get(job["id"])["webhook_attempts"] == 1
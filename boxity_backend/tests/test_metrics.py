@@ -0,0 +1,71 @@
+import json
+import os
+import time
+
+import pytest
+
+from api import metrics
+
+
+@pytest.fixture
+def shared_dir(tmp_path, monkeypatch):
+    """Metrics of a run shared through ``tmp_path``, with a fresh registry for this process."""
+    monkeypatch.setenv("METRICS_DIR", str(tmp_path))
+    monkeypatch.setenv(metrics.RUN_ENV, f"{os.getpid()}-test")
+    monkeypatch.setattr(metrics, "_shared_dir_resolved", False)
+    monkeypatch.setattr(metrics, "_registry", metrics.Registry())
+    monkeypatch.setattr(metrics, "_registry_pid", os.getpid())
+    run_dir = metrics._get_shared_dir()
+    assert run_dir == str(tmp_path / f"{os.getpid()}-test")
+    yield tmp_path / f"{os.getpid()}-test"
+    monkeypatch.setattr(metrics, "_shared_dir_resolved", False)
+
+
+def _write_snapshot(run_dir, pid, snapshot):
+    (run_dir / f"{pid}.json").write_text(json.dumps(snapshot))
+
+
+def test_counters_are_summed_and_gauges_reported_per_process(shared_dir):
+    other = os.getppid()
+    _write_snapshot(shared_dir, other, {
+        "counters": [["boxity_views_analyzed_total", {}, 2]],
+        "gauges": [["boxity_gemini_concurrency_limit", {}, 4]],
+        "histograms": [],
+    })
+    metrics.inc("boxity_views_analyzed_total", value=3)
+    metrics.set_gauge("boxity_gemini_concurrency_limit", 8)
+
+    text = metrics.render_prometheus()
+    assert "boxity_views_analyzed_total 5" in text
+    assert f'boxity_gemini_concurrency_limit{{pid="{os.getpid()}"}} 8' in text
+    assert f'boxity_gemini_concurrency_limit{{pid="{other}"}} 4' in text
+
+
+def test_gauges_of_exited_processes_are_dropped(shared_dir):
+    _write_snapshot(shared_dir, 999999999, {
+        "counters": [["boxity_views_analyzed_total", {}, 2]],
+        "gauges": [["boxity_gemini_circuit_open", {}, 1]],
+        "histograms": [],
+    })
+    text = metrics.render_prometheus()
+    assert "boxity_views_analyzed_total 2" in text
+    assert 'pid="999999999"' not in text
+
+
+def test_requests_share_one_delayed_flush(shared_dir, monkeypatch):
+    monkeypatch.setattr(metrics, "FLUSH_INTERVAL_S", 0.2)
+    writes = []
+    flush = metrics.flush
+    monkeypatch.setattr(metrics, "flush", lambda: (writes.append(1), flush()))
+    for _ in range(5):
+        with metrics.request_scope():
+            pass
+    assert writes == []
+
+    snapshot = shared_dir / f"{os.getpid()}.json"
+    deadline = time.monotonic() + 5
+    while not snapshot.exists() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert writes == [1]
+    counters = json.loads(snapshot.read_text())["counters"]
+    assert ["boxity_analyze_requests_total", {"outcome": "ok"}, 5.0] in counters
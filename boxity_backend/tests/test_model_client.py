@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from api.model_client import GenaiClient, client_mode, create_model_client
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _boot(mode):
+    env = dict(os.environ, GEMINI_CLIENT=mode)
+    code = "import sys, api.index; print('google.generativeai' in sys.modules)"
+    return subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env,
+                          capture_output=True, text=True, timeout=60)
+
+
+def test_client_mode_validates():
+    assert client_mode(" Simulate ") == "simulate"
+    with pytest.raises(ValueError, match="GEMINI_CLIENT must be one of"):
+        client_mode("gemini")
+
+
+def test_genai_client_defers_sdk_import():
+    client = create_model_client("genai")
+    assert isinstance(client, GenaiClient)
+    assert client._genai is None
+
+
+def test_boot_does_not_import_sdk():
+    result = _boot("simulate")
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().endswith("False")
+    assert "google.generativeai import failed" not in result.stderr
+
+
+def test_invalid_client_fails_at_startup():
+    result = _boot("gemini")
+    assert result.returncode != 0
+    assert "GEMINI_CLIENT must be one of" in result.stderr
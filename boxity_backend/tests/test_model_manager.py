@@ -0,0 +1,154 @@
+import threading
+import time
+
+import pytest
+
+from api import model_manager
+from api.model_client import ModelError
+from api.model_manager import AimdLimiter, CircuitBreaker, CircuitOpen, ModelThrottled, classify_error
+
+
+class _Clock:
+    """Stands in for time.monotonic in model_manager so cooldowns pass instantly."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(model_manager.time, "monotonic", clock)
+    return clock
+
+
+def _error(code=None):
+    e = ModelError("model call failed")
+    e.code = code
+    return e
+
+
+@pytest.mark.parametrize("error, kind", [
+    (_error(429), "rate_limited"),
+    (_error("503"), "server_error"),
+    (_error(504), "timeout"),
+    (TimeoutError(), "timeout"),
+    (_error(400), "client_error"),
+    (_error("not-a-status"), "exception"),
+    (RuntimeError(), "exception"),
+    (ModelThrottled(), "throttled"),
+    (CircuitOpen(), "circuit_open"),
+])
+def test_classify_error(error, kind):
+    assert classify_error(error) == kind
+
+
+def test_limiter_halves_on_congestion_and_grows_additively(clock):
+    limiter = AimdLimiter(initial=8, minimum=1, maximum=8, latency_target_s=0)
+    started = limiter.acquire(0)
+    clock.now += 1
+    limiter.release(started, congested=True)
+    assert limiter.limit == 4
+
+    for _ in range(4):
+        limiter.release(limiter.acquire(0), congested=False)
+    assert 4.9 < limiter.limit < 5.0
+
+
+def test_limiter_cuts_once_per_congestion_event(clock):
+    limiter = AimdLimiter(initial=8, minimum=1, maximum=8, latency_target_s=0)
+    first, second = limiter.acquire(0), limiter.acquire(0)
+    clock.now += 1
+    limiter.release(first, congested=True)
+    limiter.release(second, congested=True)
+    assert limiter.limit == 4
+
+
+def test_limiter_never_drops_below_its_minimum(clock):
+    limiter = AimdLimiter(initial=2, minimum=1, maximum=8, latency_target_s=0)
+    for _ in range(3):
+        started = limiter.acquire(0)
+        clock.now += 1
+        limiter.release(started, congested=True)
+    assert limiter.limit == 1
+
+
+def test_slow_calls_count_as_congestion(clock):
+    limiter = AimdLimiter(initial=4, minimum=1, maximum=8, latency_target_s=10)
+    started = limiter.acquire(0)
+    clock.now += 11
+    limiter.release(started, congested=False)
+    assert limiter.limit == 2
+
+
+def test_acquire_times_out_at_the_limit():
+    limiter = AimdLimiter(initial=1, minimum=1, maximum=1, latency_target_s=0)
+    started = limiter.acquire(0)
+    assert started is not None
+    assert limiter.acquire(0.05) is None
+
+    # A released slot wakes a waiting caller
+    threading.Timer(0.05, limiter.release, (started, False)).start()
+    assert limiter.acquire(2) is not None
+    assert limiter.in_flight == 1
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failures=3, cooldown_s=30)
+    breaker.record(False)
+    breaker.record(False)
+    breaker.record(True)
+    breaker.record(False)
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.is_open()
+    assert not breaker.allow()
+
+
+def test_breaker_lets_one_probe_through_after_cooldown(clock):
+    breaker = CircuitBreaker(failures=1, cooldown_s=30)
+    breaker.record(False)
+    clock.now += 30
+    assert not breaker.is_open()
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_probe_reopens_the_circuit(clock):
+    breaker = CircuitBreaker(failures=3, cooldown_s=30)
+    for _ in range(3):
+        breaker.record(False)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_cancelled_probe_frees_the_probe_slot(clock):
+    breaker = CircuitBreaker(failures=1, cooldown_s=30)
+    breaker.record(False)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.cancel_probe()
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_disabled_breaker_always_allows(clock):
+    breaker = CircuitBreaker(failures=0, cooldown_s=30)
+    for _ in range(10):
+        breaker.record(False)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,102 @@
+import io
+
+import pytest
+
+from api import index
+from api.index import IMAGE_PACK_DELIMITER, _parse_views
+
+
+def test_views_list_with_labels():
+    views = _parse_views({"views": [
+        {"baseline": "b1", "current": "c1", "label": "front"},
+        {"baseline_url": "b2", "current_b64": "c2"},
+    ]})
+    assert views == [("front", "b1", "c1"), ("angle_2", "b2", "c2")]
+
+
+def test_view_labels_are_truncated():
+    [(label, _, _)] = _parse_views({"views": [{"baseline": "b", "current": "c", "label": "x" * 100}]})
+    assert label == "x" * 64
+
+
+def test_views_list_takes_precedence():
+    views = _parse_views({"views": [{"baseline": "b", "current": "c"}], "baseline_1": "x", "current_1": "y"})
+    assert views == [("angle_1", "b", "c")]
+
+
+def test_numbered_angles_in_order():
+    views = _parse_views({
+        "baseline_angle2": "b2", "current_angle2": "c2",
+        "baseline_1": "b1", "current_1": "c1",
+        "baseline_0": "ignored", "baseline_extra": "ignored",
+    })
+    assert views == [("angle_1", "b1", "c1"), ("angle_2", "b2", "c2")]
+
+
+def test_empty_numbered_angles_are_skipped():
+    views = _parse_views({"baseline_1": "b1", "current_1": "c1", "baseline_2": "", "current_2": None})
+    assert views == [("angle_1", "b1", "c1")]
+
+
+def test_packed_sources():
+    views = _parse_views({"baseline": ["b1", " ", "b2"], "current": f"c1{IMAGE_PACK_DELIMITER}c2"})
+    assert views == [("angle_1", "b1", "c1"), ("angle_2", "b2", "c2")]
+
+
+def test_single_view_from_url_fields():
+    assert _parse_views({"baseline_url": "https://x/b.png", "current_b64": "Y3Vy"}) == [
+        ("angle_1", "https://x/b.png", "Y3Vy")]
+
+
+@pytest.mark.parametrize("data, message", [
+    ({}, "Missing baseline/current"),
+    ({"baseline": "b"}, "Missing baseline/current"),
+    ({"views": []}, "Missing baseline/current"),
+    ({"views": {"baseline": "b", "current": "c"}}, "must be a list"),
+    ({"views": ["b", "c"]}, "View 1 must be an object"),
+    ({"views": [{"baseline": "b", "current": "c"}, {"baseline": "b"}]}, "View 2 requires both"),
+    ({"baseline_angle3": "b"}, "View angle_3 requires both"),
+    ({"baseline": ["b1", "b2"], "current": ["c1"]}, "got 2 and 1"),
+])
+def test_invalid_requests(data, message):
+    with pytest.raises(ValueError, match=message):
+        _parse_views(data)
+
+
+def test_view_count_is_capped(monkeypatch):
+    monkeypatch.setattr(index, "ANALYZE_MAX_VIEWS", 2)
+    assert len(_parse_views({"baseline": ["b1", "b2"], "current": ["c1", "c2"]})) == 2
+    with pytest.raises(ValueError, match="At most 2 views"):
+        _parse_views({"views": [{"baseline": "b", "current": "c"}] * 3})
+
+
+@pytest.mark.parametrize("data, message", [
+    ({"baseline_angle1": 123, "current_angle1": "c"}, "angle_1 baseline must be an image"),
+    ({"baseline_angle1": ["b1", "b2"], "current_angle1": "c"}, "angle_1 baseline must be a single image, got 2"),
+    ({"baseline_1": "b", "current_1": {"url": "c"}}, "angle_1 current must be an image"),
+    ({"views": [{"baseline": 1.5, "current": "c"}]}, "View 1 baseline must be an image"),
+    ({"views": [{"baseline": "b", "current": ["c1", "c2"]}]}, "View 1 current must be a single image"),
+])
+def test_malformed_image_values_are_rejected(data, message):
+    with pytest.raises(ValueError, match=message):
+        _parse_views(data)
+
+
+@pytest.mark.parametrize("body", [
+    {"baseline_angle1": 123, "current_angle1": 456},
+    {"baseline_angle1": ["YWJj", "ZGVm"], "current_angle1": "YWJj"},
+])
+def test_analyze_answers_400_for_malformed_image_values(body):
+    response = index.app.test_client().post("/analyze", json=body)
+    assert response.status_code == 400
+    assert "must be" in response.get_json()["error"]
+
+
+def test_repeated_upload_for_one_angle_is_a_400():
+    png = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+    response = index.app.test_client().post("/analyze", data={
+        "baseline_angle1": [(io.BytesIO(png), "a.png"), (io.BytesIO(png), "b.png")],
+        "current_angle1": (io.BytesIO(png), "c.png"),
+    }, content_type="multipart/form-data")
+    assert response.status_code == 400
+    assert "single image" in response.get_json()["error"]
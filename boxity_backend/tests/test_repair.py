@@ -0,0 +1,121 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from api import ai
+from api.repair import can_validate, is_valid, repair_item, repair_payload
+
+pytestmark = pytest.mark.skipif(not can_validate(), reason="jsonschema not installed")
+
+
+class _RepairModel:
+    """Model stand-in for the model-repair round-trip."""
+
+    def __init__(self, text=None, error=None):
+        self.text, self.error, self.calls = text, error, 0
+
+    def generate_content(self, parts, **kwargs):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return SimpleNamespace(text=self.text)
+
+
+def test_valid_payload_passes_through_unchanged():
+    payload, _ = repair_payload({"differences": [{"type": "dent", "description": "corner dent"}]})
+    assert is_valid(payload)
+    assert ai._validate_or_repair(payload, _RepairModel()) is payload
+
+
+def test_missing_fields_get_type_defaults():
+    item = repair_item({"type": "Seal Tamper", "description": "tape lifted"}, 0)
+    assert item["id"] == "d1"
+    assert item["type"] == "seal_tamper"
+    assert item["severity"] == "HIGH"
+    assert item["tis_delta"] == -40
+    assert item["region"] == "unknown"
+    assert item["bbox"] is None
+    assert item["confidence"] == 0.5
+
+
+@pytest.mark.parametrize("value, expected", [("0.8", 0.8), ("84%", 0.84), (84, 0.84), (3.5, 0.035), (-1, 0.0), ("high", 0.5)])
+def test_confidence_is_coerced_into_unit_range(value, expected):
+    assert repair_item({"type": "dent", "confidence": value}, 0)["confidence"] == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("severity, expected", [("critical", "HIGH"), ("Moderate", "MEDIUM"), ("minor", "LOW"), ("bogus", "MEDIUM")])
+def test_severity_aliases(severity, expected):
+    assert repair_item({"type": "dent", "severity": severity}, 0)["severity"] == expected
+
+
+@pytest.mark.parametrize("bbox, expected", [
+    ({"x": 0.1, "y": 0.2, "width": 0.3, "height": 0.4}, [0.1, 0.2, 0.3, 0.4]),
+    (["0.9", 0.9, 0.5, 0.5], [0.9, 0.9, 0.1, 0.1]),
+    ([10, 20, 30, 40], None),
+    ([0.1, 0.2, 0.3], None),
+])
+def test_bboxes_are_reshaped_or_dropped(bbox, expected):
+    assert repair_item({"type": "dent", "bbox": bbox}, 0)["bbox"] == expected
+
+
+def test_tis_delta_only_lowers_the_score():
+    assert repair_item({"type": "dent", "tis_delta": "12"}, 0)["tis_delta"] == -12
+
+
+@pytest.mark.parametrize("payload, kept", [
+    ([{"type": "scratch"}], 1),
+    ({"type": "scratch", "description": "hairline"}, 1),
+    ({"differences": {"type": "scratch"}}, 1),
+    ({"differences": "none"}, 0),
+    ("not json", 0),
+])
+def test_payload_envelopes(payload, kept):
+    repaired, dropped = repair_payload(payload)
+    assert is_valid(repaired)
+    assert len(repaired["differences"]) == kept
+    assert dropped == 0
+
+
+def test_unusable_items_are_dropped_and_counted():
+    repaired, dropped = repair_payload({"differences": [{"type": "dent"}, {"confidence": 0.9}, "scratch", None]})
+    assert [d["type"] for d in repaired["differences"]] == ["dent"]
+    assert dropped == 3
+
+
+def test_malformed_model_output_is_repaired_locally(monkeypatch):
+    monkeypatch.setattr(ai, "MODEL_REPAIR", True)
+    model = _RepairModel()
+    payload = ai._extract_json('```json\n{"differences": [{"type": "dent", "confidence": "90%", "severity": "severe"}]}\n```')
+    repaired = ai._validate_or_repair(payload, model)
+    assert is_valid(repaired)
+    assert repaired["differences"][0]["confidence"] == 0.9
+    assert repaired["differences"][0]["severity"] == "HIGH"
+    assert model.calls == 0
+
+
+def test_output_with_every_finding_dropped_is_not_no_damage(monkeypatch):
+    monkeypatch.setattr(ai, "MODEL_REPAIR", False)
+    assert ai._validate_or_repair({"differences": [{"confidence": 0.9}]}, _RepairModel()) is None
+
+
+def test_model_repair_is_the_last_resort(monkeypatch):
+    monkeypatch.setattr(ai, "MODEL_REPAIR", True)
+    model = _RepairModel(text=json.dumps({"differences": [{"type": "scratch", "description": "fixed"}]}))
+    repaired = ai._validate_or_repair({"differences": [{"confidence": 0.9}]}, model, timeout=5)
+    assert model.calls == 1
+    assert is_valid(repaired)
+    assert repaired["differences"][0]["description"] == "fixed"
+
+
+def test_model_repair_is_skipped_without_time_left(monkeypatch):
+    monkeypatch.setattr(ai, "MODEL_REPAIR", True)
+    model = _RepairModel(text="{}")
+    assert ai._validate_or_repair({"differences": [{"confidence": 0.9}]}, model, timeout=0) is None
+    assert model.calls == 0
+
+
+def test_failed_model_repair_yields_none(monkeypatch):
+    monkeypatch.setattr(ai, "MODEL_REPAIR", True)
+    model = _RepairModel(error=RuntimeError("backend down"))
+    assert ai._validate_or_repair({"differences": [{"confidence": 0.9}]}, model, timeout=5) is None
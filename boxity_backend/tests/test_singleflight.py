@@ -0,0 +1,140 @@
+import threading
+import time
+
+import pytest
+
+from api.deadline import DeadlineExceeded
+from api.singleflight import FlightTimeout, SingleFlight
+
+
+def _start_leader(flights, key, fn):
+    """Runs ``fn`` as the leader on a thread; returns (thread, outcome dict)."""
+    started = threading.Event()
+    outcome = {}
+
+    def lead():
+        def run():
+            started.set()
+            return fn()
+        try:
+            outcome["result"] = flights.do(key, run)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=lead)
+    thread.start()
+    assert started.wait(2)
+    return thread, outcome
+
+
+def test_followers_share_the_leaders_result():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(2)
+        return {"tis": 80}
+
+    leader, outcome = _start_leader(flights, "k", compute)
+    results = []
+    followers = [threading.Thread(target=lambda: results.append(flights.do("k", compute))) for _ in range(3)]
+    for t in followers:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in followers + [leader]:
+        t.join(2)
+
+    assert len(calls) == 1
+    assert outcome["result"] == ({"tis": 80}, False)
+    assert results == [({"tis": 80}, True)] * 3
+
+
+def test_calls_after_the_leader_finished_run_again():
+    flights = SingleFlight()
+    assert flights.do("k", lambda: 1) == (1, False)
+    assert flights.do("k", lambda: 2) == (2, False)
+
+
+def test_follower_times_out_instead_of_rerunning():
+    flights = SingleFlight()
+    release = threading.Event()
+    leader, _ = _start_leader(flights, "k", lambda: release.wait(2))
+    rerun = []
+    try:
+        with pytest.raises(FlightTimeout):
+            flights.do("k", lambda: rerun.append(1), timeout=0.05)
+    finally:
+        release.set()
+        leader.join(2)
+    assert rerun == []
+
+
+def test_leader_errors_are_shared():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(2)
+        raise ValueError("bad image")
+
+    leader, outcome = _start_leader(flights, "k", fail)
+    follower_error = {}
+
+    def follow():
+        try:
+            flights.do("k", lambda: "rerun")
+        except ValueError as e:
+            follower_error["error"] = e
+
+    follower = threading.Thread(target=follow)
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    for t in (leader, follower):
+        t.join(2)
+    assert isinstance(outcome["error"], ValueError)
+    assert follower_error["error"] is outcome["error"]
+
+
+def test_unshareable_errors_make_the_follower_run_itself():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def out_of_time():
+        release.wait(2)
+        raise DeadlineExceeded("leader's budget ran out")
+
+    leader, outcome = _start_leader(flights, "k", out_of_time)
+    results = []
+    follower = threading.Thread(target=lambda: results.append(
+        flights.do("k", lambda: "own run", shareable=lambda e: not isinstance(e, TimeoutError))))
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    for t in (leader, follower):
+        t.join(2)
+    assert isinstance(outcome["error"], DeadlineExceeded)
+    assert results == [("own run", False)]
+
+
+def test_unreusable_results_make_the_follower_run_itself():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def degraded():
+        release.wait(2)
+        return {"degraded": True}
+
+    leader, _ = _start_leader(flights, "k", degraded)
+    results = []
+    follower = threading.Thread(target=lambda: results.append(
+        flights.do("k", lambda: {"degraded": False}, reusable=lambda r: not r["degraded"])))
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    for t in (leader, follower):
+        t.join(2)
+    assert results == [({"degraded": False}, False)]
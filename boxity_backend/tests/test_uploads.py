@@ -0,0 +1,112 @@
+import io
+
+import pytest
+from flask import Flask
+
+from api import uploads
+from api.uploads import UploadError, is_upload_request, parse_upload_request
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 64
+
+_app = Flask(__name__)
+
+
+def _parse(**request):
+    with _app.test_request_context("/analyze", method="POST", **request) as ctx:
+        return parse_upload_request(ctx.request)
+
+
+def _rejection(**request) -> UploadError:
+    with pytest.raises(UploadError) as info:
+        _parse(**request)
+    return info.value
+
+
+def test_multipart_images_and_fields():
+    data = _parse(data={
+        "baseline": (io.BytesIO(PNG), "baseline.png"),
+        "current": (io.BytesIO(JPEG), "current.jpg"),
+        "view_label": "front",
+        "include_timings": "yes",
+    }, content_type="multipart/form-data")
+    assert data["baseline"].mime == "image/png"
+    assert data["current"].mime == "image/jpeg"
+    assert data["current"].data == JPEG
+    assert data["view_label"] == "front"
+    assert data["include_timings"] is True
+
+
+def test_repeated_multipart_field_becomes_a_list():
+    data = _parse(data={"current": [(io.BytesIO(PNG), "a.png"), (io.BytesIO(JPEG), "b.jpg")]},
+                  content_type="multipart/form-data")
+    assert [image.mime for image in data["current"]] == ["image/png", "image/jpeg"]
+
+
+def test_raw_body_goes_to_the_named_field():
+    data = _parse(query_string={"field": "baseline"}, data=PNG, content_type="image/png")
+    assert data["baseline"].data == PNG
+    assert "field" not in data
+
+
+def test_raw_body_defaults_to_current():
+    assert _parse(data=JPEG, content_type="application/octet-stream")["current"].mime == "image/jpeg"
+
+
+def test_non_image_bytes_are_rejected_by_magic_number():
+    # The declared type does not matter, only the bytes
+    error = _rejection(data={"current": (io.BytesIO(b"<html>not an image</html>"), "current.png", "image/png")},
+                       content_type="multipart/form-data")
+    assert error.status == 415
+    assert "current" in str(error)
+
+
+def test_empty_image_is_rejected():
+    assert _rejection(data=b"", content_type="image/png").status == 400
+
+
+def test_oversized_image_is_rejected(monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_MAX_IMAGE_BYTES", 1024)
+    error = _rejection(data=PNG + b"\x00" * 2048, content_type="image/png")
+    assert error.status == 413
+
+
+def test_oversized_request_is_rejected_before_parsing(monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_MAX_REQUEST_BYTES", 100)
+    error = _rejection(data={"current": (io.BytesIO(PNG + b"\x00" * 200), "current.png")},
+                       content_type="multipart/form-data")
+    assert error.status == 413
+
+
+def test_too_many_files_are_rejected(monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_MAX_FILES", 2)
+    files = [(io.BytesIO(PNG), f"{i}.png") for i in range(3)]
+    assert _rejection(data={"current": files}, content_type="multipart/form-data").status == 413
+
+
+def test_multipart_without_content_length_is_rejected():
+    with _app.test_request_context("/analyze", method="POST", data={"current": (io.BytesIO(PNG), "c.png")},
+                                   content_type="multipart/form-data") as ctx:
+        ctx.request.environ.pop("CONTENT_LENGTH", None)
+        with pytest.raises(UploadError) as info:
+            parse_upload_request(ctx.request)
+    assert info.value.status == 411
+
+
+@pytest.mark.parametrize("content_type, expected", [
+    ("multipart/form-data; boundary=x", True),
+    ("image/webp", True),
+    ("application/octet-stream", True),
+    ("application/json", False),
+])
+def test_is_upload_request(content_type, expected):
+    with _app.test_request_context("/analyze", method="POST", content_type=content_type) as ctx:
+        assert is_upload_request(ctx.request) is expected
+
+
+def test_analyze_answers_with_the_upload_status():
+    from api.index import app
+
+    response = app.test_client().post("/analyze", data=b"GIF-ish but not really", content_type="image/gif")
+    assert response.status_code == 415
+    assert response.get_json()["overall_assessment"] == "UNKNOWN"
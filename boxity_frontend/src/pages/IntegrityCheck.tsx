@@ -28,9 +28,10 @@ interface BackendDifference {
 }
 
 interface TrustScoreData {
-  aggregate_tis: number;
+  // null: no verdict (overall_assessment "UNKNOWN")
+  aggregate_tis: number | null;
   overall_assessment: string;
-  confidence_overall: number;
+  confidence_overall: number | null;
   notes: string;
 }
 
@@ -52,9 +53,9 @@ interface AnalysisMetadata {
 
 interface BackendResponse {
   differences?: BackendDifference[];
-  aggregate_tis?: number;
+  aggregate_tis?: number | null;
   overall_assessment?: string;
-  confidence_overall?: number;
+  confidence_overall?: number | null;
   notes?: string;
   baseline_image_info?: ImageInfo;
   current_image_info?: ImageInfo;
@@ -249,24 +250,15 @@ export default function IntegrityCheck() {
             }))
           : [];
 
-        // Extract trust score data with enhanced metadata
-        const parsedAggregateTis =
-          typeof data?.aggregate_tis === "number"
-            ? data.aggregate_tis
-            : Number(data?.aggregate_tis);
-        const parsedConfidence =
-          typeof data?.confidence_overall === "number"
-            ? data.confidence_overall
-            : Number(data?.confidence_overall);
-
+        // Extract trust score data; a missing score is no verdict, never a pass
         const trustScoreData: TrustScoreData = {
-          aggregate_tis: Number.isFinite(parsedAggregateTis)
-            ? parsedAggregateTis
-            : 100,
-          overall_assessment: data?.overall_assessment ?? "SAFE",
-          confidence_overall: Number.isFinite(parsedConfidence)
-            ? parsedConfidence
-            : 0.8,
+          aggregate_tis:
+            typeof data?.aggregate_tis === "number" ? data.aggregate_tis : null,
+          overall_assessment: data?.overall_assessment ?? "UNKNOWN",
+          confidence_overall:
+            typeof data?.confidence_overall === "number"
+              ? data.confidence_overall
+              : null,
           notes: data?.notes ?? "Analysis completed",
         };
 
@@ -278,7 +270,9 @@ export default function IntegrityCheck() {
         setDifferences(mapped);
         setTrustScore(trustScoreData);
         // Enhanced toast with risk assessment
-        const riskLevel = String(trustScoreData.overall_assessment || "").toUpperCase().includes("SAFE")
+        const riskLevel = String(trustScoreData.overall_assessment || "").toUpperCase() === "UNKNOWN"
+          ? "UNKNOWN"
+          : String(trustScoreData.overall_assessment || "").toUpperCase().includes("SAFE")
           ? "SAFE"
           : String(trustScoreData.overall_assessment || "").toUpperCase().includes("MODERATE")
           ? "MODERATE RISK"
@@ -286,9 +280,14 @@ export default function IntegrityCheck() {
 
         toast({
           title: "Analysis complete",
-          description: `Found ${mapped.length} differences. Trust Score: ${trustScoreData.aggregate_tis}% (${riskLevel})`,
+          description:
+            riskLevel === "UNKNOWN"
+              ? "No verdict could be reached - manual inspection required"
+              : trustScoreData.aggregate_tis === null
+              ? `Found ${mapped.length} differences (${riskLevel}, not every view analyzed)`
+              : `Found ${mapped.length} differences. Trust Score: ${trustScoreData.aggregate_tis}% (${riskLevel})`,
           variant:
-            riskLevel === "HIGH RISK"
+            riskLevel === "HIGH RISK" || riskLevel === "UNKNOWN"
               ? "destructive"
               : riskLevel === "MODERATE RISK"
               ? "default"
@@ -746,14 +745,16 @@ export default function IntegrityCheck() {
                             (1 -
                               Math.max(
                                 0,
-                                Math.min(100, trustScore.aggregate_tis)
+                                Math.min(100, trustScore.aggregate_tis ?? 0)
                               ) /
                                 100)
                           }`}
                           className={
-                            String(trustScore.overall_assessment || "")
-                              .toUpperCase()
-                              .includes("SAFE")
+                            String(trustScore.overall_assessment || "").toUpperCase() === "UNKNOWN"
+                              ? "text-muted-foreground"
+                              : String(trustScore.overall_assessment || "")
+                                  .toUpperCase()
+                                  .includes("SAFE")
                               ? "text-green-500"
                               : String(trustScore.overall_assessment || "")
                                   .toUpperCase()
@@ -766,7 +767,9 @@ export default function IntegrityCheck() {
                       </svg>
                       <div className="absolute inset-0 flex items-center justify-center">
                         <span className="text-2xl font-bold text-foreground">
-                          {Math.max(0, Math.min(100, trustScore.aggregate_tis))}%
+                          {trustScore.aggregate_tis === null
+                            ? "—"
+                            : `${Math.max(0, Math.min(100, trustScore.aggregate_tis))}%`}
                         </span>
                       </div>
                     </div>
@@ -776,9 +779,11 @@ export default function IntegrityCheck() {
                   <div className="space-y-2">
                     <div
                       className={`inline-flex items-center px-3 py-2 rounded-full text-sm font-medium ${
-                        String(trustScore.overall_assessment || "")
-                          .toUpperCase()
-                          .includes("SAFE")
+                        String(trustScore.overall_assessment || "").toUpperCase() === "UNKNOWN"
+                          ? "bg-secondary/40 text-muted-foreground border border-secondary"
+                          : String(trustScore.overall_assessment || "")
+                              .toUpperCase()
+                              .includes("SAFE")
                           ? "bg-green-500/20 text-green-300 border border-green-500/30"
                           : String(trustScore.overall_assessment || "")
                               .toUpperCase()
@@ -787,7 +792,12 @@ export default function IntegrityCheck() {
                           : "bg-red-500/20 text-red-300 border border-red-500/30"
                       }`}
                     >
-                      {String(trustScore.overall_assessment || "")
+                      {String(trustScore.overall_assessment || "").toUpperCase() === "UNKNOWN" ? (
+                        <>
+                          <AlertTriangle className="w-4 h-4 mr-2" />
+                          UNKNOWN - Manual inspection required
+                        </>
+                      ) : String(trustScore.overall_assessment || "")
                         .toUpperCase()
                         .includes("SAFE") ? (
                         <>
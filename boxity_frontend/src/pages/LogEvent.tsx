@@ -306,11 +306,12 @@ export default function LogEvent(): JSX.Element {
         }));
         
         // Extract TIS score from backend response
-        const tisScore = data.aggregate_tis || 100;
+        // No score (no verdict, or an error body) is never treated as a pass
+        const tisScore = typeof data.aggregate_tis === "number" ? data.aggregate_tis : 0;
         const trustScoreData = {
           aggregate_tis: tisScore,
-          overall_assessment: data.overall_assessment || "SAFE",
-          confidence_overall: data.confidence_overall || 0.8,
+          overall_assessment: data.overall_assessment || "UNKNOWN",
+          confidence_overall: typeof data.confidence_overall === "number" ? data.confidence_overall : 0,
           notes: data.notes || "Analysis completed",
         };
         
@@ -324,6 +325,12 @@ export default function LogEvent(): JSX.Element {
             title: "Integrity Check Passed",
             description: `TIS Score: ${tisScore}% (≥40 required). Found ${mapped.length} differences.`,
           });
+        } else if (String(trustScoreData.overall_assessment).toUpperCase() === "UNKNOWN") {
+          toast({
+            title: "Integrity Check Inconclusive",
+            description: "No verdict could be reached - manual inspection required. Upload blocked.",
+            variant: "destructive",
+          });
         } else {
           toast({
             title: "Integrity Check Failed",
@@ -425,13 +432,11 @@ export default function LogEvent(): JSX.Element {
         : [];
 
       // Extract trust score data
-      const parsedAggregateTis = typeof data?.aggregate_tis === "number" ? data.aggregate_tis : Number(data?.aggregate_tis);
-      const parsedConfidence = typeof data?.confidence_overall === "number" ? data.confidence_overall : Number(data?.confidence_overall);
-
+      // No score (no verdict, or an error body) counts as 0 and blocks approval
       const trustScoreData = {
-        aggregate_tis: Number.isFinite(parsedAggregateTis) ? parsedAggregateTis : 100,
-        overall_assessment: data?.overall_assessment ?? "SAFE",
-        confidence_overall: Number.isFinite(parsedConfidence) ? parsedConfidence : 0.8,
+        aggregate_tis: typeof data?.aggregate_tis === "number" ? data.aggregate_tis : 0,
+        overall_assessment: data?.overall_assessment ?? "UNKNOWN",
+        confidence_overall: typeof data?.confidence_overall === "number" ? data.confidence_overall : 0,
         notes: data?.notes ?? "Analysis completed",
       };
 
@@ -444,7 +449,9 @@ export default function LogEvent(): JSX.Element {
         passed,
       });
 
-      const riskLevel = String(trustScoreData.overall_assessment || "").toUpperCase().includes("SAFE")
+      const riskLevel = String(trustScoreData.overall_assessment || "").toUpperCase() === "UNKNOWN"
+        ? "UNKNOWN"
+        : String(trustScoreData.overall_assessment || "").toUpperCase().includes("SAFE")
         ? "SAFE"
         : String(trustScoreData.overall_assessment || "").toUpperCase().includes("MODERATE")
         ? "MODERATE RISK"
@@ -452,7 +459,9 @@ export default function LogEvent(): JSX.Element {
 
       toast({
         title: passed ? "Analysis Passed" : "Analysis Failed",
-        description: `Found ${mapped.length} differences. Trust Score: ${trustScoreData.aggregate_tis}% (${riskLevel})${passed ? "" : " - Approval blocked"}`,
+        description: riskLevel === "UNKNOWN"
+          ? "No verdict could be reached - manual inspection required. Approval blocked"
+          : `Found ${mapped.length} differences. Trust Score: ${trustScoreData.aggregate_tis}% (${riskLevel})${passed ? "" : " - Approval blocked"}`,
         variant: passed ? "default" : "destructive",
       });
     } catch (error) {
@@ -507,11 +516,12 @@ export default function LogEvent(): JSX.Element {
           description: d?.description || "",
         }));
 
-        const tisScore = data.aggregate_tis || 100;
+        // No score (no verdict, or an error body) is never treated as a pass
+        const tisScore = typeof data.aggregate_tis === "number" ? data.aggregate_tis : 0;
         const trustScoreData = {
           aggregate_tis: tisScore,
-          overall_assessment: data.overall_assessment || "SAFE",
-          confidence_overall: data.confidence_overall || 0.8,
+          overall_assessment: data.overall_assessment || "UNKNOWN",
+          confidence_overall: typeof data.confidence_overall === "number" ? data.confidence_overall : 0,
           notes: data.notes || "Analysis completed",
         };
 
@@ -524,6 +534,12 @@ export default function LogEvent(): JSX.Element {
             title: "Integrity Check Passed",
             description: `TIS Score: ${tisScore}% (≥40 required). Found ${mapped.length} differences.`,
           });
+        } else if (String(trustScoreData.overall_assessment).toUpperCase() === "UNKNOWN") {
+          toast({
+            title: "Integrity Check Inconclusive",
+            description: "No verdict could be reached - manual inspection required. Upload blocked.",
+            variant: "destructive",
+          });
         } else {
           toast({
             title: "Integrity Check Failed",
@@ -1976,7 +1992,9 @@ export default function LogEvent(): JSX.Element {
                                     2 * Math.PI * 50 * (1 - Math.max(0, Math.min(100, integrityAnalysisResult.trustScore.aggregate_tis)) / 100)
                                   }`}
                                   className={
-                                    String(integrityAnalysisResult.trustScore.overall_assessment || "").toUpperCase().includes("SAFE")
+                                    String(integrityAnalysisResult.trustScore.overall_assessment || "").toUpperCase() === "UNKNOWN"
+                                      ? "text-muted-foreground"
+                                      : String(integrityAnalysisResult.trustScore.overall_assessment || "").toUpperCase().includes("SAFE")
                                       ? "text-green-500"
                                       : String(integrityAnalysisResult.trustScore.overall_assessment || "").toUpperCase().includes("MODERATE")
                                       ? "text-orange-500"
@@ -1987,21 +2005,30 @@ export default function LogEvent(): JSX.Element {
                               </svg>
                               <div className="absolute inset-0 flex items-center justify-center">
                                 <span className="text-lg font-bold">
-                                  {Math.max(0, Math.min(100, integrityAnalysisResult.trustScore.aggregate_tis))}%
+                                  {String(integrityAnalysisResult.trustScore.overall_assessment || "").toUpperCase() === "UNKNOWN"
+                                    ? "—"
+                                    : `${Math.max(0, Math.min(100, integrityAnalysisResult.trustScore.aggregate_tis))}%`}
                                 </span>
                               </div>
                             </div>
                           </div>
                           <div
                             className={`inline-flex items-center px-3 py-2 rounded-full text-xs font-medium mb-2 ${
-                              String(integrityAnalysisResult.trustScore.overall_assessment || "").toUpperCase().includes("SAFE")
+                              String(integrityAnalysisResult.trustScore.overall_assessment || "").toUpperCase() === "UNKNOWN"
+                                ? "bg-secondary/40 text-muted-foreground border border-secondary"
+                                : String(integrityAnalysisResult.trustScore.overall_assessment || "").toUpperCase().includes("SAFE")
                                 ? "bg-green-500/20 text-green-700 border border-green-500/30"
                                 : String(integrityAnalysisResult.trustScore.overall_assessment || "").toUpperCase().includes("MODERATE")
                                 ? "bg-orange-500/20 text-orange-700 border border-orange-500/30"
                                 : "bg-red-500/20 text-red-700 border border-red-500/30"
                             }`}
                           >
-                            {String(integrityAnalysisResult.trustScore.overall_assessment || "").toUpperCase().includes("SAFE") ? (
+                            {String(integrityAnalysisResult.trustScore.overall_assessment || "").toUpperCase() === "UNKNOWN" ? (
+                              <>
+                                <AlertTriangle className="w-3 h-3 mr-2" />
+                                UNKNOWN - Manual inspection required
+                              </>
+                            ) : String(integrityAnalysisResult.trustScore.overall_assessment || "").toUpperCase().includes("SAFE") ? (
                               <>
                                 <CheckCircle2 className="w-3 h-3 mr-2" />
                                 SAFE
@@ -2020,7 +2047,9 @@ export default function LogEvent(): JSX.Element {
                           </div>
                           {!integrityAnalysisResult.passed && (
                             <p className="text-xs text-red-600 font-medium mt-2">
-                              ⚠️ TIS Score below 40% - Approval blocked
+                              {String(integrityAnalysisResult.trustScore.overall_assessment || "").toUpperCase() === "UNKNOWN"
+                                ? "⚠️ No verdict - Approval blocked"
+                                : "⚠️ TIS Score below 40% - Approval blocked"}
                             </p>
                           )}
                           {integrityAnalysisResult.trustScore.notes && (